@@ -0,0 +1,126 @@
+# coding: utf-8
+
+"""Load test for :mod:`tint.server`, compared to the in-process API.
+
+Starts a server process on a Unix socket, then runs a number of client
+threads, each sending a mix of fuzzy `match_name` and `find_nearest`
+requests one at a time for a fixed duration, and reports throughput and
+latency percentiles as JSON. The same request mix is then run against an
+in-process :class:`tint.TintRegistry` from a single thread. Run with::
+
+    python benchmarks/server_load.py [--clients 16] [--duration 10]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy
+
+import tint
+from tint.client import TintClient
+
+NAMES = ["redish", "a darker greenish color", "light bluish", "pearly whte", "white", "black"]
+
+
+def _requests(seed):
+    """Endless stream of (method name, args) pairs, the same for every seed."""
+    random = numpy.random.RandomState(seed)
+    while True:
+        if random.rand() < 0.5:
+            yield "match_name", (NAMES[random.randint(len(NAMES))], True, 20)
+        else:
+            yield "find_nearest", ("%06x" % random.randint(2 ** 24), "en")
+
+
+def _run_client(lookup, seed, duration, latencies):
+    deadline = time.time() + duration
+    for method, args in _requests(seed):
+        start = time.time()
+        if start >= deadline:
+            return
+        getattr(lookup, method)(*args)
+        latencies.append(time.time() - start)
+
+
+def _summary(name, latencies, duration, clients):
+    latencies = numpy.array(latencies)
+    return {
+        "name": name,
+        "clients": clients,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / duration,
+        "p50_ms": float(numpy.percentile(latencies, 50) * 1e3),
+        "p99_ms": float(numpy.percentile(latencies, 99) * 1e3),
+    }
+
+
+def _wait_for_socket(address, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            TintClient(address).close()
+            return
+        except IOError:
+            time.sleep(0.05)
+    raise RuntimeError("Server did not start.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per measurement")
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="milliseconds the server collects requests for")
+    options = parser.parse_args()
+
+    address = os.path.join(tempfile.mkdtemp(), "tint.sock")
+    server = subprocess.Popen([
+        sys.executable, "-m", "tint.server", "--socket", address,
+        "--batch-delay", str(options.batch_delay),
+    ])
+    try:
+        _wait_for_socket(address)
+        clients = [TintClient(address) for _ in range(options.clients)]
+        # Warm up the server (loading defaults, building indexes)
+        clients[0].match_name("redish", True, 20)
+        clients[0].find_nearest("123456", "en")
+
+        latencies = [[] for _ in clients]
+        threads = [
+            threading.Thread(target=_run_client, args=(client, i, options.duration, latencies[i]))
+            for i, client in enumerate(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for client in clients:
+            client.close()
+        results = [_summary(
+            "server", sum(latencies, []), options.duration, options.clients
+        )]
+    finally:
+        server.terminate()
+        server.wait()
+
+    registry = tint.TintRegistry()
+    registry.match_name("redish", True, 20)
+    registry.find_nearest("123456", "en")
+    latencies = []
+    _run_client(registry, 0, options.duration, latencies)
+    results.append(_summary("in_process", latencies, options.duration, 1))
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
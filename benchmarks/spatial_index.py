@@ -0,0 +1,61 @@
+# coding: utf-8
+
+"""Compare nearest color lookups with and without the spatial index.
+
+Registers synthetic color systems of growing size and measures the average
+time of a :meth:`TintRegistry.find_nearest` call that misses the hex fast
+path, which uses the system's :class:`tint.spatial.LabTree` once the system
+is large enough, and compares it to a full vectorized scan (excluding the
+hex to Lab conversion). Run with::
+
+    python benchmarks/spatial_index.py
+
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+import numpy
+
+import tint
+from tint import color_diff
+from tint import spatial
+from tint.registry import _hex_to_lab
+
+SIZES = (1000, 2000, 5000, 10000, 20000, 50000, 100000)
+QUERIES = 200
+
+
+def main():
+    random = numpy.random.RandomState(0)
+    queries = ["%06x" % value for value in random.randint(0, 2 ** 24, QUERIES)]
+    query_labs = [_hex_to_lab(hex_code) for hex_code in queries]
+
+    print("%10s %12s %12s %12s" % ("colors", "build [ms]", "find [us]", "scan [us]"))
+    for size in SIZES:
+        hex_codes = ["%06x" % value for value in random.randint(0, 2 ** 24, size)]
+        registry = tint.TintRegistry(load_defaults=False)
+        colors = [("color %d" % i, hex_code) for i, hex_code in enumerate(hex_codes)]
+        registry.add_colors("synthetic", colors)
+        lab_matrix, names = registry._lab_colors("synthetic")
+
+        build = min(timeit.repeat(lambda: spatial.LabTree(lab_matrix), number=1, repeat=3))
+
+        def indexed():
+            for hex_code in queries:
+                registry.find_nearest(hex_code, "synthetic")
+
+        def scan():
+            for lab in query_labs:
+                numpy.argmin(color_diff.delta_e_cie2000(lab, lab_matrix))
+
+        index_time = min(timeit.repeat(indexed, number=1, repeat=3)) / QUERIES
+        scan_time = min(timeit.repeat(scan, number=1, repeat=3)) / QUERIES
+        print("%10d %12.1f %12.1f %12.1f" % (size, build * 1e3, index_time * 1e6, scan_time * 1e6))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
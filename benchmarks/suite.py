@@ -0,0 +1,349 @@
+# coding: utf-8
+
+"""Benchmark suite for the hot paths of :class:`tint.TintRegistry`.
+
+Every case runs in a fresh interpreter, so that timings do not depend on the
+cases before, and so that the peak memory (maximum resident set size) of a
+case can be recorded. Results are written as JSON, one object per case::
+
+    {"name": "find_nearest_computed", "seconds": 2.1e-05, "number": 1000,
+     "repeat": 5, "setup_seconds": 0.08, "import_rss_kb": 23120,
+     "peak_rss_kb": 31544}
+
+`seconds` is the best time of one operation over `repeat` rounds of `number`
+operations each, and `setup_seconds` the time it took to prepare the case
+(e.g. to register a synthetic color system). Run with::
+
+    python benchmarks/suite.py [--output results.json] [--quick] [CASE ...]
+
+where the optional `CASE` arguments are prefixes of the case names to run.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import gzip
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy
+
+import tint
+
+# Hex codes that are not part of the "en" system, for the computed paths
+QUERY_COUNT = 1000
+# Minimal duration of one round of a case, in seconds
+MIN_ROUND_TIME = 0.2
+SYNTHETIC_SIZES = (1000, 10000, 100000)
+
+CASES = collections.OrderedDict()
+
+
+def case(function):
+    """Register a case, a function returning the operation to time.
+
+    The function prepares everything the operation needs; the time this
+    takes is reported separately as `setup_seconds`.
+    """
+    CASES[function.__name__] = function
+    return function
+
+
+def _random_hex_codes(count, seed=0):
+    random = numpy.random.RandomState(seed)
+    return ["%06x" % value for value in random.randint(0, 2 ** 24, count)]
+
+
+def _cycle(values):
+    """Return a function returning the next value of `values` on every call."""
+    state = {"position": 0}
+
+    def next_value():
+        position = state["position"]
+        state["position"] = (position + 1) % len(values)
+        return values[position]
+    return next_value
+
+
+def _loaded_registry():
+    registry = tint.TintRegistry()
+    # Load and index the defaults, so that the operations do not include that
+    registry.match_name("white")
+    registry.find_nearest("000001", "en")
+    return registry
+
+
+@case
+def construct():
+    return tint.TintRegistry
+
+
+@case
+def construct_and_load_defaults():
+    def operation():
+        registry = tint.TintRegistry()
+        registry.match_name("white")
+        registry.find_nearest("000001", "en")
+    return operation
+
+
+@case
+def match_name_exact():
+    registry = _loaded_registry()
+    return lambda: registry.match_name("white")
+
+
+@case
+def match_name_fuzzy():
+    registry = _loaded_registry()
+    queries = _cycle(["redish", "a darker greenish color", "light bluish", "pearly whte"])
+    return lambda: registry.match_name(queries(), fuzzy=True)
+
+
+@case
+def match_name_fuzzy_top_10():
+    registry = _loaded_registry()
+    queries = _cycle(["redish", "a darker greenish color", "light bluish", "pearly whte"])
+    return lambda: registry.match_name(queries(), fuzzy=True, k=10)
+
+
+def _mixed_registry():
+    """The default colors plus a large palette, as with several loaded systems."""
+    registry = _loaded_registry()
+    registry.add_colors(
+        "palette", [("paint %d" % i, h) for i, h in enumerate(_random_hex_codes(10000, 1))]
+    )
+    return registry
+
+
+@case
+def match_name_fuzzy_mixed():
+    registry = _mixed_registry()
+    queries = _cycle(["redish", "a darker greenish color", "light bluish", "pearly whte"])
+    return lambda: registry.match_name(queries(), fuzzy=True)
+
+
+@case
+def match_name_fuzzy_mixed_one_system():
+    registry = _mixed_registry()
+    queries = _cycle(["redish", "a darker greenish color", "light bluish", "pearly whte"])
+    return lambda: registry.match_name(queries(), fuzzy=True, system="en")
+
+
+@case
+def find_nearest_exact():
+    registry = _loaded_registry()
+    return lambda: registry.find_nearest("ffffff", "en")
+
+
+@case
+def find_nearest_computed():
+    registry = _loaded_registry()
+    queries = _cycle(_random_hex_codes(QUERY_COUNT))
+    return lambda: registry.find_nearest(queries(), "en")
+
+
+@case
+def find_nearest_computed_filter():
+    registry = _loaded_registry()
+    queries = _cycle(_random_hex_codes(QUERY_COUNT))
+    filter_set = ["white", "black", "red", "green", "blue", "yellow", "cyan", "magenta"]
+    return lambda: registry.find_nearest(queries(), "en", filter_set=filter_set)
+
+
+@case
+def find_nearest_computed_compiled_filter():
+    registry = _loaded_registry()
+    queries = _cycle(_random_hex_codes(QUERY_COUNT))
+    compiled = registry.compile_filter(
+        "en", ["white", "black", "red", "green", "blue", "yellow", "cyan", "magenta"]
+    )
+    return lambda: registry.find_nearest(queries(), "en", filter_set=compiled)
+
+
+@case
+def find_nearest_exact_filter():
+    registry = _loaded_registry()
+    filter_set = ["white", "black", "red", "green", "blue", "yellow", "cyan", "magenta"]
+    return lambda: registry.find_nearest("ffffff", "en", filter_set=filter_set)
+
+
+@case
+def find_nearest_many():
+    registry = _loaded_registry()
+    queries = _random_hex_codes(QUERY_COUNT)
+    return lambda: registry.find_nearest_many(queries, "en")
+
+
+def _photo(height, width, seed=0):
+    """A smooth gradient with noise, with about as many distinct colors as a photo."""
+    random = numpy.random.RandomState(seed)
+    y, x = numpy.mgrid[0:height, 0:width]
+    image = numpy.dstack(
+        (x * 255 // width, y * 255 // height, (x + y) * 127 // (height + width) + 60)
+    )
+    image += random.randint(-6, 7, image.shape)
+    return numpy.clip(image, 0, 255).astype(numpy.uint8)
+
+
+@case
+def name_histogram_quantized():
+    registry = _loaded_registry()
+    image = _photo(1000, 1000)
+    return lambda: registry.name_histogram(image, "en", quantize=5)
+
+
+def _synthetic_cases(size):
+    name = "%dk" % (size // 1000)
+
+    def add_colors():
+        colors = [
+            ("color %d" % i, hex_code) for i, hex_code in enumerate(_random_hex_codes(size, 1))
+        ]
+
+        def operation():
+            registry = tint.TintRegistry(load_defaults=False)
+            registry.add_colors("synthetic", colors)
+            # Force the Lab conversion and the spatial index
+            registry.find_nearest("000001", "synthetic")
+        return operation
+
+    def bulk_load():
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode="wb") as f:
+            for i, hex_code in enumerate(_random_hex_codes(size, 1)):
+                f.write(b"color %d,%s\n" % (i, hex_code))
+        data = compressed.getvalue()
+
+        def operation():
+            registry = tint.TintRegistry(load_defaults=False)
+            registry.bulk_load("synthetic", io.BytesIO(data))
+            registry.find_nearest("000001", "synthetic")
+        return operation
+
+    def find_nearest():
+        registry = tint.TintRegistry(load_defaults=False)
+        registry.add_colors(
+            "synthetic", [("color %d" % i, h) for i, h in enumerate(_random_hex_codes(size, 1))]
+        )
+        registry.find_nearest("000001", "synthetic")
+        queries = _cycle(_random_hex_codes(QUERY_COUNT))
+        return lambda: registry.find_nearest(queries(), "synthetic")
+
+    def find_nearest_top_10():
+        registry = tint.TintRegistry(load_defaults=False)
+        registry.add_colors(
+            "synthetic", [("color %d" % i, h) for i, h in enumerate(_random_hex_codes(size, 1))]
+        )
+        registry.find_nearest("000001", "synthetic")
+        queries = _cycle(_random_hex_codes(QUERY_COUNT))
+        return lambda: registry.find_nearest(queries(), "synthetic", k=10)
+
+    def match_name_fuzzy():
+        registry = tint.TintRegistry(load_defaults=False)
+        registry.add_colors(
+            "synthetic", [("color %d" % i, h) for i, h in enumerate(_random_hex_codes(size, 1))]
+        )
+        registry.match_name("color 1")
+        queries = _cycle(["colour 17", "kolor 4242", "color 99999 x"])
+        return lambda: registry.match_name(queries(), fuzzy=True)
+
+    for function, suffix in ((add_colors, "add_colors"), (bulk_load, "bulk_load"),
+                             (find_nearest, "find_nearest"),
+                             (find_nearest_top_10, "find_nearest_top_10"),
+                             (match_name_fuzzy, "match_name_fuzzy")):
+        function.__name__ = str("synthetic_%s_%s" % (name, suffix))
+        case(function)
+
+
+for _size in SYNTHETIC_SIZES:
+    _synthetic_cases(_size)
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, OS X bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_case(name, repeat):
+    """Run a single case in this process, returning its result dict."""
+    import_rss_kb = _peak_rss_kb()
+    start = time.time()
+    operation = CASES[name]()
+    setup_seconds = time.time() - start
+
+    # Calibrate the number of operations per round, like `python -m timeit`
+    number = 1
+    while True:
+        duration = timeit.timeit(operation, number=number)
+        if duration >= MIN_ROUND_TIME or number >= 10 ** 6:
+            break
+        number *= 10
+    timings = timeit.repeat(operation, number=number, repeat=repeat)
+    return {
+        "name": name,
+        "seconds": min(timings) / number,
+        "number": number,
+        "repeat": repeat,
+        "setup_seconds": setup_seconds,
+        "import_rss_kb": import_rss_kb,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("prefixes", nargs="*", metavar="CASE",
+                        help="run only the cases whose names start with one of these")
+    parser.add_argument("-o", "--output", help="write the JSON results to this file")
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer rounds, and skip the 100k colors systems")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per case")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        print(json.dumps(run_case(options.child, options.repeat)))
+        return
+
+    repeat = 2 if options.quick else options.repeat
+    names = [
+        name for name in CASES
+        if (not options.prefixes or any(name.startswith(p) for p in options.prefixes)) and
+        not (options.quick and name.startswith("synthetic_100k"))
+    ]
+    results = []
+    for name in names:
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--child", name, "--repeat", str(repeat)]
+        )
+        result = json.loads(output.decode("utf-8").splitlines()[-1])
+        results.append(result)
+        print("%-40s %12.1f us %10d KiB" % (name, result["seconds"] * 1e6, result["peak_rss_kb"]),
+              file=sys.stderr)
+
+    report = {
+        "tint_version": tint.__version__,
+        "python_version": platform.python_version(),
+        "numpy_version": numpy.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -90,5 +90,1047 @@ def test_find_no_system(no_default_tint_registry):
         no_default_tint_registry.find_nearest("000000", "not_a_real_system")
 
 
+def test_match_name_shortlist(tint_registry):
+    for in_string in ("redish", "rather white", u"perlweiß", "navy blue-ish"):
+        assert (tint_registry.match_name(in_string, fuzzy=True, shortlist=30) ==
+                tint_registry.match_name(in_string, fuzzy=True))
+
+
+def test_match_name_shortlist_no_candidates(tint_registry):
+    # Nothing in common with any color name, falls back to scoring all names
+    assert (tint_registry.match_name("###", fuzzy=True, shortlist=30) ==
+            tint_registry.match_name("###", fuzzy=True))
+
+
+def test_match_name_many(tint_registry):
+    in_strings = ["white", "redish", "pearl", "white", "a darker greenish color", "redish"]
+    expected = [tint_registry.match_name(s, fuzzy=True) for s in in_strings]
+    assert tint_registry.match_name_many(in_strings, fuzzy=True) == expected
+    assert tint_registry.match_name_many(in_strings, fuzzy=True, processes=2) == expected
+    assert tint_registry.match_name_many(["white", "redish"], processes=2) == [expected[0], None]
+
+
+def test_match_name_many_concurrent(no_default_tint_registry):
+    import threading
+
+    # Two registries defining the same names differently, matched at once
+    registries = [no_default_tint_registry, tint.TintRegistry(load_defaults=False)]
+    for hex_code, registry in zip((GREENISH, REDISH), registries):
+        registry.add_colors("vague", [("name %d" % i, hex_code) for i in range(20)])
+    in_strings = ["name %d" % i for i in range(20)]
+    errors = []
+
+    def match(registry, hex_code):
+        for attempt in range(5):
+            results = registry.match_name_many(in_strings, processes=2)
+            if [result.hex_code for result in results] != [hex_code] * len(in_strings):
+                errors.append(results)
+
+    threads = [
+        threading.Thread(target=match, args=(registry, hex_code))
+        for hex_code, registry in zip((GREENISH, REDISH), registries)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_result_cache():
+    tint_registry = tint.TintRegistry(load_defaults=False, cache_size=2)
+    tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    assert tint_registry.cache_info() == (0, 0, 2, 0)
+
+    result = tint_registry.find_nearest("00ff00", "vague")
+    assert tint_registry.find_nearest("00FF00", "vague") == result
+    assert tint_registry.match_name("green", fuzzy=True) == (GREENISH, 83)
+    assert tint_registry.match_name("green", fuzzy=True) == (GREENISH, 83)
+    assert tint_registry.cache_info() == (2, 2, 2, 2)
+
+    # The least recently used entry is evicted
+    tint_registry.find_nearest("ff0000", "vague", filter_set=["greenish"])
+    assert tint_registry.cache_info().currsize == 2
+    tint_registry.find_nearest("00ff00", "vague")
+    assert tint_registry.cache_info().misses == 4
+
+    # Adding colors invalidates all entries
+    tint_registry.add_colors("vague", [("green", "00ff00")])
+    assert tint_registry.cache_info().currsize == 0
+    assert tint_registry.match_name("green", fuzzy=True) == ("00ff00", 100)
+    assert tint_registry.find_nearest("00ff00", "vague") == ("green", 0)
+
+
+def test_cache_file(tmpdir):
+    filename = str(tmpdir.join("results.sqlite"))
+
+    def lookups(registry):
+        return [
+            registry.match_name("redish", fuzzy=True),
+            registry.match_name("redish", fuzzy=True, k=3),
+            registry.match_name("redish", fuzzy=True, system=["en"]),
+            registry.find_nearest("842456", "en"),
+            registry.find_nearest("842456", "en", filter_set=["white", "black"], k=2),
+            registry.match_name_many(["redish", "white", "bluish"], fuzzy=True),
+            registry.find_nearest_many(["842456", "ffffff", "123456"], "en"),
+        ]
+
+    registry = tint.TintRegistry(stats=True, cache_file=filename)
+    expected = lookups(registry)
+    assert registry.cache_file_info() == (2, 7, None, 7)
+    assert registry.stats()["match_name"].outcomes == {"fuzzy": 3}
+
+    # Another registry with the same colors reuses all results
+    registry = tint.TintRegistry(stats=True, cache_file=filename)
+    assert lookups(registry) == expected
+    stats = registry.stats()
+    # Ranked results are counted as fuzzy matches
+    assert stats["match_name"].outcomes == {"persistent": 2, "fuzzy": 1}
+    assert stats["find_nearest"].outcomes == {"persistent": 1, "computed": 1}
+    assert stats["match_name_many"].outcomes == {
+        "persistent": 2, "distinct": 3, "duplicate": 0, "miss": 0
+    }
+    assert stats["find_nearest_many"].outcomes == {
+        "persistent": 2, "exact": 1, "computed": 0, "duplicate": 0
+    }
+    assert registry.cache_file_info()[:2] == (9, 0)
+
+    # Changed colors do not reuse the stored results
+    registry = tint.TintRegistry(stats=True, cache_file=filename)
+    registry.add_colors("en", [("reddish", "ff1010")])
+    assert registry.match_name("redish", fuzzy=True) == ("ff1010", 92)
+    assert registry.find_nearest("ff1111", "en").color_name == "reddish"
+    assert registry.stats()["match_name"].outcomes == {"fuzzy": 1}
+    assert registry.cache_file_info().currsize == 9
+    registry.prune_cache_file()
+    assert registry.cache_file_info().currsize == 2
+
+
+def test_stats():
+    registry = tint.TintRegistry(cache_size=10, stats=True)
+    registry._load_defaults()
+    registry.match_name("white")
+    registry.match_name("redish", fuzzy=True)
+    registry.match_name("redish", fuzzy=True)
+    with pytest.raises(ValueError):
+        registry.match_name("redish")
+    registry.find_nearest("ffffff", "en")
+    registry.find_nearest("fffffe", "en")
+    with pytest.raises(ValueError):
+        registry.find_nearest("ffffff", "unknown")
+    registry.find_nearest_many(["ffffff", "fffffe", "fffffe"], "en")
+    registry.match_name_many(["white", "redish"])
+
+    stats = registry.stats()
+    assert stats["match_name"].calls == 4
+    assert stats["match_name"].outcomes == {"exact": 1, "fuzzy": 1, "cached": 1, "miss": 1}
+    assert stats["find_nearest"].outcomes == {"exact": 1, "computed": 1, "miss": 1}
+    assert stats["find_nearest_many"].outcomes == {"exact": 1, "computed": 1, "duplicate": 1}
+    assert stats["match_name_many"].outcomes == {"distinct": 2, "duplicate": 0, "miss": 1}
+    assert sum(count for bound, count in stats["match_name"].latency_histogram) == 4
+    assert stats["match_name"].latency_histogram[-1][0] == float("inf")
+    # The fuzzy lookup without cache is the slowest
+    slowest = stats["match_name"].slowest
+    assert len(slowest) == 4 and slowest[0][1] == "redish"
+    assert slowest == sorted(slowest, reverse=True)
+
+    registry.reset_stats()
+    assert registry.stats() == {}
+    assert tint.TintRegistry().stats() is None
+
+
+def test_snapshot(tint_registry, tmpdir):
+    filename = str(tmpdir.join("registry.snapshot"))
+    tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    tint_registry.save(filename)
+
+    loaded_registry = tint.TintRegistry.load(filename)
+    for hex_code in ("842456", "ffffff", GREENISH):
+        for system in ("en", "vague"):
+            assert (loaded_registry.find_nearest(hex_code, system) ==
+                    tint_registry.find_nearest(hex_code, system))
+    for in_string in ("white", u"perlweiß", "greenish"):
+        assert (loaded_registry.match_name(in_string, fuzzy=True) ==
+                tint_registry.match_name(in_string, fuzzy=True))
+        assert (loaded_registry.match_name(in_string, fuzzy=True, system="vague") ==
+                tint_registry.match_name(in_string, fuzzy=True, system="vague"))
+
+    # Loaded registries can be extended like any other
+    loaded_registry.add_colors("vague", [("blueish", "334499")])
+    assert loaded_registry.find_nearest("3344aa", "vague").color_name == "blueish"
+
+
+def test_snapshot_invalid(tmpdir):
+    filename = tmpdir.join("registry.snapshot")
+    filename.write("not a snapshot")
+    with pytest.raises(ValueError):
+        tint.TintRegistry.load(str(filename))
+
+
+def test_rgb_to_lab_matches_colormath():
+    import numpy
+    import colormath.color_conversions
+    import colormath.color_objects
+    from tint import color_conversions
+
+    random = numpy.random.RandomState(0)
+    rgb_values = numpy.vstack((
+        random.randint(0, 256, (500, 3)), [[0, 0, 0], [255, 255, 255], [1, 2, 3]]
+    ))
+    expected = [
+        colormath.color_conversions.convert_color(
+            colormath.color_objects.sRGBColor(*rgb, is_upscaled=True),
+            colormath.color_objects.LabColor
+        ).get_value_tuple()
+        for rgb in rgb_values
+    ]
+    assert [color_conversions.rgb_to_lab_scalar(rgb) for rgb in rgb_values] == expected
+    assert color_conversions.rgb_to_lab(rgb_values).tolist() == [list(lab) for lab in expected]
+
+
+def test_find_nearest_matches_colormath(tint_registry):
+    import colormath.color_diff
+    import colormath.color_objects
+    from tint.registry import _hex_to_lab
+
+    hex_code = "842456"
+    lab_color = colormath.color_objects.LabColor(*_hex_to_lab(hex_code))
+    lab_matrix, names = tint_registry._lab_colors("en")
+    distances = [
+        colormath.color_diff.delta_e_cie2000(lab_color, colormath.color_objects.LabColor(*lab))
+        for lab in lab_matrix
+    ]
+    min_distance = min(distances)
+
+    nearest_color, distance = tint_registry.find_nearest(hex_code, "en")
+    assert nearest_color == names[distances.index(min_distance)]
+    assert distance == pytest.approx(min_distance)
+
+
+@pytest.mark.parametrize("metric, colormath_name", [
+    ("cie76", "delta_e_cie1976"),
+    ("cie94", "delta_e_cie1994"),
+    ("cmc", "delta_e_cmc"),
+    ("cie2000", "delta_e_cie2000"),
+])
+def test_metrics(no_default_tint_registry, metric, colormath_name):
+    import numpy
+    import colormath.color_diff_matrix
+    from tint.registry import _hex_to_lab
+
+    colormath_delta_e = getattr(colormath.color_diff_matrix, colormath_name)
+    random = numpy.random.RandomState(7)
+    hex_codes = ["%06x" % value for value in random.randint(0, 2 ** 24, 3000)]
+    colors = [("color %d" % i, hex_code) for i, hex_code in enumerate(hex_codes)]
+    no_default_tint_registry.add_colors("small", colors[:300])
+    no_default_tint_registry.add_colors("large", colors)
+
+    queries = ["%06x" % value for value in random.randint(0, 2 ** 24, 20)]
+    for system in ("small", "large"):
+        lab_matrix, names = no_default_tint_registry._lab_colors(system)
+        expected = []
+        for query in queries:
+            distances = colormath_delta_e(numpy.array(_hex_to_lab(query)), lab_matrix)
+            index = int(numpy.argmin(distances))
+            expected.append((names[index], distances[index]))
+            result = no_default_tint_registry.find_nearest(query, system, metric=metric)
+            assert result.color_name == names[index]
+            assert result.distance == pytest.approx(distances[index])
+            ranked = no_default_tint_registry.find_nearest(query, system, k=3, metric=metric)
+            assert ranked[0] == result
+            assert [distance for color_name, distance in ranked] == \
+                pytest.approx(sorted(distances)[:3])
+        results = no_default_tint_registry.find_nearest_many(queries, system, metric=metric)
+        assert [color_name for color_name, distance in results] == \
+            [color_name for color_name, distance in expected]
+
+    with pytest.raises(ValueError):
+        no_default_tint_registry.find_nearest(queries[0], "small", metric="cie1234")
+
+
+def test_nearest_pruned():
+    import numpy
+    from tint import color_diff, spatial
+
+    random = numpy.random.RandomState(3)
+    lab_matrix = numpy.column_stack((
+        random.uniform(0, 100, 500), random.uniform(-100, 100, 500), random.uniform(-100, 100, 500)
+    ))
+    # Duplicates test the tie breaking
+    lab_matrix[250:] = lab_matrix[:250]
+    lab_values = lab_matrix[:100] + random.normal(0, 3, (100, 3))
+    distances = color_diff.delta_e_cie2000(lab_values[:, numpy.newaxis, :], lab_matrix)
+    indices, nearest_distances = spatial.nearest_pruned(lab_values, lab_matrix)
+    assert (indices == numpy.argmin(distances, axis=1)).all()
+    assert (nearest_distances == distances.min(axis=1)).all()
+
+
+def test_find_nearest_many(tint_registry):
+    hex_codes = ["842456", "ffffff", "54e6e4", "842456", "FFFFFF"]
+    filter_set = ("white", "black", "red")
+    for filters in (None, filter_set):
+        results = tint_registry.find_nearest_many(hex_codes, "en", filter_set=filters)
+        for hex_code, (color_name, distance) in zip(hex_codes, results):
+            expected_name, expected_distance = tint_registry.find_nearest(
+                hex_code, "en", filter_set=filters
+            )
+            assert color_name == expected_name
+            assert distance == pytest.approx(expected_distance)
+
+    for invalid in ("zzzzzz", "12345", "#12345"):
+        with pytest.raises(ValueError):
+            tint_registry.find_nearest(invalid, "en")
+        with pytest.raises(ValueError):
+            tint_registry.find_nearest_many(["ffffff", invalid], "en")
+
+
+def test_compile_filter(tint_registry):
+    names = ("white", "black", "red")
+    compiled = tint_registry.compile_filter("en", names)
+    hex_codes = ["842456", "ffffff", "54e6e4", "ff0000"]
+    for hex_code in hex_codes:
+        assert tint_registry.find_nearest(hex_code, "en", filter_set=compiled) == \
+            tint_registry.find_nearest(hex_code, "en", filter_set=names)
+    assert tint_registry.find_nearest_many(hex_codes, "en", filter_set=compiled) == \
+        tint_registry.find_nearest_many(hex_codes, "en", filter_set=names)
+
+    # Compiled filters pick up changes of their system
+    tint_registry.add_colors("en", [("red", "842456")])
+    assert tint_registry.find_nearest("842457", "en", filter_set=compiled).color_name == "red"
+
+    tint_registry.add_colors("vague", [("white", "fefefe")])
+    with pytest.raises(ValueError):
+        tint_registry.find_nearest("842456", "vague", filter_set=compiled)
+
+
+def test_find_nearest_many_rgb_array(tint_registry):
+    import numpy
+    rgb_values = numpy.array([[0x84, 0x24, 0x56], [255, 255, 255], [0x84, 0x24, 0x56]])
+    results = tint_registry.find_nearest_many(rgb_values, "en", chunk_size=1)
+    assert results == tint_registry.find_nearest_many(["842456", "ffffff", "842456"], "en")
+
+    with pytest.raises(ValueError):
+        tint_registry.find_nearest_many(numpy.array([[1.7, 2.2, 3.9]]), "en")
+    with pytest.raises(ValueError):
+        tint_registry.find_nearest_many(numpy.array([[0, 0, 256]]), "en")
+
+
+def test_name_histogram(tint_registry):
+    import collections
+    import numpy
+
+    random = numpy.random.RandomState(0)
+    image = random.randint(0, 256, (40, 30, 3)).astype(numpy.uint8)
+    image[:10] = 255
+
+    def expected(rgb_values, filter_set=None):
+        results = tint_registry.find_nearest_many(rgb_values, "en", filter_set)
+        counts = collections.Counter(result.color_name for result in results)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    histogram = tint_registry.name_histogram(image, "en")
+    assert histogram == expected(image)
+    assert histogram[0] == ("white", 300)
+    assert tint_registry.name_histogram(image.tostring(), "en") == histogram
+    filter_set = ["white", "black", "red"]
+    assert (tint_registry.name_histogram(image, "en", filter_set) ==
+            expected(image, filter_set))
+
+    # Pixels are looked up by the centers of their buckets
+    quantized = (image & 0xf0) | 0x08
+    assert tint_registry.name_histogram(image, "en", quantize=4) == expected(quantized)
+    assert tint_registry.name_histogram(b"", "en") == []
+
+    # Values filling sRGB cubes densely are resolved cube by cube
+    steps = numpy.arange(100, 116)
+    dense = numpy.array(numpy.meshgrid(steps, steps, steps)).reshape(3, -1).T.astype(numpy.uint8)
+    assert tint_registry.name_histogram(dense, "en") == expected(dense)
+    assert (tint_registry.name_histogram(dense, "en", filter_set) ==
+            expected(dense, filter_set))
+
+    for pixels in (b"\xff\xff", numpy.zeros((4, 4), dtype=numpy.uint8),
+                   numpy.full((2, 3), 256), numpy.zeros((2, 3))):
+        with pytest.raises(ValueError):
+            tint_registry.name_histogram(pixels, "en")
+    with pytest.raises(ValueError):
+        tint_registry.name_histogram(image, "en", quantize=9)
+
+
+def test_find_nearest_spatial_index(no_default_tint_registry):
+    import numpy
+    from tint.registry import _nearest, _hex_to_lab
+
+    random = numpy.random.RandomState(42)
+    hex_codes = ["%06x" % value for value in random.randint(0, 2 ** 24, 3000)]
+    no_default_tint_registry.add_colors(
+        "large", [("color %d" % i, hex_code) for i, hex_code in enumerate(hex_codes)]
+    )
+    lab_matrix, names = no_default_tint_registry._lab_colors("large")
+    assert no_default_tint_registry._state.systems["large"].lab_colors()[2] is not None
+    queries = ["%06x" % value for value in random.randint(0, 2 ** 24, 50)]
+    indices, distances = _nearest(numpy.array([_hex_to_lab(q) for q in queries]), lab_matrix)
+    for query, index, distance in zip(queries, indices, distances):
+        nearest_color, nearest_distance = no_default_tint_registry.find_nearest(query, "large")
+        assert nearest_color == names[index]
+        assert nearest_distance == pytest.approx(distance)
+
+
+@pytest.mark.parametrize("size", [300, 3000])
+def test_find_nearest_k(no_default_tint_registry, size):
+    import numpy
+    from tint.registry import _hex_to_lab
+    from tint import color_diff
+
+    random = numpy.random.RandomState(42)
+    # Few names for many colors, so that names repeat among the nearest colors
+    colors = [("color %d" % (i % (size // 3)), "%06x" % value)
+              for i, value in enumerate(random.randint(0, 2 ** 24, size))]
+    no_default_tint_registry.add_colors("large", colors)
+    lab_matrix, names = no_default_tint_registry._lab_colors("large")
+    for query in ["%06x" % value for value in random.randint(0, 2 ** 24, 20)] + [colors[0][1]]:
+        distances = color_diff.delta_e_cie2000(_hex_to_lab(query), lab_matrix)
+        expected = []
+        for index in sorted(range(len(names)), key=lambda index: (distances[index], index)):
+            if names[index] not in [color_name for color_name, distance in expected]:
+                expected.append((names[index], distances[index]))
+        results = no_default_tint_registry.find_nearest(query, "large", k=10)
+        assert [color_name for color_name, distance in results] == \
+            [color_name for color_name, distance in expected[:10]]
+        assert [distance for color_name, distance in results] == \
+            pytest.approx([distance for color_name, distance in expected[:10]])
+        assert results[0].color_name == \
+            no_default_tint_registry.find_nearest(query, "large").color_name
+
+    exact = no_default_tint_registry.find_nearest(colors[0][1], "large", k=1)
+    assert exact == [no_default_tint_registry.find_nearest(colors[0][1], "large")]
+    assert type(exact[0].distance) is int
+
+    filtered = no_default_tint_registry.find_nearest(
+        colors[0][1], "large", filter_set=("color 1", "color 2"), k=5
+    )
+    assert [color_name for color_name, distance in filtered] == \
+        [color_name for color_name, distance in
+         no_default_tint_registry.find_nearest(colors[0][1], "large", k=size)
+         if color_name in ("color 1", "color 2")]
+
+
+def test_match_name_k(tint_registry):
+    for in_string in ("rather white", "redish", "a darker greenish color"):
+        results = tint_registry.match_name(in_string, fuzzy=True, k=8)
+        assert len(results) == 8
+        assert results[0] == tint_registry.match_name(in_string, fuzzy=True)
+        assert len(set(hex_code for hex_code, score in results)) == 8
+        scores = [score for hex_code, score in results]
+        assert scores == sorted(scores, reverse=True)
+    assert tint_registry.match_name("white", k=3) == [("ffffff", 100)]
+    assert tint_registry.match_name("white", fuzzy=True, k=3)[0] == ("ffffff", 100)
+    with pytest.raises(ValueError):
+        tint_registry.match_name("rather white", k=3)
+
+
+def test_lookup_table_slab(no_default_tint_registry):
+    import numpy
+    from tint import lookup_table, color_conversions
+    from tint.registry import _nearest
+
+    no_default_tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    lab_matrix, names = no_default_tint_registry._lab_colors("vague")
+    slab = lookup_table._compute_slab((lab_matrix, 248))
+
+    packed = numpy.arange(248 << 16, 256 << 16, 101)
+    rgb_values = numpy.column_stack((packed >> 16, (packed >> 8) & 0xff, packed & 0xff))
+    indices, distances = _nearest(color_conversions.rgb_to_lab(rgb_values), lab_matrix)
+    assert (slab[packed - (248 << 16)] == indices).all()
+
+
+def test_lookup_table(no_default_tint_registry, monkeypatch, tmpdir):
+    import numpy
+    from tint import lookup_table
+
+    # Computing a complete table takes minutes, fake one that maps everything to "redish"
+    def compute(lab_matrix, processes=1):
+        return numpy.ones(lookup_table.SIZE, dtype=numpy.uint16)
+    monkeypatch.setattr(lookup_table, "compute", compute)
+
+    filename = str(tmpdir.join("vague.lut"))
+    no_default_tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    no_default_tint_registry.build_lookup_table("vague", filename)
+    assert no_default_tint_registry.find_nearest("00ff00", "vague").color_name == "redish"
+    assert no_default_tint_registry.find_nearest(GREENISH, "vague") == ("greenish", 0)
+    assert no_default_tint_registry.find_nearest_many(["00ff00"], "vague")[0].color_name == "redish"
+
+    registry = tint.TintRegistry(load_defaults=False)
+    registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    registry.load_lookup_table("vague", filename)
+    assert registry.find_nearest("00ff00", "vague").color_name == "redish"
+
+    # Changing the system discards the table, and it cannot be loaded anymore
+    registry.add_colors("vague", [("blueish", "334499")])
+    assert registry.find_nearest("00ff00", "vague").color_name == "greenish"
+    with pytest.raises(ValueError):
+        registry.load_lookup_table("vague", filename)
+
+
+def test_lazy_defaults(tint_registry):
+    assert tint_registry._state.systems == {}
+
+    # Only the queried system is loaded, and converted to Lab on first search
+    assert tint_registry.find_nearest("ffffff", "en") == ("white", 0)
+    assert len(tint_registry._state.systems["en"]._lab[0]) == 0
+    assert tint_registry.find_nearest("fffffe", "en").color_name == "white"
+    color_system = tint_registry._state.systems["en"]
+    assert len(color_system._lab[0]) == len(color_system.rgb) > 900
+
+    # Defaults are loaded before added colors, which overwrite them
+    tint_registry.add_colors("vague", [("white", "fefefe")])
+    assert set(tint_registry._state.systems) == set(["en", "vague"])
+    assert tint_registry.match_name("white") == ("fefefe", 100)
+
+    with pytest.raises(ValueError):
+        tint_registry.find_nearest("ffffff", "unknown")
+
+
+def test_lazy_fuzzy_choices(tint_registry, tmpdir):
+    # Exact lookups and changes leave the fuzzy choices unprepared
+    assert tint_registry.match_name("white") == ("ffffff", 100)
+    tint_registry.add_colors("vague", [("greenish", GREENISH)])
+    assert all(color_system.fuzzy_choices is None
+               for color_system in tint_registry._state.systems.itervalues())
+    filename = str(tmpdir.join("registry.snapshot"))
+    tint_registry.save(filename)
+    loaded = tint.TintRegistry.load(filename)
+    assert all(color_system.fuzzy_choices is None
+               for color_system in loaded._state.systems.itervalues())
+
+    assert tint_registry.match_name("greenish colour", fuzzy=True).hex_code == GREENISH
+    assert tint_registry._state.systems["vague"].fuzzy_choices is not None
+    # Once prepared, only the changed names are prepared
+    tint_registry.add_colors("vague", [("redish", REDISH), ("greenish", "336633")])
+    tint_registry.remove_colors("vague", ["greenish"])
+    color_system = tint_registry._state.systems["vague"]
+    assert color_system.color_names == ["redish"]
+    assert [choice.processed for choice in color_system.fuzzy_choices] == ["redish"]
+    assert tint_registry.match_name("redish colour", fuzzy=True).hex_code == REDISH
+    assert loaded.match_name("greenish colour", fuzzy=True).hex_code == GREENISH
+
+
+def test_lazy_imports():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, tint; tint.TintRegistry(); "
+        "print(sorted(m for m in ('colormath', 'icu', 'fuzzywuzzy', 'pkg_resources') "
+        "if m in sys.modules))"
+    )
+    assert subprocess.check_output([sys.executable, "-c", code]).strip() == "[]"
+
+
+def test_reload_system(tint_registry):
+    tint_registry.add_colors_from_file("vague", StringIO.StringIO(VAGUE_CSV))
+    old_state = tint_registry._state
+    tint_registry.reload_system("vague", StringIO.StringIO("blueish,334499\ngreenish,336633\n"))
+
+    assert tint_registry.match_name("blueish") == ("334499", 100)
+    assert tint_registry.match_name("greenish") == ("336633", 100)
+    with pytest.raises(ValueError):
+        tint_registry.match_name("redish")
+    assert tint_registry.find_nearest(REDISH, "vague").color_name != "redish"
+    assert tint_registry.find_nearest("ffffff", "en") == ("white", 0)
+
+    # The previous state is untouched, readers holding it see the old colors
+    assert old_state.hex_code("redish") == REDISH
+    old_system = old_state.systems["vague"]
+    assert old_system.names[old_system.row(REDISH)] == "redish"
+
+    # Invalid files leave the system unchanged
+    with pytest.raises(ValueError):
+        tint_registry.reload_system("vague", StringIO.StringIO("broken,12345\n"))
+    with pytest.raises(ValueError):
+        tint_registry.reload_system("vague", StringIO.StringIO("reddish,aa2222\nbroken,zzzzzz\n"))
+    assert tint_registry.match_name("blueish") == ("334499", 100)
+    with pytest.raises(ValueError):
+        tint_registry.match_name("reddish")
+
+
+def test_bulk_load(tint_registry, tmpdir):
+    import gzip
+    from tint.registry import LoadError
+
+    rows = ["color %d,%06x" % (i, i * 4099 % 2 ** 24) for i in range(3000)]
+    rows[10] = "broken,12345"
+    rows[20] = "too,many,fields"
+    rows[30] = ",334455"
+    filename = str(tmpdir.join("vendor.csv.gz"))
+    with gzip.open(filename, "wb") as f:
+        f.write("\n".join(rows[:1500]) + "\n")
+    # Appending adds another gzip member, which is read as part of the file
+    with gzip.open(filename, "ab") as f:
+        f.write("\n".join(rows[1500:]) + "\n")
+
+    result = tint_registry.bulk_load("vendor", filename, chunk_size=100)
+    assert result.colors == 2997
+    assert result.errors == [
+        LoadError(11, "invalid hex code '12345'"),
+        LoadError(21, "expected a color name and a hex code, got 3 fields"),
+        LoadError(31, "empty color name"),
+    ]
+    expected = tint.TintRegistry()
+    expected.add_colors_from_file(
+        "vendor", StringIO.StringIO("\n".join(rows[:10] + rows[11:20] + rows[21:30] + rows[31:]))
+    )
+    for hex_code in ["000000", "010203", "123456", "fedcba"]:
+        assert (tint_registry.find_nearest(hex_code, "vendor") ==
+                expected.find_nearest(hex_code, "vendor"))
+    assert tint_registry.match_name("color 2999") == ("%06x" % (2999 * 4099 % 2 ** 24), 100)
+    assert tint_registry.match_name("white") == ("ffffff", 100)
+
+    # JSON lines, replacing the colors of the system
+    jsonl = StringIO.StringIO(
+        '["greenish", "336633"]\n{"color_name": "redish", "hex_code": "#AA3333"}\n'
+        '\nnot json\n{"color_name": "bluish"}\n'
+    )
+    result = tint_registry.bulk_load("vendor", jsonl, file_format="jsonl", replace=True)
+    assert result.colors == 2
+    assert [error.line for error in result.errors] == [4, 5]
+    assert tint_registry.find_nearest(REDISH, "vendor").color_name == "redish"
+    with pytest.raises(ValueError):
+        tint_registry.match_name("color 1")
+
+    with pytest.raises(ValueError):
+        tint_registry.bulk_load("vendor", StringIO.StringIO(""), file_format="xml")
+    with pytest.raises(ValueError):
+        tint_registry.bulk_load("vendor", StringIO.StringIO("\x1f\x8bnot gzip data"))
+    assert tint_registry.match_name("greenish") == ("336633", 100)
+
+
+def test_update_and_remove_colors(tint_registry):
+    from tint import name_index
+
+    tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    tint_registry.match_name("reddish color", fuzzy=True, shortlist=10)
+
+    tint_registry.update_colors("vague", [("redish", "ff0101"), ("blueish", "334499")])
+    assert tint_registry.match_name("redish") == ("ff0101", 100)
+    assert tint_registry.find_nearest(REDISH, "vague").distance > 0
+    assert tint_registry.find_nearest("ff0101", "vague") == ("redish", 0)
+    assert sorted(tint_registry._lab_colors("vague")[1]) == ["blueish", "greenish", "redish"]
+
+    tint_registry.remove_colors("vague", ["Greenish"])
+    with pytest.raises(ValueError):
+        tint_registry.match_name("greenish")
+    assert sorted(tint_registry._lab_colors("vague")[1]) == ["blueish", "redish"]
+    with pytest.raises(ValueError):
+        tint_registry.remove_colors("vague", ["greenish"])
+
+    # The fuzzy index was updated, not rebuilt, and agrees with a new one
+    index = tint_registry._state.name_index
+    assert index is not None
+    new_index = name_index.NgramIndex()
+    for normalized_name in tint_registry._state.system_by_color:
+        new_index.add(normalized_name)
+    assert index._names_by_trigram == new_index._names_by_trigram
+    assert index._names_by_token == new_index._names_by_token
+    assert index._term_count_by_name == new_index._term_count_by_name
+
+    tint_registry.remove_system("vague")
+    with pytest.raises(ValueError):
+        tint_registry.find_nearest(REDISH, "vague")
+    with pytest.raises(ValueError):
+        tint_registry.match_name("blueish")
+    assert tint_registry.match_name("white") == ("ffffff", 100)
+    with pytest.raises(ValueError):
+        tint_registry.remove_system("vague")
+
+
+def test_remove_shared_colors(tint_registry):
+    # "air force blue raf" and "rackley" share a color, named "rackley"
+    assert tint_registry.match_name("air force blue raf") == ("5d8aa8", 100)
+    assert tint_registry.find_nearest("5d8aa8", "en") == ("rackley", 0)
+    tint_registry.update_colors("en", [("air force blue raf", "5d8aa9")])
+    assert tint_registry.match_name("air force blue raf") == ("5d8aa9", 100)
+    assert tint_registry.find_nearest("5d8aa8", "en").distance > 0
+
+    tint_registry.add_colors("en", [("misty", "123456"), ("foggy", "123456")])
+    tint_registry.remove_colors("en", ["Misty", "air force blue raf"])
+    for color_name in ("misty", "foggy", "air force blue raf"):
+        with pytest.raises(ValueError):
+            tint_registry.match_name(color_name)
+    assert tint_registry.find_nearest("123456", "en").distance > 0
+    assert tint_registry.find_nearest("5d8aa9", "en").distance > 0
+
+
+def test_removed_names_fall_back(tint_registry):
+    # Names removed from the system that defined them last fall back to
+    # another system that still defines them
+    tint_registry.add_colors("vague", [("white", "fefefe"), ("greenish", GREENISH)])
+    assert tint_registry.match_name("white") == ("fefefe", 100)
+    tint_registry.remove_system("vague")
+    assert tint_registry.match_name("white") == ("ffffff", 100)
+
+    tint_registry.add_colors("vague", [("white", "fefefe"), ("greenish", GREENISH)])
+    tint_registry.add_colors("other", [("greenish", "00ff00")])
+    tint_registry.remove_colors("vague", ["white"])
+    assert tint_registry.match_name("white") == ("ffffff", 100)
+    tint_registry.reload_system("other", StringIO.StringIO("blueish,334499\n"))
+    assert tint_registry.match_name("greenish") == (GREENISH, 100)
+    tint_registry.update_colors("vague", [("redish", REDISH)])
+    tint_registry.remove_colors("vague", ["greenish"])
+    with pytest.raises(ValueError):
+        tint_registry.match_name("greenish")
+    assert tint_registry.match_name("white", fuzzy=True) == ("ffffff", 100)
+
+
+def test_columnar_color_system(no_default_tint_registry, tmpdir):
+    colors = [("color %d" % i, "%06x" % (i * 4099)) for i in range(100)]
+    no_default_tint_registry.add_colors("palette", colors)
+    no_default_tint_registry.add_colors("palette", [("alias", "%06x" % 4099)])
+    no_default_tint_registry.remove_colors("palette", ["color %d" % i for i in range(0, 100, 3)])
+
+    def check(registry):
+        color_system = registry._state.systems["palette"]
+        assert len(color_system.rgb) == len(color_system.names) == 66
+        for position, row in enumerate(color_system.name_rows):
+            assert color_system.names[row] in (color_system.color_names[position], "alias")
+        # The renamed row keeps matching its old name too
+        assert registry.match_name("alias") == ("%06x" % 4099, 100)
+        assert registry.match_name("color 1") == ("%06x" % 4099, 100)
+        with pytest.raises(ValueError):
+            registry.match_name("color 3")
+        for i in range(2, 100, 3):
+            assert registry.match_name("color %d" % i) == ("%06x" % (i * 4099), 100)
+            assert registry.find_nearest("%06x" % (i * 4099), "palette") == ("color %d" % i, 0)
+        assert registry.find_nearest_many(["%06x" % 4099, "%06x" % 8198], "palette") == [
+            ("alias", 0), ("color 2", 0)
+        ]
+
+    check(no_default_tint_registry)
+    filename = str(tmpdir.join("palette.snapshot"))
+    no_default_tint_registry.save(filename)
+    check(tint.TintRegistry.load(filename))
+
+
+@pytest.mark.parametrize("query", [
+    "", "!!", "redish", "a darker greenish color", "pearly whte", u"perlweiß",
+    "White", "blue green blue", "dark", "very very light grayish pink",
+])
+def test_fuzzy_scores(tint_registry, query):
+    import fuzzywuzzy.fuzz
+    import fuzzywuzzy.process
+    from tint import fuzzy
+
+    tint_registry.match_name("white")
+    state = tint_registry._state
+    names = state.defined_names().keys()
+    choices = [(name, state.fuzzy_choice(name)) for name in names]
+    prepared_query = fuzzy.prepare_query(query)
+    for scorer, fuzzywuzzy_scorer in ((fuzzy.wratio, fuzzywuzzy.fuzz.WRatio),
+                                      (fuzzy.token_set_ratio, fuzzywuzzy.fuzz.token_set_ratio)):
+        # All scores, in the same order
+        assert fuzzy.extract(prepared_query, choices, scorer, len(names)) == [
+            tuple(result) for result in fuzzywuzzy.process.extract(
+                query, names, scorer=fuzzywuzzy_scorer, limit=len(names)
+            )
+        ]
+
+
+def test_match_name_system(tint_registry):
+    from tint import name_index
+
+    tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH),
+                                       ("white", "fefefe")])
+    # The last definition decides globally, the first system of the scope otherwise
+    assert tint_registry.match_name("white") == ("fefefe", 100)
+    assert tint_registry.match_name("white", system="en") == ("ffffff", 100)
+    assert tint_registry.match_name("white", system=["en", "vague"]) == ("ffffff", 100)
+    assert tint_registry.match_name("white", system=("vague", "en")) == ("fefefe", 100)
+    with pytest.raises(ValueError):
+        tint_registry.match_name("redish", system="en")
+
+    # Fuzzy matching only scores the names of the given systems
+    assert tint_registry.match_name(
+        "reddish color", fuzzy=True, shortlist=10, system="vague").hex_code == REDISH
+    assert tint_registry.match_name("rather white", fuzzy=True, shortlist=20).hex_code == "fefefe"
+    assert (tint_registry.match_name("rather white", fuzzy=True, shortlist=20, system="en") ==
+            ("ffffff", 95))
+    assert [result.hex_code for result in tint_registry.match_name(
+        "reddish", fuzzy=True, k=5, system=iter(["vague"]))] == [REDISH, GREENISH, "fefefe"]
+    assert tint_registry.match_name_many(
+        ["white", "reddish color", "white"], fuzzy=True, system="en"
+    ) == [tint_registry.match_name(s, fuzzy=True, system="en")
+          for s in ("white", "reddish color", "white")]
+
+    for system in ("unknown", [], ["en", "unknown"]):
+        with pytest.raises(ValueError):
+            tint_registry.match_name("white", system=system)
+        with pytest.raises(ValueError):
+            tint_registry.match_name_many(["white"], system=system)
+
+    # Changes update the system's fuzzy index, which agrees with a new one
+    tint_registry.update_colors("vague", [("redish", "ff0101"), ("blueish", "334499")])
+    assert tint_registry.match_name("redish", system="vague") == ("ff0101", 100)
+    color_system = tint_registry._state.systems["vague"]
+    assert color_system.name_index is not None
+    new_index = name_index.NgramIndex()
+    for normalized_name in color_system.color_names:
+        new_index.add(normalized_name)
+    assert color_system.name_index._names_by_token == new_index._names_by_token
+    assert color_system.name_index._term_count_by_name == new_index._term_count_by_name
+
+    # Reloading a system forgets all of its old names
+    tint_registry.reload_system("vague", StringIO.StringIO("greenish,%s\n" % GREENISH))
+    with pytest.raises(ValueError):
+        tint_registry.match_name("white", system="vague")
+    assert tint_registry.match_name("white", system="en") == ("ffffff", 100)
+
+
+def test_repeated_reloads_stay_flat(no_default_tint_registry):
+    import time
+    import numpy
+
+    random = numpy.random.RandomState(5)
+    hex_codes = ["%06x" % value for value in random.randint(0, 2 ** 24, 3000)]
+    colors = [("color %d" % i, hex_code) for i, hex_code in enumerate(hex_codes)]
+    csv_data = "".join("%s,%s\n" % color for color in colors)
+    queries = ["%06x" % value for value in random.randint(0, 2 ** 24, 200)]
+
+    def measure():
+        lab_matrix, names = no_default_tint_registry._lab_colors("palette")
+        start = time.time()
+        for query in queries:
+            no_default_tint_registry.find_nearest(query, "palette")
+        state = no_default_tint_registry._state
+        return (len(lab_matrix), lab_matrix.nbytes, len(names), len(state.system_by_color)), \
+            time.time() - start
+
+    no_default_tint_registry.add_colors("palette", colors)
+    sizes, seconds = measure()
+    assert sizes[0] == len(set(hex_codes))
+    for _ in range(10):
+        no_default_tint_registry.add_colors("palette", colors)
+        no_default_tint_registry.reload_system("palette", StringIO.StringIO(csv_data))
+        no_default_tint_registry.update_colors("palette", colors[:100])
+        assert measure()[0] == sizes
+    assert measure()[1] < 3 * seconds + 0.1
+
+
+def test_concurrent_reload(no_default_tint_registry):
+    import threading
+
+    palettes = [[("color %d" % i, "%06x" % (i * step)) for i in range(200)] for step in (1, 2)]
+    no_default_tint_registry.add_colors("palette", palettes[0])
+    errors = []
+    done = threading.Event()
+
+    def read():
+        values = range(2, 200, 2)
+        while not done.is_set():
+            # All colors of a result come from the same palette
+            results = no_default_tint_registry.find_nearest_many(
+                ["%06x" % value for value in values], "palette"
+            )
+            ratios = set(
+                int(color_name.split()[1]) * 2 // value
+                for value, (color_name, distance) in zip(values, results)
+            )
+            if len(ratios) != 1:
+                errors.append(results)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for palette in palettes * 10:
+            csv_data = "".join("%s,%s\n" % color for color in palette)
+            no_default_tint_registry.reload_system("palette", StringIO.StringIO(csv_data))
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_command_line(processes, tmpdir):
+    import json
+    from tint import __main__
+
+    lines = ["%d\t%s\n" % (i, name) for i, name in enumerate(["white", "redish", "black"] * 5)]
+    options = __main__._parse_args([
+        "--mode", "both", "--fuzzy", "--field", "2", "--format", "jsonl",
+        "--chunk-size", "2", "--processes", str(processes),
+    ])
+    output = StringIO.StringIO()
+    __main__.run(options, StringIO.StringIO("".join(lines)), output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result["input"] for result in results] == ["white", "redish", "black"] * 5
+    assert results[0] == {
+        "input": "white", "hex_code": "ffffff", "score": 100, "color_name": "white", "distance": 0
+    }
+    assert results[1]["hex_code"] == "ff0000" and results[1]["color_name"] == "red"
+
+    # Results kept in a cache file are the same
+    cache_file = str(tmpdir.join("results.sqlite"))
+    for run in range(2):
+        options = __main__._parse_args([
+            "--fuzzy", "--processes", str(processes), "--cache-file", cache_file
+        ])
+        output = StringIO.StringIO()
+        __main__.run(options, StringIO.StringIO("redish\nwhite\nredish\n"), output)
+        assert output.getvalue().splitlines() == [
+            "input,hex_code,score", "redish,ff0000,78", "white,ffffff,100", "redish,ff0000,78"
+        ]
+
+    options = __main__._parse_args(["--mode", "nearest", "--processes", str(processes)])
+    output = StringIO.StringIO()
+    __main__.run(options, StringIO.StringIO("#FFFFFF\nnot a color\nzzzzzz\n000000\n"), output)
+    assert output.getvalue().splitlines() == [
+        "input,color_name,distance", "#FFFFFF,white,0", "not a color,,", "zzzzzz,,",
+        "000000,black,0"
+    ]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_command_line_snapshot(no_default_tint_registry, processes, tmpdir):
+    from tint import __main__
+
+    # A snapshot without "white" and without "en"
+    no_default_tint_registry.add_colors("vague", [("greenish", GREENISH), ("redish", REDISH)])
+    no_default_tint_registry.add_colors("other", [("greenish", "00ff00"), ("blueish", "0000ff")])
+    snapshot_file = str(tmpdir.join("registry.snapshot"))
+    no_default_tint_registry.save(snapshot_file)
+
+    options = __main__._parse_args([
+        "--snapshot", snapshot_file, "--mode", "both", "--system", "vague",
+        "--processes", str(processes),
+    ])
+    output = StringIO.StringIO()
+    __main__.run(options, StringIO.StringIO("greenish\nblueish\n"), output)
+    assert output.getvalue().splitlines() == [
+        "input,hex_code,score,color_name,distance",
+        "greenish,%s,100,greenish,0" % GREENISH,
+        "blueish,,,,",
+    ]
+    # The Lab values were computed before the workers were forked
+    color_system = __main__._worker_state[0]._state.systems["vague"]
+    assert len(color_system._lab[0]) == len(color_system.rgb)
+
+    # Without --system, names of all systems match
+    options = __main__._parse_args(["--snapshot", snapshot_file, "--processes", str(processes)])
+    output = StringIO.StringIO()
+    __main__.run(options, StringIO.StringIO("greenish\nblueish\n"), output)
+    assert output.getvalue().splitlines() == [
+        "input,hex_code,score", "greenish,00ff00,100", "blueish,0000ff,100"
+    ]
+
+    options = __main__._parse_args(["--snapshot", snapshot_file, "--system", "unknown"])
+    with pytest.raises(ValueError):
+        __main__.run(options, StringIO.StringIO("greenish\n"), StringIO.StringIO())
+
+
+def test_server(tint_registry, tmpdir):
+    import threading
+    from tint import server
+    from tint.client import TintClient
+
+    address = str(tmpdir.join("tint.sock"))
+    service = server.make_server(tint_registry, address, batch_delay=0.01)
+    thread = threading.Thread(target=service.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        requests = [
+            ("match_name", ("redish", True), {}),
+            ("match_name", ("white",), {}),
+            ("match_name", ("redish", True), {"system": ["en"]}),
+            ("find_nearest", ("54e6e4", "en"), {}),
+            ("find_nearest", ("54e6e4", "en", ("white", "black")), {}),
+            ("find_nearest", ("ffffff", "en"), {}),
+            ("find_nearest", ("54e6e4", "en"), {"metric": "cie76"}),
+        ]
+        results = {}
+
+        def run(i):
+            with TintClient(address) as client:
+                results[i] = [
+                    getattr(client, method)(*args, **kwargs) for method, args, kwargs in requests
+                ]
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for client_thread in threads:
+            client_thread.start()
+        for client_thread in threads:
+            client_thread.join()
+        expected = [
+            getattr(tint_registry, method)(*args, **kwargs) for method, args, kwargs in requests
+        ]
+        assert results == dict((i, expected) for i in range(4))
+
+        with TintClient(address) as client:
+            with pytest.raises(ValueError):
+                client.match_name("redish")
+            with pytest.raises(ValueError):
+                client.find_nearest("not a color", "en")
+            with pytest.raises(ValueError):
+                client.find_nearest("ffffff", "unknown")
+            with pytest.raises(ValueError):
+                client.match_name("white", system="unknown")
+            assert client.match_name("white") == ("ffffff", 100)
+    finally:
+        service.shutdown()
+        service.server_close()
+
+
+def test_server_batch_errors(tint_registry, monkeypatch):
+    import threading
+    from tint import server
+
+    batcher = server.Batcher(tint_registry, batch_delay=0.2)
+    hex_codes = ["123456", "zzzzzz", "ffffff", "12345", "abcdef", "54e6e4"]
+
+    def submit_all():
+        responses = {}
+
+        def submit(hex_code):
+            responses[hex_code] = batcher.submit(
+                "find_nearest", {"hex_code": hex_code, "system": "en"}
+            )
+
+        threads = [threading.Thread(target=submit, args=(hex_code,)) for hex_code in hex_codes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def check(responses, invalid):
+        for hex_code in hex_codes:
+            if hex_code in invalid:
+                assert "result" not in responses[hex_code]
+            else:
+                assert responses[hex_code] == {
+                    "result": tint_registry.find_nearest(hex_code, "en")._asdict()
+                }
+
+    check(submit_all(), ("zzzzzz", "12345"))
+
+    # Unexpected errors only fail the requests causing them
+    find_nearest = tint_registry.find_nearest
+
+    def failing_find_nearest(hex_code, *args, **kwargs):
+        if hex_code == "abcdef":
+            raise RuntimeError("broken")
+        return find_nearest(hex_code, *args, **kwargs)
+
+    def failing_find_nearest_many(hex_codes, *args, **kwargs):
+        return [failing_find_nearest(hex_code, *args, **kwargs) for hex_code in hex_codes]
+
+    monkeypatch.setattr(tint_registry, "find_nearest", failing_find_nearest)
+    monkeypatch.setattr(tint_registry, "find_nearest_many", failing_find_nearest_many)
+    responses = submit_all()
+    assert responses["abcdef"] == {"error": "RuntimeError: broken"}
+    check(responses, ("zzzzzz", "12345", "abcdef"))
+
+
 if __name__ == '__main__':
     pytest.main()
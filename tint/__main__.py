@@ -0,0 +1,278 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Normalize color names or sRGB hex codes from the command line.
+
+Reads one value per line from a file or stdin, and writes one result per
+value, in input order, as CSV (with a header row) or JSON lines::
+
+    $ printf "redish\\nwhite\\n" | python -m tint --fuzzy
+    input,hex_code,score
+    redish,ff0000,78
+    white,ffffff,100
+
+Modes:
+
+* ``match`` (default): :meth:`TintRegistry.match_name`, the output holds
+  `hex_code` and `score`. Names of all color systems match, unless
+  ``--system`` is given.
+* ``nearest``: :meth:`TintRegistry.find_nearest_many`, the input values
+  are hex codes, the output holds `color_name` and `distance`. Colors of
+  ``--system`` are searched, "en" by default.
+* ``both``: ``match`` followed by ``nearest`` on the matched hex code.
+
+Values without a result (no exact match, or an invalid hex code) get empty
+result fields. Input is processed in chunks of ``--chunk-size`` lines, so
+memory use does not depend on the input size, and chunks are optionally
+spread across ``--processes`` worker processes. With ``--cache-file``,
+computed results are kept in an SQLite file, so that later runs over
+mostly the same values only compute the new ones.
+"""
+
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import sys
+
+from .registry import TintRegistry
+
+_FIELDS_BY_MODE = {
+    "match": ("input", "hex_code", "score"),
+    "nearest": ("input", "color_name", "distance"),
+    "both": ("input", "hex_code", "score", "color_name", "distance"),
+}
+
+# Registry and options of the worker processes, inherited from the parent
+_worker_state = None
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m tint", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("input", nargs="?", default="-",
+                        help="input file, one value per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("-m", "--mode", choices=sorted(_FIELDS_BY_MODE), default="match",
+                        help="what to do with the input values (default: match)")
+    parser.add_argument("-s", "--system",
+                        help="color system to match names of and to find nearest colors in "
+                             "(default: all systems for matching, en for nearest colors)")
+    parser.add_argument("--metric", choices=("cie76", "cie94", "cmc", "cie2000"),
+                        default="cie2000",
+                        help="color difference formula for nearest color lookups "
+                             "(default: cie2000)")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="fall back to fuzzy matching for names without exact match")
+    parser.add_argument("--shortlist", type=int,
+                        help="number of color names to score for fuzzy matching (default: all)")
+    parser.add_argument("-f", "--field", type=int,
+                        help="take the input value from this (1-based) field of each line")
+    parser.add_argument("-d", "--delimiter", default="\t",
+                        help="field delimiter for --field (default: tab)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv",
+                        help="output format (default: csv)")
+    parser.add_argument("--snapshot",
+                        help="load the registry from this snapshot instead of the defaults")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="number of lines processed at once (default: 1000)")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of worker processes, 0 for one per CPU (default: 1)")
+    parser.add_argument("--cache-size", type=int, default=10000,
+                        help="number of cached results per process (default: 10000)")
+    parser.add_argument("--cache-file",
+                        help="keep computed results in this SQLite file, for later runs")
+    return parser.parse_args(argv)
+
+
+def _read_values(lines, field, delimiter):
+    for line in lines:
+        value = line.decode("utf-8").rstrip("\r\n")
+        if field is not None:
+            fields = value.split(delimiter)
+            value = fields[field - 1] if field <= len(fields) else ""
+        yield value
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _match(registry, values, options):
+    # One batch per chunk, so that a persistent cache is read and written once
+    return [
+        (None, None) if result is None else result
+        for result in registry.match_name_many(
+            values, fuzzy=options.fuzzy, shortlist=options.shortlist, system=options.system
+        )
+    ]
+
+
+def _nearest_system(options):
+    return options.system or "en"
+
+
+def _nearest(registry, hex_codes, options):
+    hex_codes = [hex_code.strip().lstrip("#") for hex_code in hex_codes]
+    system = _nearest_system(options)
+    try:
+        return registry.find_nearest_many(hex_codes, system, metric=options.metric)
+    except ValueError:
+        # Some hex code is invalid, resolve the chunk one by one
+        results = []
+        for hex_code in hex_codes:
+            try:
+                results.append(registry.find_nearest(hex_code, system, metric=options.metric))
+            except ValueError:
+                results.append((None, None))
+        return results
+
+
+def _process_chunk(values):
+    """Return the result rows for a chunk of input values, in the order of the input."""
+    registry, options = _worker_state
+    if options.mode == "nearest":
+        return [
+            (value,) + tuple(result)
+            for value, result in zip(values, _nearest(registry, values, options))
+        ]
+
+    matches = _match(registry, values, options)
+    if options.mode == "match":
+        return [(value,) + tuple(match) for value, match in zip(values, matches)]
+
+    matched = [position for position, (hex_code, score) in enumerate(matches) if hex_code]
+    nearest = [(None, None)] * len(values)
+    results = _nearest(registry, [matches[position][0] for position in matched], options)
+    for position, result in zip(matched, results):
+        nearest[position] = result
+    return [
+        (value,) + tuple(match) + tuple(result)
+        for value, match, result in zip(values, matches, nearest)
+    ]
+
+
+def _map_ordered(pool, chunks, pending_limit):
+    """Like ``pool.imap``, but never reads more than `pending_limit` chunks ahead."""
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(_process_chunk, (chunk,)))
+        if len(pending) >= pending_limit:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _format_value(value):
+    if value is None:
+        return b""
+    if isinstance(value, float):
+        # repr keeps all digits, unlike str in Python 2
+        return repr(value).encode("ascii")
+    return unicode(value).encode("utf-8")
+
+
+def _write_rows(output, rows, fields, output_format):
+    if output_format == "jsonl":
+        for row in rows:
+            line = json.dumps(dict(zip(fields, row)), ensure_ascii=False, sort_keys=True)
+            output.write(line.encode("utf-8") + b"\n")
+    else:
+        writer = csv.writer(output, lineterminator=str("\n"))
+        for row in rows:
+            writer.writerow([_format_value(value) for value in row])
+
+
+def run(options, input_file, output_file):
+    """Normalize the lines of `input_file`, writing the results to `output_file`.
+
+    Args:
+      options (argparse.Namespace): Parsed command line arguments.
+      input_file (file-like object): Binary, UTF-8 encoded input.
+      output_file (file-like object): Binary output.
+
+    """
+    global _worker_state
+
+    if options.snapshot:
+        registry = TintRegistry.load(
+            options.snapshot, cache_size=options.cache_size, cache_file=options.cache_file
+        )
+    else:
+        registry = TintRegistry(cache_size=options.cache_size, cache_file=options.cache_file)
+    # Load and prepare everything up front, so that worker processes inherit
+    # it; this also fails early for unknown systems
+    if options.mode != "nearest":
+        state, scope = registry._name_scope(options.system)
+        if options.fuzzy:
+            registry._prepare_fuzzy(scope, options.shortlist)
+    if options.mode != "match":
+        registry._lab_colors(_nearest_system(options))
+    _worker_state = (registry, options)
+
+    fields = _FIELDS_BY_MODE[options.mode]
+    if options.format == "csv":
+        _write_rows(output_file, [fields], fields, "csv")
+    chunks = _chunks(
+        _read_values(input_file, options.field, options.delimiter), options.chunk_size
+    )
+    if options.processes == 1:
+        for chunk in chunks:
+            _write_rows(output_file, _process_chunk(chunk), fields, options.format)
+        return
+
+    processes = options.processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for rows in _map_ordered(pool, chunks, 2 * processes):
+            _write_rows(output_file, rows, fields, options.format)
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def main(argv=None):
+    options = _parse_args(argv)
+    input_file = sys.stdin if options.input == "-" else io.open(options.input, "rb")
+    output_file = sys.stdout if options.output == "-" else io.open(options.output, "wb")
+    try:
+        run(options, input_file, output_file)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Result caches for :class:`tint.TintRegistry`."""
+
+from __future__ import unicode_literals
+
+import collections
+import json
+import os
+import threading
+
+CacheInfo = collections.namedtuple("CacheInfo", ("hits", "misses", "maxsize", "currsize"))
+
+_PREVIOUS, _NEXT, _KEY, _VALUE = range(4)
+
+# Upper bound for the number of keys looked up in one query; SQLite limits
+# the number of parameters of a statement to 999
+_QUERY_SIZE = 500
+
+
+class LRUCache(object):
+    """A mapping of bounded size that evicts the least recently used entry.
+
+    Entries are kept in a circular doubly linked list (most recently used
+    last), which makes lookups, insertions and evictions O(1). All methods
+    may be called from several threads at once.
+
+    Args:
+      maxsize (int): Maximal number of entries.
+
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._links = {}
+        self._lock = threading.Lock()
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+
+    def __len__(self):
+        return len(self._links)
+
+    def get(self, key, default=None):
+        with self._lock:
+            link = self._links.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # Move to the most recently used end
+            link[_PREVIOUS][_NEXT] = link[_NEXT]
+            link[_NEXT][_PREVIOUS] = link[_PREVIOUS]
+            last = self._root[_PREVIOUS]
+            last[_NEXT] = self._root[_PREVIOUS] = link
+            link[_PREVIOUS] = last
+            link[_NEXT] = self._root
+            return link[_VALUE]
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._links or self.maxsize <= 0:
+                return
+            if len(self._links) >= self.maxsize:
+                oldest = self._root[_NEXT]
+                self._root[_NEXT] = oldest[_NEXT]
+                oldest[_NEXT][_PREVIOUS] = self._root
+                del self._links[oldest[_KEY]]
+            last = self._root[_PREVIOUS]
+            link = [last, self._root, key, value]
+            last[_NEXT] = self._root[_PREVIOUS] = self._links[key] = link
+
+    def clear(self):
+        """Remove all entries, keeping the statistics."""
+        with self._lock:
+            self._links.clear()
+            self._root[:] = [self._root, self._root, None, None]
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._links))
+
+
+class PersistentCache(object):
+    """Results stored in an SQLite database, to be reused by later runs.
+
+    Every entry is stored under the fingerprint of the colors it was
+    computed from, so a registry whose colors changed never finds the old
+    entries; :meth:`prune` removes them. Keys and values are lists (or
+    tuples) of JSON serializable values, and values are returned as lists.
+
+    All methods may be called from several threads at once, and from
+    forked processes, which open a connection of their own. Several
+    processes may use the same file, and every write is committed at once.
+
+    Args:
+      filename (string): The database file, created if it does not exist.
+
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        """Return the connection of this process (the caller holds the lock)."""
+        if self._pid != os.getpid():
+            import sqlite3
+
+            # Connections are never shared with forked processes
+            connection = sqlite3.connect(
+                self.filename, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (fingerprint TEXT NOT NULL, "
+                "key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (fingerprint, key))"
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, fingerprint, key, default=None):
+        value = self.get_many(fingerprint, [key])[0]
+        return default if value is None else value
+
+    def get_many(self, fingerprint, keys):
+        """Look up many keys at once.
+
+        Returns:
+          A list of the values of the keys, in the order of the keys, with
+          None for the keys that were not found.
+
+        """
+        encoded = [_encode(key) for key in keys]
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            queried = list(set(encoded))
+            for start in range(0, len(queried), _QUERY_SIZE):
+                chunk = queried[start:start + _QUERY_SIZE]
+                found.update(connection.execute(
+                    "SELECT key, value FROM results WHERE fingerprint = ? AND key IN (%s)"
+                    % ", ".join("?" * len(chunk)),
+                    [fingerprint] + chunk
+                ))
+            values = [found.get(key) for key in encoded]
+            self.hits += len(values) - values.count(None)
+            self.misses += values.count(None)
+        return [None if value is None else json.loads(value) for value in values]
+
+    def put(self, fingerprint, key, value):
+        self.put_many(fingerprint, [(key, value)])
+
+    def put_many(self, fingerprint, items):
+        """Store many pairs of a key and its value, in one transaction."""
+        rows = [(fingerprint, _encode(key), _encode(value)) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results (fingerprint, key, value) VALUES (?, ?, ?)",
+                    rows
+                )
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def prune(self, fingerprints):
+        """Remove all entries except the ones stored under the given fingerprints."""
+        fingerprints = list(fingerprints)
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM results WHERE fingerprint NOT IN (%s)"
+                % ", ".join("?" * len(fingerprints)),
+                fingerprints
+            )
+
+    def clear(self):
+        """Remove all entries, keeping the statistics."""
+        with self._lock:
+            self._connect().execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = self._pid = None
+
+    def info(self):
+        """Return the hits and misses of this instance, and the number of entries in the file."""
+        with self._lock:
+            size = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return CacheInfo(self.hits, self.misses, None, size)
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
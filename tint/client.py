@@ -0,0 +1,91 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Client for the color normalization service of :mod:`tint.server`."""
+
+from __future__ import unicode_literals
+
+import json
+import socket
+
+from .registry import MatchResult, FindResult
+
+
+class TintClient(object):
+    """A connection to a :mod:`tint.server`, mirroring the lookups of :class:`TintRegistry`.
+
+    A client sends one request at a time; use one client per thread.
+
+    Args:
+      address (string or tuple): The Unix socket path, or the ``(host, port)``
+        pair the server listens on.
+      timeout (float, optional): Socket timeout in seconds. Defaults to None,
+        i.e. no timeout.
+
+    Examples:
+      With a server listening on ``/tmp/tint.sock`` (see :mod:`tint.server`):
+
+      >>> client = TintClient("/tmp/tint.sock")  # doctest: +SKIP
+      >>> client.find_nearest("54e6e4", "en")  # doctest: +SKIP
+      FindResult(color_name=u'bright turquoise', distance=3.7302886450554826)
+
+    """
+    def __init__(self, address, timeout=None):
+        family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+        self._file = self._socket.makefile("rwb")
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def match_name(self, in_string, fuzzy=False, shortlist=None, system=None):
+        """See :meth:`TintRegistry.match_name`; `system` must be a string or an iterable."""
+        params = {"in_string": in_string, "fuzzy": fuzzy, "shortlist": shortlist}
+        if system is not None:
+            params["system"] = system if isinstance(system, basestring) else list(system)
+        result = self._request("match_name", params)
+        return MatchResult(result["hex_code"], result["score"])
+
+    def find_nearest(self, hex_code, system, filter_set=None, metric="cie2000"):
+        """See :meth:`TintRegistry.find_nearest`; `filter_set` must be an iterable of names."""
+        params = {"hex_code": hex_code, "system": system, "metric": metric}
+        if filter_set is not None:
+            params["filter_set"] = list(filter_set)
+        result = self._request("find_nearest", params)
+        return FindResult(result["color_name"], result["distance"])
+
+    def _request(self, method, params):
+        message = json.dumps({"method": method, "params": params})
+        self._file.write(message.encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise IOError("Connection closed by the server.")
+        response = json.loads(line.decode("utf-8"))
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
@@ -0,0 +1,115 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""sRGB to Lab conversion without colormath objects.
+
+The constants are the ones colormath uses for ``sRGBColor`` (native
+illuminant D65, 2° observer), and the arithmetic is carried out in the same
+order, so the results equal those of
+``colormath.color_conversions.convert_color(rgb, LabColor)``.
+"""
+
+from __future__ import unicode_literals
+
+import math
+
+import numpy
+
+_RGB_TO_XYZ = (
+    (0.412424, 0.357579, 0.180464),
+    (0.212656, 0.715158, 0.0721856),
+    (0.0193324, 0.119193, 0.950444),
+)
+_D65 = (0.95047, 1.00000, 1.08883)
+_CIE_E = 216.0 / 24389.0
+
+
+def _linearize(value):
+    value /= 255.0
+    if value <= 0.04045:
+        return value / 12.92
+    return math.pow((value + 0.055) / 1.055, 2.4)
+
+
+# Linear sRGB values of all 256 upscaled channel values
+_LINEAR = tuple(_linearize(value) for value in range(256))
+_LINEAR_ARRAY = numpy.array(_LINEAR)
+
+
+def _lab_component(value):
+    if value > _CIE_E:
+        return math.pow(value, 1.0 / 3.0)
+    return 7.787 * value + 16.0 / 116.0
+
+
+def rgb_to_lab_scalar(rgb_value):
+    """Convert a single upscaled (0-255) sRGB triple to Lab.
+
+    This is a plain Python version of :func:`rgb_to_lab`, which is faster
+    for single values.
+
+    Args:
+      rgb_value (tuple of int): r, g and b.
+
+    Returns:
+      A tuple of L, a and b.
+
+    Examples:
+      >>> [round(value, 2) for value in rgb_to_lab_scalar((0, 127, 255))]
+      [54.45, 19.41, -71.36]
+
+    """
+    red, green, blue = [_LINEAR[value] for value in rgb_value]
+    x, y, z = [
+        # Summed in the order numpy.dot uses for colormath's matrix product
+        _lab_component(max((row[0] * red + row[2] * blue) + row[1] * green, 0.0) / white)
+        for row, white in zip(_RGB_TO_XYZ, _D65)
+    ]
+    return (116.0 * y - 16.0, 500.0 * (x - y), 200.0 * (y - z))
+
+
+def rgb_to_lab(rgb_values):
+    """Convert upscaled (0-255) sRGB values to Lab.
+
+    Args:
+      rgb_values (array_like): Integer sRGB triples, the last axis holding r,
+        g and b.
+
+    Returns:
+      A float array of the same shape, holding L, a and b.
+
+    Examples:
+      >>> rgb_to_lab([[0, 127, 255]]).round(2)
+      array([[ 54.45,  19.41, -71.36]])
+
+    """
+    linear = _LINEAR_ARRAY[numpy.asarray(rgb_values, dtype=numpy.intp)]
+    red, green, blue = linear[..., 0:1], linear[..., 1:2], linear[..., 2:3]
+    matrix = numpy.array(_RGB_TO_XYZ)
+    xyz = (red * matrix[:, 0] + blue * matrix[:, 2]) + green * matrix[:, 1]
+    xyz = numpy.maximum(xyz, 0.0) / _D65
+    xyz = numpy.where(
+        xyz > _CIE_E,
+        numpy.power(xyz, 1.0 / 3.0),
+        7.787 * xyz + 16.0 / 116.0
+    )
+    lab = numpy.empty_like(xyz)
+    lab[..., 0] = 116.0 * xyz[..., 1] - 16.0
+    lab[..., 1] = 500.0 * (xyz[..., 0] - xyz[..., 1])
+    lab[..., 2] = 200.0 * (xyz[..., 1] - xyz[..., 2])
+    return lab
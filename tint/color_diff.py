@@ -0,0 +1,256 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Vectorized color difference formulas operating on plain Lab arrays.
+
+The formulas follow ``colormath.color_diff_matrix`` term by term (including
+its conventions for averaging hue angles), so the results agree with
+``colormath.color_diff`` within float tolerance. Unlike colormath, both
+arguments may be arrays of Lab triples of any (broadcastable) shape, which
+allows comparing one color against a whole color system, or many colors
+against a whole color system, in one pass.
+
+CIE94 and CMC are not symmetric; like in colormath, the first argument is
+the reference color, i.e. the query.
+"""
+
+from __future__ import unicode_literals
+
+import math
+
+import numpy
+
+_25_POW_7 = 25.0 ** 7
+_COS_30, _SIN_30 = math.cos(math.radians(30)), math.sin(math.radians(30))
+_COS_6, _SIN_6 = math.cos(math.radians(6)), math.sin(math.radians(6))
+_COS_63, _SIN_63 = math.cos(math.radians(63)), math.sin(math.radians(63))
+
+
+def _pow7(values):
+    squared = values * values
+    return squared * squared * squared * values
+
+
+def delta_e_cie1976(lab_1, lab_2):
+    """Calculate the Delta E (CIE1976) between Lab colors, their euclidean distance.
+
+    Args:
+      lab_1 (array_like): Lab triple(s), the last axis holding L, a and b.
+      lab_2 (array_like): Lab triple(s), broadcastable against `lab_1`.
+
+    Returns:
+      An array of distances with the broadcast shape of both arguments
+      (minus the last axis).
+
+    Examples:
+      >>> delta_e_cie1976([50.0, 2.6772, -79.7751], [[50.0, 0.0, -82.7485]])
+      array([4.00106328])
+
+    """
+    delta_lab = numpy.asarray(lab_1, dtype=numpy.float64) - numpy.asarray(lab_2)
+    return numpy.sqrt(numpy.sum(delta_lab * delta_lab, axis=-1))
+
+
+def _lch_differences(lab_1, lab_2):
+    """Return the lightness, chroma and hue differences, and the chroma of `lab_1`."""
+    lab_1 = numpy.asarray(lab_1, dtype=numpy.float64)
+    lab_2 = numpy.asarray(lab_2, dtype=numpy.float64)
+    C_1 = numpy.sqrt(lab_1[..., 1] * lab_1[..., 1] + lab_1[..., 2] * lab_1[..., 2])
+    C_2 = numpy.sqrt(lab_2[..., 1] * lab_2[..., 1] + lab_2[..., 2] * lab_2[..., 2])
+
+    delta_L = lab_1[..., 0] - lab_2[..., 0]
+    delta_a = lab_1[..., 1] - lab_2[..., 1]
+    delta_b = lab_1[..., 2] - lab_2[..., 2]
+    delta_C = C_1 - C_2
+    delta_H_sq = -delta_C * delta_C + delta_a * delta_a + delta_b * delta_b
+    delta_H = numpy.sqrt(delta_H_sq.clip(min=0))
+    return delta_L, delta_C, delta_H, C_1
+
+
+def delta_e_cie1994(lab_1, lab_2, K_L=1, K_C=1, K_H=1, K_1=0.045, K_2=0.015):
+    """Calculate the Delta E (CIE1994) between Lab colors.
+
+    Args:
+      lab_1 (array_like): Reference Lab triple(s), the last axis holding L, a and b.
+      lab_2 (array_like): Lab triple(s), broadcastable against `lab_1`.
+      K_L, K_C, K_H, K_1, K_2 (float, optional): Weighting factors, the
+        defaults are those for graphic arts; textiles use ``K_L=2``,
+        ``K_1=0.048`` and ``K_2=0.014``.
+
+    Returns:
+      An array of distances with the broadcast shape of both arguments
+      (minus the last axis).
+
+    Examples:
+      >>> delta_e_cie1994([50.0, 2.6772, -79.7751], [[50.0, 0.0, -82.7485]])
+      array([1.39503887])
+
+    """
+    delta_L, delta_C, delta_H, C_1 = _lch_differences(lab_1, lab_2)
+    L_term = delta_L / K_L
+    C_term = delta_C / (K_C * (1 + K_1 * C_1))
+    H_term = delta_H / (K_H * (1 + K_2 * C_1))
+    return numpy.sqrt(L_term * L_term + C_term * C_term + H_term * H_term)
+
+
+def cmc_weights(lab):
+    """Return the weighting functions ``S_L``, ``S_C`` and ``S_H`` of CMC l:c for reference colors.
+
+    Args:
+      lab (array_like): Reference Lab triple(s), the last axis holding L, a and b.
+
+    """
+    lab = numpy.asarray(lab, dtype=numpy.float64)
+    L, a, b = lab[..., 0], lab[..., 1], lab[..., 2]
+    C_1 = numpy.sqrt(a * a + b * b)
+    H_1 = numpy.degrees(numpy.arctan2(b, a))
+    H_1 += (H_1 < 0) * 360
+
+    C_1_4 = C_1 * C_1 * C_1 * C_1
+    F = numpy.sqrt(C_1_4 / (C_1_4 + 1900.0))
+    T = numpy.where(
+        (164 <= H_1) & (H_1 <= 345),
+        0.56 + numpy.fabs(0.2 * numpy.cos(numpy.radians(H_1 + 168))),
+        0.36 + numpy.fabs(0.4 * numpy.cos(numpy.radians(H_1 + 35)))
+    )
+    S_L = numpy.where(L < 16, 0.511, (0.040975 * L) / (1 + 0.01765 * L))
+    S_C = ((0.0638 * C_1) / (1 + 0.0131 * C_1)) + 0.638
+    S_H = S_C * (F * T + 1 - F)
+    return S_L, S_C, S_H
+
+
+def delta_e_cmc(lab_1, lab_2, pl=2, pc=1):
+    """Calculate the Delta E (CMC l:c) between Lab colors.
+
+    Args:
+      lab_1 (array_like): Reference Lab triple(s), the last axis holding L, a and b.
+      lab_2 (array_like): Lab triple(s), broadcastable against `lab_1`.
+      pl (float, optional): Lightness weight `l`, 2 for acceptability
+        (the default) or 1 for perceptibility.
+      pc (float, optional): Chroma weight `c`. Defaults to 1.
+
+    Returns:
+      An array of distances with the broadcast shape of both arguments
+      (minus the last axis).
+
+    Examples:
+      >>> delta_e_cmc([50.0, 2.6772, -79.7751], [[50.0, 0.0, -82.7485]])
+      array([1.73873611])
+
+    """
+    delta_L, delta_C, delta_H, C_1 = _lch_differences(lab_1, lab_2)
+    S_L, S_C, S_H = cmc_weights(lab_1)
+    L_term = delta_L / (pl * S_L)
+    C_term = delta_C / (pc * S_C)
+    H_term = delta_H / S_H
+    return numpy.sqrt(L_term * L_term + C_term * C_term + H_term * H_term)
+
+
+def delta_e_cie2000(lab_1, lab_2, Kl=1, Kc=1, Kh=1):
+    """Calculate the Delta E (CIE2000) between Lab colors.
+
+    Args:
+      lab_1 (array_like): Lab triple(s), the last axis holding L, a and b.
+      lab_2 (array_like): Lab triple(s), broadcastable against `lab_1`.
+
+    Returns:
+      An array of distances with the broadcast shape of both arguments
+      (minus the last axis).
+
+    Examples:
+      >>> delta_e_cie2000([50.0, 2.6772, -79.7751], [[50.0, 0.0, -82.7485]])
+      array([2.04245968])
+
+    """
+    lab_1 = numpy.asarray(lab_1, dtype=numpy.float64)
+    lab_2 = numpy.asarray(lab_2, dtype=numpy.float64)
+    L1, a1, b1 = lab_1[..., 0], lab_1[..., 1], lab_1[..., 2]
+    L2, a2, b2 = lab_2[..., 0], lab_2[..., 1], lab_2[..., 2]
+
+    avg_Lp = (L1 + L2) / 2.0
+
+    C1 = numpy.sqrt(a1 * a1 + b1 * b1)
+    C2 = numpy.sqrt(a2 * a2 + b2 * b2)
+    avg_C1_C2_7 = _pow7((C1 + C2) / 2.0)
+
+    G = 0.5 * (1 - numpy.sqrt(avg_C1_C2_7 / (avg_C1_C2_7 + _25_POW_7)))
+
+    a1p = (1.0 + G) * a1
+    a2p = (1.0 + G) * a2
+
+    C1p = numpy.sqrt(a1p * a1p + b1 * b1)
+    C2p = numpy.sqrt(a2p * a2p + b2 * b2)
+    avg_C1p_C2p = (C1p + C2p) / 2.0
+
+    h1p = numpy.degrees(numpy.arctan2(b1, a1p))
+    h1p += (h1p < 0) * 360
+    h2p = numpy.degrees(numpy.arctan2(b2, a2p))
+    h2p += (h2p < 0) * 360
+
+    avg_Hp = (((numpy.fabs(h1p - h2p) > 180) * 360) + h1p + h2p) / 2.0
+
+    # T = 1 - 0.17 cos(h - 30°) + 0.24 cos(2h) + 0.32 cos(3h + 6°) - 0.2 cos(4h - 63°),
+    # expanded with multiple angle formulas to save three of four cosines
+    avg_Hp_radians = numpy.radians(avg_Hp)
+    cos_1 = numpy.cos(avg_Hp_radians)
+    sin_1 = numpy.sin(avg_Hp_radians)
+    cos_2 = 2 * cos_1 * cos_1 - 1
+    sin_2 = 2 * sin_1 * cos_1
+    cos_3 = cos_2 * cos_1 - sin_2 * sin_1
+    sin_3 = sin_2 * cos_1 + cos_2 * sin_1
+    cos_4 = 2 * cos_2 * cos_2 - 1
+    sin_4 = 2 * sin_2 * cos_2
+    T = (1 - 0.17 * (cos_1 * _COS_30 + sin_1 * _SIN_30) +
+         0.24 * cos_2 +
+         0.32 * (cos_3 * _COS_6 - sin_3 * _SIN_6) -
+         0.2 * (cos_4 * _COS_63 + sin_4 * _SIN_63))
+
+    diff_h2p_h1p = h2p - h1p
+    delta_hp = diff_h2p_h1p + (numpy.fabs(diff_h2p_h1p) > 180) * 360
+    delta_hp -= (h2p > h1p) * 720
+
+    delta_Lp = L2 - L1
+    delta_Cp = C2p - C1p
+    delta_Hp = 2 * numpy.sqrt(C2p * C1p) * numpy.sin(numpy.radians(delta_hp) / 2.0)
+
+    avg_Lp_50_sq = (avg_Lp - 50) * (avg_Lp - 50)
+    S_L = 1 + (0.015 * avg_Lp_50_sq) / numpy.sqrt(20 + avg_Lp_50_sq)
+    S_C = 1 + 0.045 * avg_C1p_C2p
+    S_H = 1 + 0.015 * avg_C1p_C2p * T
+
+    avg_Hp_275 = (avg_Hp - 275) / 25
+    delta_ro = 30 * numpy.exp(-avg_Hp_275 * avg_Hp_275)
+    avg_C1p_C2p_7 = _pow7(avg_C1p_C2p)
+    R_C = numpy.sqrt(avg_C1p_C2p_7 / (avg_C1p_C2p_7 + _25_POW_7))
+    R_T = -2 * R_C * numpy.sin(2 * numpy.radians(delta_ro))
+
+    L_term = delta_Lp / (S_L * Kl)
+    C_term = delta_Cp / (S_C * Kc)
+    H_term = delta_Hp / (S_H * Kh)
+
+    return numpy.sqrt(L_term * L_term + C_term * C_term + H_term * H_term +
+                      R_T * C_term * H_term)
+
+
+# The color difference formulas by the name of the `metric` argument of the lookup functions
+METRICS = {
+    "cie76": delta_e_cie1976,
+    "cie94": delta_e_cie1994,
+    "cmc": delta_e_cmc,
+    "cie2000": delta_e_cie2000,
+}
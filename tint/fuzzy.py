@@ -0,0 +1,230 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Fuzzy scoring of color names that were processed in advance.
+
+``fuzzywuzzy.process.extract`` cleans every choice, splits it into tokens
+and sorts them on every call, and both of its scorers we use do so again.
+Color names only change when colors are added, so :func:`prepare` does this
+once per name, and :func:`extract` only processes the query. The scores are
+the ones of ``fuzzywuzzy.process.extract`` with ``fuzz.WRatio`` (its default
+scorer) and with ``fuzz.token_set_ratio``: the scorers below follow fuzzywuzzy
+step by step. Strings are compared like ``fuzz.ratio`` and
+``fuzz.partial_ratio`` do, but by calling python-Levenshtein (which these
+use as well) directly, since most of their time goes into wrapping it. Without
+python-Levenshtein, fuzzywuzzy's own functions are used.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import heapq
+import operator
+import re
+
+try:
+    import Levenshtein
+except ImportError:
+    Levenshtein = None
+
+_UNBASE_SCALE = 0.95
+
+# What fuzzywuzzy replaces by spaces, except for the line breaks separating
+# the names processed together by prepare_many
+_NON_WORD_EXCEPT_NEWLINE = re.compile(r"(?ui)[^\w\n]")
+
+#: A color name in the forms the scorers compare. Every registered name has
+#: one, so it is kept small: color names have few tokens, which are searched
+#: in a tuple rather than a set, and the processed name and its sorted
+#: tokens are the given name itself whenever they are equal to it.
+#:
+#: Attributes:
+#:   processed (string): The name as processed by fuzzywuzzy.
+#:   sorted_tokens (string): Its tokens, sorted and joined by spaces.
+#:   unique_tokens (tuple): Its distinct tokens, sorted.
+Choice = collections.namedtuple("Choice", ["processed", "sorted_tokens", "unique_tokens"])
+
+
+def prepare(name, shared_tokens=None):
+    """Return the :class:`Choice` of a color name, as ``extract`` processes choices.
+
+    Words like "light" or "dark" recur in many color names; when preparing
+    many names, pass the same dict as `shared_tokens` for every name, so
+    that their choices share one string per distinct token.
+    """
+    import fuzzywuzzy.utils
+
+    return _choice(name, fuzzywuzzy.utils.full_process(name, force_ascii=True), shared_tokens)
+
+
+def prepare_many(names, shared_tokens=None):
+    """Return the :class:`Choice` of each of the color names, see :func:`prepare`.
+
+    The names are processed as one string, which is faster than processing
+    them one by one.
+    """
+    import fuzzywuzzy.utils
+
+    if any("\n" in name for name in names):
+        return [prepare(name, shared_tokens) for name in names]
+    # The steps of full_process, each done once for all names
+    processed_names = _NON_WORD_EXCEPT_NEWLINE.sub(
+        b" ", fuzzywuzzy.utils.asciidammit("\n".join(names))
+    ).lower().split(b"\n")
+    return [
+        _choice(name, processed.strip(), shared_tokens)
+        for name, processed in zip(names, processed_names)
+    ]
+
+
+def _choice(name, processed, shared_tokens):
+    if processed == name:
+        processed = name
+    tokens = processed.split()
+    if len(tokens) == 1:
+        return Choice(processed, processed, (processed,))
+    if shared_tokens is not None:
+        tokens = [shared_tokens.setdefault(token, token) for token in tokens]
+    unique_tokens = tuple(sorted(set(tokens)))
+    sorted_tokens = " ".join(unique_tokens if len(unique_tokens) == len(tokens) else sorted(tokens))
+    if sorted_tokens == processed:
+        sorted_tokens = processed
+    return Choice(processed, sorted_tokens, unique_tokens)
+
+
+def prepare_query(query):
+    """Return the :class:`Choice` of a query, as ``extract`` processes queries."""
+    import fuzzywuzzy.utils
+
+    return prepare(fuzzywuzzy.utils.full_process(query))
+
+
+def _consistent(s1, s2):
+    """Make both strings unicode if they differ in type, like fuzzywuzzy does."""
+    if type(s1) is not type(s2):
+        return unicode(s1), unicode(s2)
+    return s1, s2
+
+
+def _ratio(s1, s2):
+    """Like ``fuzz.ratio``."""
+    if Levenshtein is None:
+        import fuzzywuzzy.fuzz
+        return fuzzywuzzy.fuzz.ratio(s1, s2)
+    if s1 == s2:
+        return 100
+    if not s1 or not s2:
+        return 0
+    return int(round(100 * Levenshtein.ratio(*_consistent(s1, s2))))
+
+
+def _partial_ratio(s1, s2):
+    """Like ``fuzz.partial_ratio``: the ratio of the best matching substring."""
+    if Levenshtein is None:
+        import fuzzywuzzy.fuzz
+        return fuzzywuzzy.fuzz.partial_ratio(s1, s2)
+    if s1 == s2:
+        return 100
+    if not s1 or not s2:
+        return 0
+    s1, s2 = _consistent(s1, s2)
+    shorter, longer = (s1, s2) if len(s1) <= len(s2) else (s2, s1)
+    # The best substring is aligned with one of the blocks both strings share
+    blocks = Levenshtein.matching_blocks(Levenshtein.opcodes(shorter, longer), shorter, longer)
+    best = 0
+    for shorter_start, longer_start, length in blocks:
+        start = max(longer_start - shorter_start, 0)
+        ratio = Levenshtein.ratio(shorter, longer[start:start + len(shorter)])
+        if ratio > 0.995:
+            return 100
+        best = max(best, ratio)
+    return int(round(100 * best))
+
+
+def _token_set(query, choice, ratio):
+    """Token set ratio of two choices, without the equality and emptiness checks."""
+    query_tokens, choice_tokens = query.unique_tokens, choice.unique_tokens
+    intersection = b" ".join(t for t in query_tokens if t in choice_tokens)
+    query_rest = b" ".join(t for t in query_tokens if t not in choice_tokens)
+    choice_rest = b" ".join(t for t in choice_tokens if t not in query_tokens)
+    combined_query = (intersection + b" " + query_rest).strip()
+    combined_choice = (intersection + b" " + choice_rest).strip()
+    return max(
+        ratio(intersection, combined_query),
+        ratio(intersection, combined_choice),
+        ratio(combined_query, combined_choice),
+    )
+
+
+def token_set_ratio(query, choice):
+    """Like ``fuzz.token_set_ratio``, for a prepared query and choice."""
+    if query.processed == choice.processed:
+        return 100
+    if not query.processed or not choice.processed:
+        return 0
+    return _token_set(query, choice, _ratio)
+
+
+def wratio(query, choice):
+    """Like ``fuzz.WRatio``, for a prepared query and choice."""
+    processed_query, processed_choice = query.processed, choice.processed
+    if not processed_query or not processed_choice:
+        return 0
+
+    base = _ratio(processed_query, processed_choice)
+    length_ratio = (float(max(len(processed_query), len(processed_choice))) /
+                    min(len(processed_query), len(processed_choice)))
+    if length_ratio < 1.5:
+        # Strings of similar length, no partial matching
+        token_sort = _ratio(query.sorted_tokens, choice.sorted_tokens)
+        if processed_query == processed_choice:
+            token_set = 100
+        else:
+            token_set = _token_set(query, choice, _ratio)
+        return int(round(max(base, token_sort * _UNBASE_SCALE, token_set * _UNBASE_SCALE)))
+
+    partial_scale = 0.6 if length_ratio > 8 else 0.9
+    partial = _partial_ratio(processed_query, processed_choice) * partial_scale
+    token_sort = _partial_ratio(query.sorted_tokens, choice.sorted_tokens)
+    # Strings of different length are never equal
+    token_set = _token_set(query, choice, _partial_ratio)
+    return int(round(max(
+        base,
+        partial,
+        token_sort * _UNBASE_SCALE * partial_scale,
+        token_set * _UNBASE_SCALE * partial_scale,
+    )))
+
+
+def extract(query, choices, scorer=wratio, limit=5):
+    """Return the `limit` best scoring names, like ``fuzzywuzzy.process.extract``.
+
+    Args:
+      query (Choice): The prepared query, see :func:`prepare_query`.
+      choices (iterable of tuples): Pairs of a name and its :class:`Choice`.
+      scorer (function, optional): :func:`wratio` or :func:`token_set_ratio`.
+        Defaults to :func:`wratio`.
+      limit (int, optional): The number of names returned. Defaults to 5.
+
+    Returns:
+      A list of pairs of a name and its score, best first. Among equal
+      scores, names come in the order of `choices`.
+
+    """
+    scored = ((name, scorer(query, choice)) for name, choice in choices)
+    return heapq.nlargest(limit, scored, key=operator.itemgetter(1))
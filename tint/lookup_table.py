@@ -0,0 +1,251 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Precomputed nearest color tables covering the whole 24 bit sRGB space.
+
+A table holds, for every sRGB value ``0xrrggbb``, the index of the nearest
+color (according to CIEDE2000) in the Lab matrix of a color system, as an
+unsigned 16 bit integer. Tables are stored in a small file format, which is
+loaded as a read-only memory map, so that all processes on a host share the
+same pages:
+
+* 8 bytes magic (``TINTLUT\\0``), followed by the format version as an
+  unsigned 32 bit integer and the length of the fingerprint,
+* the fingerprint of the color system (an ASCII hex digest) the table
+  was computed for, padded with zero bytes to a total header size of 64 bytes,
+* ``2 ** 24`` little-endian unsigned 16 bit integers.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import multiprocessing
+import struct
+
+import numpy
+
+from . import color_diff
+from . import color_conversions
+from . import spatial
+
+SIZE = 2 ** 24
+MAX_COLORS = 2 ** 16
+
+_MAGIC = b"TINTLUT\0"
+_VERSION = 1
+_HEADER = struct.Struct(str("<8sII"))
+_HEADER_SIZE = 64
+_DTYPE = numpy.dtype(str("<u2"))
+
+# Edge length of the sRGB cubes that are resolved together
+_BLOCK_SIDE = 8
+# Number of colors whose exact distances bound the nearest distances within a cube
+_SEEDS = 8
+
+# Cubes with fewer values are not worth resolving together by nearest_in_cubes;
+# resolving a cube costs about as much as a few dozen single lookups
+_MIN_CUBE_VALUES = 32
+
+
+def fingerprint(lab_matrix, names):
+    """Hex digest identifying the Lab values and names of a color system."""
+    digest = hashlib.sha1(numpy.ascontiguousarray(lab_matrix, dtype=numpy.float64).tostring())
+    digest.update("\0".join(names).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compute(lab_matrix, processes=1):
+    """Compute the index of the nearest color for every sRGB value.
+
+    The sRGB space is processed in cubes of ``8 ** 3`` values. For each cube,
+    the exact distances to a few colors close to its center give an upper
+    bound for the nearest distance of every value in it. Exact distances are
+    then only computed for colors whose lower bound (see :mod:`tint.spatial`)
+    does not exceed that upper bound, first for the whole cube and then for
+    every single value. Results are identical to a full scan, including
+    tie-breaking.
+
+    This is a one-time, offline computation, and takes a few minutes per CPU
+    for a system of about a thousand colors.
+
+    Args:
+      lab_matrix (numpy.ndarray): Lab values of shape ``(M, 3)``, with
+        ``0 < M <= 2 ** 16``.
+      processes (int, optional): Number of worker processes. ``None`` uses
+        all CPUs. Defaults to 1.
+
+    Returns:
+      A ``uint16`` array of length ``2 ** 24``.
+
+    """
+    lab_matrix = numpy.asarray(lab_matrix, dtype=numpy.float64)
+    if not 0 < len(lab_matrix) <= MAX_COLORS:
+        raise ValueError(
+            "Lookup tables support 1 to %d colors, got %d." % (MAX_COLORS, len(lab_matrix))
+        )
+    # Every slab of reds covers a contiguous part of the table
+    tasks = [(lab_matrix, red) for red in range(0, 256, _BLOCK_SIDE)]
+    if processes == 1:
+        slabs = [_compute_slab(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            slabs = pool.map(_compute_slab, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    return numpy.concatenate(slabs)
+
+
+def nearest_in_cubes(lab_matrix, packed):
+    """Find the nearest colors of sRGB values that fill their sRGB cubes densely.
+
+    Values are grouped by the cubes of ``8 ** 3`` sRGB values :func:`compute`
+    works with, and the values of every cube holding enough of them are
+    resolved together, like :func:`compute` resolves whole cubes. For values
+    that cluster, like the pixels of photos, this is much faster than
+    resolving them one by one. Results are identical to a full scan,
+    including tie-breaking.
+
+    Args:
+      lab_matrix (numpy.ndarray): Lab values of shape ``(M, 3)``, with ``M > 0``.
+      packed (numpy.ndarray): Distinct sRGB values, packed into integers
+        (``0xRRGGBB``).
+
+    Returns:
+      An array with the index of the nearest color of each value, or -1 for
+      the values of cubes holding too few of them.
+
+    """
+    lab_matrix = numpy.asarray(lab_matrix, dtype=numpy.float64)
+    packed = numpy.asarray(packed, dtype=numpy.uint32)
+    indices = numpy.full(len(packed), -1, dtype=numpy.intp)
+    cube_mask = (0xff // _BLOCK_SIDE) * _BLOCK_SIDE
+    cubes = packed & ((cube_mask << 16) | (cube_mask << 8) | cube_mask)
+    order = numpy.argsort(cubes, kind="mergesort")
+    cubes = cubes[order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True], cubes[1:] != cubes[:-1])))
+    stops = numpy.append(starts[1:], len(cubes))
+    dense = stops - starts >= _MIN_CUBE_VALUES
+    if not dense.any():
+        return indices
+
+    lightness_offset = numpy.abs(lab_matrix[:, 0] - 50)
+    chroma = numpy.hypot(lab_matrix[:, 1], lab_matrix[:, 2])
+    for start, stop in zip(starts[dense].tolist(), stops[dense].tolist()):
+        positions = order[start:stop]
+        rgb_values = numpy.column_stack(
+            (packed[positions] >> 16, (packed[positions] >> 8) & 0xff, packed[positions] & 0xff)
+        )
+        labs = color_conversions.rgb_to_lab(rgb_values)
+        indices[positions] = _nearest_in_cube(labs, lab_matrix, lightness_offset, chroma)
+    return indices
+
+
+def _nearest_in_cube(labs, lab_matrix, lightness_offset, chroma):
+    """Return the indices of the nearest colors of Lab values from one sRGB cube."""
+    seeds = min(_SEEDS, len(lab_matrix))
+    low, high = labs.min(axis=0), labs.max(axis=0)
+
+    # Upper bounds for the nearest distances of the values in the cube
+    center = color_diff.delta_e_cie2000(labs[len(labs) // 2], lab_matrix)
+    seed_indices = numpy.argpartition(center, seeds - 1)[:seeds]
+    upper_bounds = color_diff.delta_e_cie2000(
+        labs[:, numpy.newaxis, :], lab_matrix[seed_indices]
+    ).min(axis=1) * (1 + spatial.EPSILON) + spatial.EPSILON
+
+    # Candidates for the whole cube ...
+    lower_bounds = spatial.lower_bound(
+        spatial.box_gaps(low, high, lab_matrix),
+        (max(abs(low[0] - 50), abs(high[0] - 50)) + lightness_offset) / 2.0,
+        (numpy.sqrt(max(low[1] ** 2, high[1] ** 2) + max(low[2] ** 2, high[2] ** 2)) +
+         chroma) / 2.0
+    )
+    candidates = numpy.flatnonzero(lower_bounds <= upper_bounds.max())
+    candidate_labs = lab_matrix[candidates]
+
+    # ... and for every single value
+    lower_bounds = spatial.lower_bound(
+        numpy.abs(labs[:, numpy.newaxis, :] - candidate_labs),
+        (numpy.abs(labs[:, numpy.newaxis, 0] - 50) + lightness_offset[candidates]) / 2.0,
+        (numpy.hypot(labs[:, numpy.newaxis, 1], labs[:, numpy.newaxis, 2]) +
+         chroma[candidates]) / 2.0
+    )
+    value_indices, candidate_indices = numpy.nonzero(
+        lower_bounds <= upper_bounds[:, numpy.newaxis]
+    )
+    distances = numpy.empty(lower_bounds.shape)
+    distances.fill(numpy.inf)
+    distances[value_indices, candidate_indices] = color_diff.delta_e_cie2000(
+        labs[value_indices], candidate_labs[candidate_indices]
+    )
+    return candidates[numpy.argmin(distances, axis=1)]
+
+
+def _compute_slab(task):
+    lab_matrix, red = task
+    lightness_offset = numpy.abs(lab_matrix[:, 0] - 50)
+    chroma = numpy.hypot(lab_matrix[:, 1], lab_matrix[:, 2])
+
+    steps = numpy.arange(_BLOCK_SIDE)
+    block_rgb = numpy.array(numpy.meshgrid(steps, steps, steps, indexing="ij")).reshape(3, -1).T
+    block_offsets = (block_rgb[:, 0] << 16) | (block_rgb[:, 1] << 8) | block_rgb[:, 2]
+
+    slab = numpy.empty(_BLOCK_SIDE << 16, dtype=_DTYPE)
+    for green in range(0, 256, _BLOCK_SIDE):
+        for blue in range(0, 256, _BLOCK_SIDE):
+            labs = color_conversions.rgb_to_lab(block_rgb + (red, green, blue))
+            slab[block_offsets + ((green << 8) | blue)] = _nearest_in_cube(
+                labs, lab_matrix, lightness_offset, chroma
+            )
+    return slab
+
+
+def save(filename, table, system_fingerprint):
+    """Write a table computed by :func:`compute` to `filename`."""
+    system_fingerprint = system_fingerprint.encode("ascii")
+    header = _HEADER.pack(_MAGIC, _VERSION, len(system_fingerprint)) + system_fingerprint
+    if len(header) > _HEADER_SIZE:
+        raise ValueError("Fingerprint too long.")
+    with open(filename, "wb") as f:
+        f.write(header.ljust(_HEADER_SIZE, b"\0"))
+        f.write(numpy.asarray(table, dtype=_DTYPE).tostring())
+
+
+def load(filename):
+    """Memory-map a table written by :func:`save`.
+
+    Returns:
+      A tuple of the read-only table and the fingerprint it was computed for.
+
+    Raises:
+      ValueError: If `filename` is no lookup table of a supported version.
+
+    """
+    with open(filename, "rb") as f:
+        header = f.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE:
+        raise ValueError("%r is not a tint lookup table." % filename)
+    magic, version, fingerprint_length = _HEADER.unpack_from(header)
+    if magic != _MAGIC:
+        raise ValueError("%r is not a tint lookup table." % filename)
+    if version != _VERSION:
+        raise ValueError("%r has unsupported lookup table version %d." % (filename, version))
+    system_fingerprint = header[_HEADER.size:_HEADER.size + fingerprint_length].decode("ascii")
+    table = numpy.memmap(filename, dtype=_DTYPE, mode="r", offset=_HEADER_SIZE, shape=(SIZE,))
+    return table, system_fingerprint
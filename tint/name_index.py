@@ -0,0 +1,127 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Inverted index of color names for choosing fuzzy matching candidates."""
+
+from __future__ import unicode_literals
+
+import heapq
+import operator
+
+# A shared token says more about two color names than a shared trigram
+_TOKEN_WEIGHT = 3
+
+
+def process(name):
+    """Process a name the way ``fuzzywuzzy.process.extract`` does for its scorers."""
+    import fuzzywuzzy.utils
+
+    return fuzzywuzzy.utils.full_process(name, force_ascii=True)
+
+
+def _terms(processed):
+    padded = " %s " % processed
+    trigrams = set(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams, set(processed.split())
+
+
+class NgramIndex(object):
+    """Character trigram and token index over color names.
+
+    Names are indexed in the form the fuzzy scorers compare them (see
+    :func:`process`), so that the candidates sharing the most trigrams and
+    tokens with a query are the ones most likely to score high.
+
+    """
+    def __init__(self):
+        self._names_by_trigram = {}
+        self._names_by_token = {}
+        self._term_count_by_name = {}
+
+    def add(self, name):
+        trigrams, tokens = _terms(process(name))
+        self._term_count_by_name[name] = len(trigrams) + _TOKEN_WEIGHT * len(tokens)
+        for trigram in trigrams:
+            self._names_by_trigram.setdefault(trigram, set()).add(name)
+        for token in tokens:
+            self._names_by_token.setdefault(token, set()).add(name)
+
+    def updated(self, added=(), removed=()):
+        """Return a new index with names added and removed, leaving this one unchanged.
+
+        The new index shares the name sets of all terms that are not
+        affected, so the cost depends on the changed names, not on the size
+        of the index (apart from copying the term dicts).
+        """
+        index = NgramIndex()
+        index._names_by_trigram = dict(self._names_by_trigram)
+        index._names_by_token = dict(self._names_by_token)
+        index._term_count_by_name = dict(self._term_count_by_name)
+        # Terms whose name sets were already copied for the new index
+        copied = set()
+
+        def names_of(names_by_term, term):
+            key = (id(names_by_term), term)
+            if key not in copied:
+                names_by_term[term] = set(names_by_term.get(term, ()))
+                copied.add(key)
+            return names_by_term[term]
+
+        for name in removed:
+            if index._term_count_by_name.pop(name, None) is None:
+                continue
+            trigrams, tokens = _terms(process(name))
+            for names_by_term, terms in ((index._names_by_trigram, trigrams),
+                                         (index._names_by_token, tokens)):
+                for term in terms:
+                    names = names_of(names_by_term, term)
+                    names.discard(name)
+                    if not names:
+                        del names_by_term[term]
+        for name in added:
+            trigrams, tokens = _terms(process(name))
+            index._term_count_by_name[name] = len(trigrams) + _TOKEN_WEIGHT * len(tokens)
+            for term in trigrams:
+                names_of(index._names_by_trigram, term).add(name)
+            for term in tokens:
+                names_of(index._names_by_token, term).add(name)
+        return index
+
+    def shortlist(self, query, limit):
+        """Return up to `limit` names most similar to `query`.
+
+        Similarity is the Dice coefficient of the trigrams and tokens of both
+        strings, so that short names sharing most of their terms with the query
+        rank before long names that just happen to share many terms. Names
+        sharing nothing with the query are never returned.
+        """
+        trigrams, tokens = _terms(process(query))
+        weights = {}
+        for trigram in trigrams:
+            for name in self._names_by_trigram.get(trigram, ()):
+                weights[name] = weights.get(name, 0) + 1
+        for token in tokens:
+            for name in self._names_by_token.get(token, ()):
+                weights[name] = weights.get(name, 0) + _TOKEN_WEIGHT
+        query_term_count = len(trigrams) + _TOKEN_WEIGHT * len(tokens)
+        similarities = (
+            (name, float(weight) / (query_term_count + self._term_count_by_name[name]))
+            for name, weight in weights.iteritems()
+        )
+        best = heapq.nlargest(limit, similarities, key=operator.itemgetter(1))
+        return [name for name, similarity in best]
@@ -24,21 +24,82 @@ import collections
 import sys
 import csv
 import operator
+import itertools
+import multiprocessing
+import threading
+import copy
+import hashlib
+import json
+import zlib
 
-import pkg_resources
+import numpy
 
-import icu
-
-import colormath
-import colormath.color_diff
-import colormath.color_objects
-import colormath.color_conversions
-
-import fuzzywuzzy.process
-import fuzzywuzzy.fuzz
+from . import color_diff
+from . import color_conversions
+from . import spatial
+from . import lookup_table
+from . import fuzzy
+from . import name_index
+from . import cache
+from . import snapshot
+from . import stats as stats_
 
 MatchResult = collections.namedtuple("MatchResult", ("hex_code", "score"))
 FindResult = collections.namedtuple("FindResult", ("color_name", "distance"))
+HistogramEntry = collections.namedtuple("HistogramEntry", ("color_name", "pixels"))
+LoadResult = collections.namedtuple("LoadResult", ("colors", "errors"))
+LoadError = collections.namedtuple("LoadError", ("line", "message"))
+
+# Upper bound for the number of query/candidate pairs compared in one vectorized
+# block; keeps the temporaries of the distance formula small enough to stay in cache
+_BLOCK_SIZE = 2 ** 14
+
+# Color systems of at least this size get a spatial index; for smaller systems,
+# a vectorized full scan is faster
+_LAB_TREE_MIN_SIZE = 2048
+
+# Upper bound for the number of colors converted to Lab at once; keeps the
+# temporaries of the conversion small for large color systems
+_LAB_BATCH_SIZE = 2 ** 16
+
+# Bucket counts up to this are counted by name_histogram with one counter per
+# bucket, larger ones (e.g. exact 24 bit values) by sorting the pixels
+_MAX_COUNTED_BUCKETS = 2 ** 18
+
+# Rows of a color definition file validated at once by bulk_load, and bytes
+# read from it at once
+_LOAD_CHUNK_SIZE = 2 ** 14
+_READ_SIZE = 2 ** 16
+
+# The (lower case) hex digits, by byte value
+_HEX_DIGITS = numpy.zeros(256, dtype=bool)
+_HEX_DIGITS[numpy.frombuffer(b"0123456789abcdef", dtype=numpy.uint8)] = True
+
+# Generations of color systems are unique across registries
+_generations = itertools.count(1)
+
+# Chunks per worker process in match_name_many; more chunks balance the load
+# better, fewer keep the inter-process communication down
+_CHUNKS_PER_PROCESS = 4
+
+# The registry of a worker process of match_name_many, set by the pool's
+# initializer; forked workers inherit it instead of having it pickled for
+# every task. Each pool passes its own registry, so concurrent calls never
+# share this.
+_forked_registry = None
+
+
+def _init_match_name_worker(registry):
+    global _forked_registry
+    _forked_registry = registry
+
+
+def _match_name_chunk(task):
+    in_strings, fuzzy, shortlist, system = task
+    return [
+        _forked_registry._match_name_or_none(s, fuzzy, shortlist, system, False)
+        for s in in_strings
+    ]
 
 
 def _hex_to_rgb(hex_code):
@@ -48,44 +109,815 @@ def _hex_to_rgb(hex_code):
     """
     if len(hex_code) != 6:
         raise ValueError(hex_code + " is not a string of length 6, cannot convert to rgb.")
-    return tuple(map(ord, hex_code.decode("hex")))
+    return tuple(map(ord, _decode_hex(hex_code)))
+
+
+def _hex_to_packed(hex_code):
+    """
+    >>> _hex_to_packed("007fff") == 0x007fff
+    True
+    """
+    if len(hex_code) != 6:
+        raise ValueError(hex_code + " is not a string of length 6, cannot convert to rgb.")
+    # Validates the hex digits, which int() is less strict about
+    _decode_hex(hex_code)
+    return int(hex_code, 16)
+
+
+def _decode_hex(hex_code):
+    try:
+        return hex_code.decode("hex")
+    except TypeError:
+        raise ValueError(hex_code + " is not a hex code, cannot convert to rgb.")
 
 
 def _hex_to_lab(hex_code):
-    rgb_values = _hex_to_rgb(hex_code)
-    rgb_color = colormath.color_objects.sRGBColor(*rgb_values, is_upscaled=True)
-    return colormath.color_conversions.convert_color(rgb_color, colormath.color_objects.LabColor)
+    """
+    >>> [round(value, 2) for value in _hex_to_lab("007fff")]
+    [54.45, 19.41, -71.36]
+    """
+    return color_conversions.rgb_to_lab_scalar(_hex_to_rgb(hex_code))
+
 
+def _hex_codes_to_rgb(hex_codes):
+    """Return an ``(N, 3)`` array of the sRGB values of validated hex codes."""
+    rgb_values = numpy.frombuffer(b"".join(hex_codes).decode("hex"), dtype=numpy.uint8)
+    return rgb_values.reshape(-1, 3)
+
+
+def _nearest(lab_values, lab_matrix, chunk_size=None, metric="cie2000"):
+    """Return indices into `lab_matrix` and distances of the nearest colors.
+
+    The N x M distance matrix is computed in chunks of `chunk_size` rows, so
+    memory stays bounded regardless of the number of query colors. CIEDE2000
+    distances are only computed where a cheap lower bound does not rule them
+    out.
+    """
+    if chunk_size is None:
+        chunk_size = max(1, _BLOCK_SIZE // max(1, len(lab_matrix)))
+    indices = numpy.empty(len(lab_values), dtype=numpy.intp)
+    distances = numpy.empty(len(lab_values), dtype=numpy.float64)
+    delta_e = color_diff.METRICS[metric]
+    for start in range(0, len(lab_values), chunk_size):
+        chunk = lab_values[start:start + chunk_size]
+        if metric == "cie2000":
+            chunk_indices, chunk_distances = spatial.nearest_pruned(chunk, lab_matrix)
+        else:
+            all_distances = delta_e(chunk[:, numpy.newaxis, :], lab_matrix)
+            chunk_indices = numpy.argmin(all_distances, axis=1)
+            chunk_distances = all_distances[numpy.arange(len(chunk)), chunk_indices]
+        indices[start:start + chunk_size] = chunk_indices
+        distances[start:start + chunk_size] = chunk_distances
+    return indices, distances
+
+
+def _nearest_rgb(rgb_values, lab_matrix, lab_tree, chunk_size, metric):
+    """Like :func:`_nearest`, for ``(N, 3)`` sRGB values, using `lab_tree` unless it is None."""
+    lab_values = color_conversions.rgb_to_lab(rgb_values)
+    if lab_tree is not None:
+        indices, distances = zip(*[lab_tree.nearest(lab, metric) for lab in lab_values])
+        return numpy.array(indices, dtype=numpy.intp), numpy.array(distances)
+    return _nearest(lab_values, lab_matrix, chunk_size, metric)
+
+
+def _check_metric(metric):
+    if metric not in color_diff.METRICS:
+        raise ValueError(
+            "Unknown metric %r, use one of %s." % (metric, ", ".join(sorted(color_diff.METRICS)))
+        )
+
+
+_normalizer = None
+
+
+def _normalize(in_string):
+    # ICU is only imported (and the normalizer built) when first needed
+    global _normalizer
+    if _normalizer is None:
+        import icu
+        _normalizer = icu.Normalizer2.getInstance(
+            None,
+            "nfkc_cf",
+            icu.UNormalizationMode2.COMPOSE
+        ).normalize
+    return _normalizer(in_string)
+
+
+def _hex_in_scope(scope, normalized_name):
+    """Return the hex code of a name in the first name matching data defining it, or None."""
+    for names in scope:
+        hex_code = names.hex_code(normalized_name)
+        if hex_code is not None:
+            return hex_code
+    return None
+
+
+def _fuzzy_choice_in_scope(scope, normalized_name):
+    for names in scope:
+        choice = names.fuzzy_choice(normalized_name)
+        if choice is not None:
+            return choice
+
+
+def _pack(rgb_values):
+    """Return ``(N, 3)`` sRGB values packed into integers (``0xRRGGBB``)."""
+    rgb_values = numpy.asarray(rgb_values, dtype=numpy.uint32).reshape(-1, 3)
+    return (rgb_values[:, 0] << 16) | (rgb_values[:, 1] << 8) | rgb_values[:, 2]
+
+
+def _unpack(packed):
+    """Return the ``(N, 3)`` sRGB values of packed integers."""
+    packed = numpy.asarray(packed, dtype=numpy.uint32)
+    return numpy.column_stack((packed >> 16, (packed >> 8) & 0xff, packed & 0xff))
+
+
+def _parse_colors(colors):
+    """Validate and clean color name / hex code pairs.
+
+    Returns:
+      A tuple of the list of hex codes and the list of color names.
+    """
+    hex_codes = []
+    names = []
+    for color_name, hex_code in colors:
+        hex_code = hex_code.lower().strip().strip("#")
+        _hex_to_rgb(hex_code)
+        hex_codes.append(hex_code)
+        names.append(_clean_name(color_name))
+    return hex_codes, names
 
-_normalize = icu.Normalizer2.getInstance(
-    None,
-    "nfkc_cf",
-    icu.UNormalizationMode2.COMPOSE
-).normalize
+
+def _clean_name(color_name):
+    """Return a color name the way color systems store it."""
+    color_name = color_name.lower().strip()
+    if not isinstance(color_name, unicode):
+        color_name = unicode(color_name, "utf-8")
+    return color_name
+
+
+def _normalize_names(names):
+    """Normalize color names, sharing the strings of the ones that are normalized already."""
+    normalized_names = []
+    for color_name in names:
+        normalized_name = _normalize(color_name)
+        normalized_names.append(color_name if normalized_name == color_name else normalized_name)
+    return normalized_names
+
+
+def _read_colors_file(f_or_filename):
+    if hasattr(f_or_filename, "read"):
+        return (row for row in csv.reader(f_or_filename) if row)
+    with open(f_or_filename, "rb") as f:
+        return [row for row in csv.reader(f) if row]
+
+
+def _colors_file_format(f_or_filename):
+    """Tell the format of a color definition file from its name: "jsonl" or "csv"."""
+    filename = f_or_filename
+    if not isinstance(filename, basestring):
+        filename = getattr(f_or_filename, "name", None)
+        if not isinstance(filename, basestring):
+            return "csv"
+    base, ext = os.path.splitext(filename.lower())
+    if ext == ".gz":
+        ext = os.path.splitext(base)[1]
+    return "jsonl" if ext in (".jsonl", ".ndjson") else "csv"
+
+
+def _colors_file_lines(f):
+    """Yield the lines of a color definition file, decompressing gzip files on the fly."""
+    pieces = iter(lambda: f.read(_READ_SIZE), b"")
+    first = next(pieces, b"")
+    pieces = itertools.chain([first], pieces)
+    if first.startswith(b"\x1f\x8b"):
+        pieces = _gunzip(pieces)
+    rest = b""
+    for piece in pieces:
+        lines = (rest + piece).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if rest:
+        yield rest
+
+
+def _gunzip(pieces):
+    """Decompress gzip data, which may consist of several concatenated members."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        for piece in pieces:
+            while piece:
+                yield decompressor.decompress(piece)
+                piece = decompressor.unused_data
+                if piece:
+                    # The next member starts
+                    yield decompressor.flush()
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield decompressor.flush()
+    except zlib.error as error:
+        raise ValueError("Invalid gzip data: %s" % error)
+
+
+def _csv_rows(lines):
+    """Yield the line number, color name, hex code and error message of each csv row.
+
+    The error message is None for well formed rows, the color name and hex
+    code are None for malformed ones.
+    """
+    reader = csv.reader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield int(reader.line_num), None, None, "invalid csv: %s" % error
+            continue
+        if len(row) == 2:
+            yield int(reader.line_num), row[0], row[1], None
+        elif row:
+            yield (int(reader.line_num), None, None,
+                   "expected a color name and a hex code, got %d fields" % len(row))
+
+
+def _jsonl_rows(lines):
+    """Like :func:`_csv_rows`, for JSON lines."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, None, "invalid JSON: %s" % error
+            continue
+        if isinstance(row, dict):
+            row = [row.get("color_name"), row.get("hex_code")]
+        if (isinstance(row, list) and len(row) == 2 and
+                all(isinstance(value, basestring) for value in row)):
+            # Hex codes are validated as bytes, other characters stay invalid
+            yield line_number, row[0], row[1].encode("ascii", "replace"), None
+        else:
+            yield line_number, None, None, "expected a color name and a hex code, got %r" % (row,)
+
+
+_ROW_READERS = {"csv": _csv_rows, "jsonl": _jsonl_rows}
+
+
+def _parse_color_rows(rows):
+    """Validate and clean the rows read by :func:`_csv_rows`, checking all hex codes at once.
+
+    Returns:
+      A tuple of the list of hex codes and the list of color names of the
+      well formed rows (see :func:`_parse_colors`), and a list of
+      :class:`LoadError` tuples for the others.
+    """
+    errors = [LoadError(line, error) for line, _, _, error in rows if error is not None]
+    if errors:
+        rows = [row for row in rows if row[3] is None]
+    try:
+        names = [_clean_name(row[1]) for row in rows]
+    except UnicodeDecodeError:
+        names = []
+        for row in rows:
+            try:
+                names.append(_clean_name(row[1]))
+            except UnicodeDecodeError:
+                names.append(None)
+    hex_codes = [row[2].lower().strip().strip(b"#") for row in rows]
+
+    valid = numpy.array([len(hex_code) == 6 for hex_code in hex_codes], dtype=bool)
+    if valid.any():
+        digits = numpy.frombuffer(b"".join(itertools.compress(hex_codes, valid)), numpy.uint8)
+        valid[valid] = _HEX_DIGITS[digits].reshape(-1, 6).all(axis=1)
+    valid &= numpy.array([bool(color_name) for color_name in names], dtype=bool)
+    if not valid.all():
+        for position in numpy.flatnonzero(~valid).tolist():
+            line, color_name, hex_code, _ = rows[position]
+            if names[position] is None:
+                message = "color name %r is not UTF-8 encoded" % color_name
+            elif not names[position]:
+                message = "empty color name"
+            else:
+                message = "invalid hex code %r" % hex_code
+            errors.append(LoadError(line, message))
+        errors.sort()
+        hex_codes = list(itertools.compress(hex_codes, valid))
+        names = list(itertools.compress(names, valid))
+    return hex_codes, names, errors
+
+
+class _ColorSystem(object):
+    """The colors of one color system, stored column by column.
+
+    Every sRGB value is one row, named after the last color defined with
+    it, so redefining colors never grows a system. The rows are kept in
+    columns (packed sRGB values, color names and Lab values) rather than as
+    an object per color; hex codes are only formatted for results.
+
+    The color names the system defines, so that
+    :meth:`TintRegistry.match_name` can search single systems, form a
+    table of their own: `name_positions` maps each normalized name to its
+    position, and the other columns of the table hold the name's row and
+    its fuzzy choice. Names that are normalized already share their string
+    with the row names. Fuzzy choices are only prepared on the first fuzzy
+    match, so registries only used for exact lookups never pay for them.
+
+    Instances are never changed once they are part of a registry's state;
+    changes create new instances, which share whatever the change leaves
+    valid: renaming colors keeps the Lab matrix, the spatial index and the
+    lookup table, adding colors keeps the Lab values of the existing ones.
+    Lab values, the spatial index, the sorted sRGB values for exact lookups,
+    the fuzzy choices and the fuzzy matching index are computed on first
+    use and then kept,
+    which is safe without locking because they only depend on the colors.
+
+    Attributes:
+      rgb (numpy.ndarray): Packed sRGB values (``0xRRGGBB``) of the rows.
+      names (list): Color names of the rows.
+      name_positions (dict): Maps the normalized color names defined by the
+        system to their position in the name table.
+      color_names (list): The normalized color names of the name table.
+      name_rows (numpy.ndarray): The row of each name of the name table.
+      fuzzy_choices (list): The :class:`tint.fuzzy.Choice` of each name of
+        the name table, prepared for fuzzy scoring, or None if not prepared
+        yet (see :meth:`get_fuzzy_choices`).
+      lookup_table (numpy.ndarray): Precomputed nearest colors, or None.
+      generation (int): Identifies the colors, unique across registries.
+
+    """
+    def __init__(self, rgb, names, color_names, name_rows, fuzzy_choices, lab_matrix,
+                 lab_tree=None, lookup_table=None, name_positions=None):
+        if name_positions is None:
+            name_positions = dict(zip(color_names, itertools.count()))
+        self.rgb = rgb
+        self.names = names
+        self.name_positions = name_positions
+        self.color_names = color_names
+        self.name_rows = name_rows
+        self.fuzzy_choices = fuzzy_choices
+        self.lookup_table = lookup_table
+        self.generation = next(_generations)
+        self.name_index = None
+        # The Lab values of the leading rows (the others are converted on
+        # first use) and the spatial index, replaced as one
+        self._lab = (lab_matrix, lab_tree)
+        # The sorted sRGB values and the rows they belong to
+        self._sorted_rgb = None
+        self._fingerprint = None
+
+    @classmethod
+    def create(cls, hex_codes, names, normalized_names=None):
+        empty = cls(
+            numpy.empty(0, dtype=numpy.uint32), [], [], numpy.empty(0, dtype=numpy.int32), None,
+            numpy.empty((0, 3))
+        )
+        return empty.changed(hex_codes, names, normalized_names=normalized_names)
+
+    @classmethod
+    def from_columns(cls, rgb, names, color_names, name_rows, lab_matrix):
+        """Create a color system from the columns saved by :meth:`TintRegistry.save`."""
+        shared_names = dict(zip(names, names))
+        color_names = [shared_names.get(name, name) for name in color_names]
+        return cls(
+            numpy.array(rgb, dtype=numpy.uint32), names, color_names,
+            numpy.array(name_rows, dtype=numpy.int32), None, lab_matrix
+        )
+
+    def hex_code(self, normalized_name):
+        """Return the hex code of a color name defined by the system, or None."""
+        position = self.name_positions.get(normalized_name)
+        if position is None:
+            return None
+        return "%06x" % self.rgb.item(self.name_rows.item(position))
+
+    def fuzzy_choice(self, normalized_name):
+        """Return the :class:`tint.fuzzy.Choice` of a color name defined by the system, or None."""
+        position = self.name_positions.get(normalized_name)
+        if position is None:
+            return None
+        return self.get_fuzzy_choices()[position]
+
+    def get_fuzzy_choices(self):
+        """Return the fuzzy choices of the name table, preparing them on first use."""
+        fuzzy_choices = self.fuzzy_choices
+        if fuzzy_choices is None:
+            # Names are processed for fuzzy scoring once, not on every fuzzy match
+            shared_tokens = {}
+            fuzzy_choices = fuzzy.prepare_many(self.color_names, shared_tokens)
+            self.fuzzy_choices = fuzzy_choices
+        return fuzzy_choices
+
+    def prepare_fuzzy(self):
+        """Prepare the fuzzy choices of the system, see :meth:`get_fuzzy_choices`."""
+        self.get_fuzzy_choices()
+
+    def defined_names(self):
+        """Return the normalized color names defined by the system, as a mapping."""
+        return self.name_positions
+
+    def row(self, hex_code):
+        """Return the row of a hex code, or -1 if it is not part of the system.
+
+        Raises:
+          ValueError: If `hex_code` is no valid hex code.
+        """
+        packed = _hex_to_packed(hex_code)
+        sorted_rgb, order = self._get_sorted_rgb()
+        position = sorted_rgb.searchsorted(packed)
+        if position < len(sorted_rgb) and sorted_rgb.item(position) == packed:
+            return order.item(position)
+        return -1
+
+    def rows(self, packed):
+        """Return the rows of packed sRGB values, -1 for the ones not part of the system."""
+        packed = numpy.asarray(packed, dtype=numpy.int64)
+        sorted_rgb, order = self._get_sorted_rgb()
+        if not len(sorted_rgb):
+            return numpy.full(packed.shape, -1, dtype=numpy.intp)
+        positions = sorted_rgb.searchsorted(packed).clip(max=len(sorted_rgb) - 1)
+        return numpy.where(sorted_rgb[positions] == packed, order[positions], -1)
+
+    def _get_sorted_rgb(self):
+        sorted_rgb = self._sorted_rgb
+        if sorted_rgb is None:
+            order = numpy.argsort(self.rgb)
+            # 64 bit, since searching these for Python integers is much faster
+            sorted_rgb = self._sorted_rgb = (self.rgb[order].astype(numpy.int64), order)
+        return sorted_rgb
+
+    def changed(self, hex_codes=(), names=(), removed_rgb=(), normalized_names=None,
+                forget_names=False):
+        """Return a new color system with colors removed, and then colors added.
+
+        Colors with an sRGB value that is already part of the system rename
+        its row instead of adding one. Color names of the system whose color
+        is removed do not match anymore; with `forget_names`, none of its old
+        color names do. `removed_rgb` holds packed sRGB values (see
+        :func:`_pack`). `normalized_names` are the normalized `names`, if the
+        caller has them already. Fuzzy choices are only prepared for the new
+        names if this system's are prepared already.
+        """
+        if normalized_names is None:
+            normalized_names = _normalize_names(names)
+        if forget_names:
+            color_names, name_rows, fuzzy_choices = [], numpy.empty(0, dtype=numpy.int32), None
+        else:
+            color_names, name_rows, fuzzy_choices = (
+                self.color_names, self.name_rows, self.fuzzy_choices
+            )
+        rgb = self.rgb
+        row_names = self.names
+        lab_matrix, lab_tree = self._lab
+        lookup_table = self.lookup_table
+        added_rgb = _pack(_hex_codes_to_rgb(hex_codes)) if hex_codes else numpy.empty(0)
+        added_rows = self.rows(added_rgb)
+
+        removed_rows = self.rows(removed_rgb)
+        removed_rows = removed_rows[removed_rows >= 0]
+        if len(removed_rows):
+            keep = numpy.ones(len(rgb), dtype=bool)
+            keep[removed_rows] = False
+            # The new row of every kept row
+            new_rows = numpy.cumsum(keep) - 1
+            rgb = rgb[keep]
+            row_names = list(itertools.compress(row_names, keep))
+            lab_matrix = lab_matrix[keep[:len(lab_matrix)]]
+            lab_tree = lookup_table = None
+            kept = added_rows >= 0
+            kept[kept] = keep[added_rows[kept]]
+            added_rows = numpy.where(kept, new_rows[added_rows], -1)
+            # Names of removed colors leave the name table
+            kept_names = keep[name_rows]
+            color_names = list(itertools.compress(color_names, kept_names))
+            if fuzzy_choices is not None:
+                fuzzy_choices = list(itertools.compress(fuzzy_choices, kept_names))
+            name_rows = new_rows[name_rows[kept_names]]
+        else:
+            row_names = list(row_names)
+
+        # Rows by packed sRGB value of the colors new to the system
+        new_positions = {}
+        new_rgb = []
+        added_rows = added_rows.tolist()
+        for position, (packed, row) in enumerate(zip(added_rgb.tolist(), added_rows)):
+            if row < 0:
+                row = new_positions.get(packed)
+                if row is None:
+                    row = new_positions[packed] = len(row_names)
+                    row_names.append(None)
+                    new_rgb.append(packed)
+                added_rows[position] = row
+            row_names[row] = names[position]
+        if new_rgb:
+            rgb = numpy.concatenate((rgb, numpy.array(new_rgb, dtype=numpy.uint32)))
+            lab_tree = lookup_table = None
+
+        if len(color_names) != len(self.color_names) or forget_names:
+            name_positions = dict(zip(color_names, itertools.count()))
+        else:
+            name_positions = self.name_positions
+        if normalized_names:
+            name_positions = dict(name_positions)
+            color_names = list(color_names)
+            name_count = len(color_names)
+            name_rows = name_rows.tolist()
+            for normalized_name, row in zip(normalized_names, added_rows):
+                position = name_positions.get(normalized_name)
+                if position is None:
+                    name_positions[normalized_name] = len(color_names)
+                    color_names.append(normalized_name)
+                    name_rows.append(row)
+                else:
+                    name_rows[position] = row
+            name_rows = numpy.array(name_rows, dtype=numpy.int32)
+            if fuzzy_choices is not None and len(color_names) > name_count:
+                shared_tokens = {}
+                fuzzy_choices = fuzzy_choices + fuzzy.prepare_many(
+                    color_names[name_count:], shared_tokens
+                )
+
+        color_system = _ColorSystem(
+            rgb, row_names, color_names, name_rows, fuzzy_choices, lab_matrix, lab_tree,
+            lookup_table, name_positions
+        )
+        if self.name_index is not None:
+            color_system.name_index = _updated_name_index(
+                self.name_index, self.name_positions, name_positions
+            )
+        return color_system
+
+    def with_lookup_table(self, table):
+        """Return a copy of the color system using `table`, keeping its generation."""
+        color_system = copy.copy(self)
+        color_system.lookup_table = table
+        return color_system
+
+    def lab_colors(self):
+        """Return the Lab matrix, the corresponding color names and the spatial index.
+
+        The spatial index is None for systems smaller than ``_LAB_TREE_MIN_SIZE``.
+        """
+        lab_matrix, lab_tree = lab = self._lab
+        if len(lab_matrix) < len(self.rgb) or (
+                lab_tree is None and len(lab_matrix) >= _LAB_TREE_MIN_SIZE):
+            if len(lab_matrix) < len(self.rgb):
+                # Lab values are kept in one contiguous array per system, so that
+                # find_nearest can compare against all of them in one go
+                converted = numpy.empty((len(self.rgb), 3))
+                converted[:len(lab_matrix)] = lab_matrix
+                for start in xrange(len(lab_matrix), len(self.rgb), _LAB_BATCH_SIZE):
+                    stop = start + _LAB_BATCH_SIZE
+                    converted[start:stop] = color_conversions.rgb_to_lab(
+                        _unpack(self.rgb[start:stop])
+                    )
+                lab_matrix = converted
+            if len(lab_matrix) >= _LAB_TREE_MIN_SIZE:
+                lab_tree = spatial.LabTree(lab_matrix)
+            lab = self._lab = (lab_matrix, lab_tree)
+        return lab[0], self.names, lab[1]
+
+    def get_name_index(self):
+        index = self.name_index
+        if index is None:
+            index = self.name_index = _build_name_index(self.name_positions)
+        return index
+
+    def fingerprint(self):
+        """Return a hex digest identifying the colors and names of the system."""
+        if self._fingerprint is None:
+            digest = hashlib.sha1(self.rgb.astype(str("<u4")).tostring())
+            digest.update(self.name_rows.astype(str("<i4")).tostring())
+            for names in (self.names, self.color_names):
+                digest.update(b"\0\0" + "\0".join(names).encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+
+class _State(object):
+    """Everything a :class:`TintRegistry` knows about its colors.
+
+    A registry replaces its state as a whole on every change, so readers
+    holding on to a state always see a consistent one. A color name matches
+    the hex code it has in the system that defined it last, so the state
+    only keeps that system per name and takes everything else from the
+    system's name table. The fuzzy matching index is built on first use,
+    and updated for the changed names only once built.
+
+    Attributes:
+      systems (dict): Maps system names to :class:`_ColorSystem` instances.
+      system_by_color (dict): Maps normalized color names to the system
+        that defined them last.
+      default_resources (dict): Maps default systems that are not loaded yet
+        to their resource names, or None if the defaults are not listed yet.
+      generation (int): Identifies the state, e.g. in result cache keys.
+
+    """
+    def __init__(self, systems, system_by_color, default_resources):
+        self.systems = systems
+        self.system_by_color = system_by_color
+        self.default_resources = default_resources
+        self.generation = next(_generations)
+        self.name_index = None
+        self._fingerprint = None
+
+    def hex_code(self, normalized_name):
+        """Return the hex code of a color name, or None."""
+        system = self.system_by_color.get(normalized_name)
+        if system is None:
+            return None
+        return self.systems[system].hex_code(normalized_name)
+
+    def fuzzy_choice(self, normalized_name):
+        """Return the :class:`tint.fuzzy.Choice` of a color name, or None."""
+        system = self.system_by_color.get(normalized_name)
+        if system is None:
+            return None
+        return self.systems[system].fuzzy_choice(normalized_name)
+
+    def defined_names(self):
+        """Return all normalized color names, as a mapping."""
+        return self.system_by_color
+
+    def prepare_fuzzy(self):
+        """Prepare the fuzzy choices of all systems, see :meth:`_ColorSystem.get_fuzzy_choices`."""
+        for color_system in self.systems.itervalues():
+            color_system.get_fuzzy_choices()
+
+    def changed(self, additions=(), removals=(), replaced_systems=(), default_resources=None):
+        """Return a new state with colors removed, and then colors added.
+
+        Args:
+          additions (list of tuples): Pairs of a system name and its new
+            colors as returned by :func:`_parse_colors`, applied in order.
+          removals (list of tuples): Pairs of a system name and the packed
+            sRGB values (see :func:`_pack`) of the colors to remove from it.
+            Color names defined by the system with one of these colors do
+            not match anymore, unless another system defines them too; the
+            first of these systems (by name) then decides their hex code.
+          replaced_systems (iterable of string): Systems whose color names do
+            not match anymore, and whose colors are removed, except for the
+            ones added again by `additions`.
+          default_resources (dict, optional): The new pending defaults.
+            Defaults to the ones of this state.
+
+        """
+        systems = dict(self.systems)
+        system_by_color = dict(self.system_by_color)
+        removed_rgb = collections.defaultdict(list)
+        for system, packed in removals:
+            removed_rgb[system].append(numpy.asarray(packed, dtype=numpy.uint32))
+        replaced_systems = set(replaced_systems)
+        # Names of the changed systems that might have lost their definition
+        orphaned_names = set()
+        for system in replaced_systems:
+            if system in systems:
+                added_rgb = [
+                    _pack(_hex_codes_to_rgb(hex_codes))
+                    for added_system, (hex_codes, names) in additions
+                    if added_system == system and hex_codes
+                ]
+                rgb = systems[system].rgb
+                if added_rgb:
+                    rgb = rgb[~numpy.in1d(rgb, numpy.concatenate(added_rgb))]
+                removed_rgb[system].append(rgb)
+        for system, packed in removed_rgb.iteritems():
+            if system in systems:
+                old_system = systems[system]
+                new_system = systems[system] = old_system.changed(
+                    removed_rgb=numpy.concatenate(packed), forget_names=system in replaced_systems
+                )
+                for normalized_name in old_system.color_names:
+                    if (normalized_name not in new_system.name_positions and
+                            system_by_color.get(normalized_name) == system):
+                        orphaned_names.add(normalized_name)
+                if not len(new_system.rgb) and system in replaced_systems:
+                    del systems[system]
+        # Names the system that defined them last does not define anymore
+        # fall back to another system defining them, or stop matching
+        if orphaned_names:
+            system_names = sorted(systems)
+            for normalized_name in orphaned_names:
+                for system in system_names:
+                    if normalized_name in systems[system].name_positions:
+                        system_by_color[normalized_name] = system
+                        break
+                else:
+                    del system_by_color[normalized_name]
+
+        for system, (hex_codes, names) in additions:
+            normalized_names = _normalize_names(names)
+            system_by_color.update(dict.fromkeys(normalized_names, system))
+            if system in systems:
+                systems[system] = systems[system].changed(
+                    hex_codes, names, normalized_names=normalized_names
+                )
+            else:
+                systems[system] = _ColorSystem.create(hex_codes, names, normalized_names)
+
+        if default_resources is None:
+            default_resources = self.default_resources
+        state = _State(systems, system_by_color, default_resources)
+        if self.name_index is not None:
+            state.name_index = _updated_name_index(
+                self.name_index, self.system_by_color, system_by_color
+            )
+        return state
+
+    def get_name_index(self):
+        index = self.name_index
+        if index is None:
+            index = self.name_index = _build_name_index(self.system_by_color)
+        return index
+
+    def fingerprint(self):
+        """Return a hex digest identifying the colors and names of all systems."""
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for system in sorted(self.systems):
+                digest.update(("%s\0%s\0" % (system, self.systems[system].fingerprint()))
+                              .encode("utf-8"))
+            for normalized_name, system in sorted(self.system_by_color.iteritems()):
+                digest.update(("\0%s\0%s" % (normalized_name, system)).encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+
+def _find_nearest_key(hex_code, filter_set, metric, k=None):
+    """Return the persistent cache key of a non-exact find_nearest result."""
+    return ("find_nearest", sorted(filter_set.names) if filter_set else None, metric, k, hex_code)
+
+
+def _build_name_index(color_names):
+    index = name_index.NgramIndex()
+    for normalized_name in color_names:
+        index.add(normalized_name)
+    return index
+
+
+def _updated_name_index(index, old_names, names):
+    """Return `index` updated for the names that differ between the two mappings."""
+    return index.updated(
+        [name for name in names if name not in old_names],
+        [name for name in old_names if name not in names]
+    )
+
+
+class CompiledFilter(object):
+    """A filter set prepared for repeated use, see :meth:`TintRegistry.compile_filter`.
+
+    Attributes:
+      system (string): The color system the filter was compiled for.
+      names (frozenset): The color names the filter allows.
+
+    """
+    def __init__(self, system, names):
+        self.system = system
+        self.names = frozenset(names)
+        # The generation of the color system, and the Lab values and names of
+        # the allowed colors taken from it, replaced as one
+        self._compiled = (None, None, None)
+
+    def __repr__(self):
+        return "CompiledFilter(%r, %r)" % (self.system, sorted(self.names))
 
 
 class TintRegistry(object):
     """A registry for color names, categorized by color systems.
 
+    All methods may be called from several threads at once. Changes (such as
+    :meth:`add_colors` or :meth:`reload_system`) build new data structures
+    and publish them in one step, so concurrent lookups never wait for a
+    lock and never see a partially applied change.
+
     Args:
       load_defaults (bool, optional): Load default color systems provided
-        by `tint`. Currently, only "en" is provided by default. Defaults to True.
+        by `tint`. Currently, only "en" is provided by default. Default systems
+        are only loaded when first needed (e.g. when a color system is queried).
+        Defaults to True.
+      cache_size (int, optional): Keep up to this many results of fuzzy
+        :meth:`match_name` and non-exact :meth:`find_nearest` calls, evicting
+        the least recently used ones. The cache is cleared whenever colors are
+        added. Defaults to 0, i.e. no caching.
+      stats (bool, optional): Count the calls of the lookup methods and their
+        outcomes, and keep latency histograms, see :meth:`stats`. Defaults
+        to False.
+      cache_file (string, optional): Also keep the results cached by
+        `cache_size` (and the non-exact results of :meth:`match_name_many`
+        and :meth:`find_nearest_many`) in this SQLite database, so that
+        later runs, and other processes, reuse them (see
+        :class:`tint.cache.PersistentCache`). Results are stored under a
+        fingerprint of the colors they depend on, so changing the colors
+        makes them stale rather than wrong; :meth:`prune_cache_file`
+        removes stale results. Defaults to None, i.e. no persistent cache.
 
     """
-    def __init__(self, load_defaults=True):
-        self._colors_by_system_hex = {}
-        self._colors_by_system_lab = {}
-        self._hex_by_color = {}
-        if load_defaults:
-            for filename in pkg_resources.resource_listdir("tint", "data"):
-                base, ext = os.path.splitext(filename)
-                if ext == ".csv":
-                    # Yes, it's correct to join this with "/" because docs say so
-                    # (it's no real path name)
-                    self.add_colors_from_file(
-                        base,
-                        pkg_resources.resource_stream("tint", "data/" + filename)
-                    )
+    def __init__(self, load_defaults=True, cache_size=0, stats=False, cache_file=None):
+        self._state = _State({}, {}, None if load_defaults else {})
+        # Serializes changes; lookups never take it
+        self._write_lock = threading.RLock()
+        self._cache = cache.LRUCache(cache_size) if cache_size > 0 else None
+        self._persistent_cache = cache.PersistentCache(cache_file) if cache_file else None
+        self._stats = stats_.Stats() if stats else None
 
     def add_colors_from_file(self, system, f_or_filename):
         """Add color definition to a given color system.
@@ -111,20 +943,19 @@ class TintRegistry(object):
             csv file (excel style).
 
         """
-        if hasattr(f_or_filename, "read"):
-            colors = (row for row in csv.reader(f_or_filename) if row)
-        else:
-            with open(f_or_filename, "rb") as f:
-                colors = [row for row in csv.reader(f) if row]
-
-        self.add_colors(system, colors)
+        self.add_colors(system, _read_colors_file(f_or_filename))
 
     def add_colors(self, system, colors):
         """Add color definition to a given color system.
 
         You may add to already existing color system. Previously existing color
         definitions of the same (normalized) name will be overwritten,
-        regardless of the color system.
+        regardless of the color system. A hex code that is already part of
+        the system is renamed, so adding the same colors again does not grow
+        the system. To replace the colors of a name, use :meth:`update_colors`.
+
+        Each call copies the registry's mappings once, so add many colors per
+        call rather than calling this for every single color.
 
         Args:
           system (string): The color system the colors should be added to
@@ -138,22 +969,287 @@ class TintRegistry(object):
           >>> tint_registry.add_colors("vague", color_definitions.iteritems())
 
         """
+        colors = _parse_colors(colors)
+        with self._write_lock:
+            # Default colors come first, and may be overwritten
+            self._publish(self._state.changed(
+                self._default_additions(self._state) + [(system, colors)], default_resources={}
+            ))
+
+    def reload_system(self, system, f_or_filename):
+        """Replace all colors of a color system with the ones of a color definition file.
+
+        Lookups running concurrently see either the old or the new colors of
+        the system, never a mix. Color names of the old colors that are not
+        part of the new ones do not match anymore, unless another system
+        defines them too; they then match that system's hex code.
+
+        Args:
+          system (string): The color system to replace (or to create).
+          f_or_filename (filename, or file-like object): A color definition
+            csv file, see :meth:`add_colors_from_file`.
+
+        Raises:
+          ValueError: If the file contains an invalid hex code; the system is
+            left unchanged then.
+
+        """
+        colors = _parse_colors(_read_colors_file(f_or_filename))
+        with self._write_lock:
+            state = self._state
+            additions = [
+                (default_system, default_colors)
+                for default_system, default_colors in self._default_additions(state)
+                if default_system != system
+            ]
+            self._publish(state.changed(
+                additions + [(system, colors)], replaced_systems=[system], default_resources={}
+            ))
+
+    def bulk_load(self, system, f_or_filename, file_format=None, replace=False,
+                  chunk_size=_LOAD_CHUNK_SIZE):
+        """Add the colors of a large color definition file to a color system.
+
+        Unlike :meth:`add_colors_from_file`, the file is streamed in chunks
+        of `chunk_size` rows, the hex codes of a chunk are validated at once,
+        and malformed rows are reported instead of aborting the load. The Lab
+        values of the new colors and the spatial index of the system are
+        computed once, after all rows are read and before the colors are
+        published, so that the first lookups do not pay for them.
+
+        Files are either csv files like the ones of
+        :meth:`add_colors_from_file`, or JSON lines files holding a
+        ``["color name", "hex code"]`` array or a ``{"color_name": ...,
+        "hex_code": ...}`` object per line. Both may be gzip compressed.
+
+        Args:
+          system (string): The color system the colors should be added to.
+          f_or_filename (filename, or file-like object): The color definition
+            file, opened in binary mode.
+          file_format (string, optional): ``"csv"`` or ``"jsonl"``. Defaults
+            to None, i.e. ``"jsonl"`` for files named ``*.jsonl`` or
+            ``*.ndjson`` (optionally followed by ``.gz``), ``"csv"``
+            otherwise.
+          replace (bool, optional): Replace all colors of the system, like
+            :meth:`reload_system` does. Defaults to False.
+          chunk_size (int, optional): The number of rows validated at once.
+
+        Returns:
+          A named tuple with the members `colors`, the number of colors
+          loaded, and `errors`, a list of named tuples with the members `line`
+          (the line number of a malformed row) and `message`.
+
+        Raises:
+          ValueError: If `file_format` is unknown, or the file holds invalid
+            gzip data; the registry is left unchanged then.
+
+        Examples:
+          >>> import io
+          >>> tint_registry = TintRegistry()
+          >>> tint_registry.bulk_load("vendor", io.BytesIO(b"deep sea,1b4d6b\\nbroken,1b4d\\n"))
+          LoadResult(colors=1, errors=[LoadError(line=2, message=u"invalid hex code '1b4d'")])
+
+        """
+        if file_format is None:
+            file_format = _colors_file_format(f_or_filename)
+        if file_format not in _ROW_READERS:
+            raise ValueError(
+                "Unknown file format %r, use one of %s." % (file_format, ", ".join(_ROW_READERS))
+            )
+        hex_codes, names, errors = [], [], []
+        f = open(f_or_filename, "rb") if isinstance(f_or_filename, basestring) else f_or_filename
+        try:
+            rows = _ROW_READERS[file_format](_colors_file_lines(f))
+            for chunk in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+                chunk_hex_codes, chunk_names, chunk_errors = _parse_color_rows(chunk)
+                hex_codes.extend(chunk_hex_codes)
+                names.extend(chunk_names)
+                errors.extend(chunk_errors)
+        finally:
+            if f is not f_or_filename:
+                f.close()
+
+        with self._write_lock:
+            state = self._state
+            additions = [
+                (default_system, default_colors)
+                for default_system, default_colors in self._default_additions(state)
+                if not (replace and default_system == system)
+            ]
+            state = state.changed(
+                additions + [(system, (hex_codes, names))],
+                replaced_systems=[system] if replace else (), default_resources={}
+            )
+            if system in state.systems:
+                color_system = state.systems[system]
+                color_system.lab_colors()
+                color_system._get_sorted_rgb()
+            self._publish(state)
+        return LoadResult(len(names), errors)
+
+    def update_colors(self, system, colors):
+        """Set the colors of color names in a color system.
+
+        Unlike :meth:`add_colors`, the previous colors of the given names are
+        removed from the system, as if removed by :meth:`remove_colors`. Other
+        colors of the system stay unchanged.
+
+        Args:
+          system (string): The color system to update (or to create).
+          colors (iterable of tuples): Color name / sRGB value pairs; a name
+            may be given several times to define several colors.
+
+        Examples:
+          >>> tint_registry = TintRegistry()
+          >>> tint_registry.update_colors("en", [("white", "fefefe")])
+          >>> tint_registry.find_nearest("ffffff", "en")
+          FindResult(color_name=u'white', distance=0.1978181001292257)
+
+        """
+        colors = _parse_colors(colors)
+        with self._write_lock:
+            state = self._with_defaults(self._state)
+            removals = []
+            if system in state.systems:
+                color_system = state.systems[system]
+                updated = color_system.rgb[color_system.name_rows[[
+                    color_system.name_positions[normalized_name]
+                    for normalized_name in set(_normalize_names(colors[1]))
+                    if normalized_name in color_system.name_positions
+                ]]]
+                new_rgb = _pack(_hex_codes_to_rgb(colors[0])) if colors[0] else []
+                removals.append((system, updated[~numpy.in1d(updated, new_rgb)]))
+            self._publish(state.changed([(system, colors)], removals))
+
+    def remove_colors(self, system, names):
+        """Remove all colors of the given color names from a color system.
+
+        The names do not match anymore, unless another color system defines
+        them too (see :meth:`remove_system`). Neither do other names of the
+        system sharing one of the removed colors.
+
+        Args:
+          system (string): The color system.
+          names (iterable of string): The color names to remove.
+
+        Raises:
+          ValueError: If `system` is not a registered color system, or a
+            name is not part of it.
+
+        """
+        names = set(_normalize_names([_clean_name(color_name) for color_name in names]))
+        with self._write_lock:
+            state = self._with_defaults(self._get_state(system))
+            color_system = state.systems[system]
+            unknown = names.difference(color_system.name_positions)
+            if unknown:
+                raise ValueError(
+                    "Color names %r are not part of color system %r." % (sorted(unknown), system)
+                )
+            removed_rows = color_system.name_rows[
+                [color_system.name_positions[normalized_name] for normalized_name in names]
+            ]
+            self._publish(state.changed(removals=[(system, color_system.rgb[removed_rows])]))
+
+    def remove_system(self, system):
+        """Remove a color system and all of its color names.
+
+        Names that other systems define too keep matching, with the hex code
+        of the system that defined them last, or, if that was the removed
+        system, of the first other system (by name) defining them.
+
+        Args:
+          system (string): The color system.
+
+        Raises:
+          ValueError: If `system` is not a registered color system.
+
+        """
+        with self._write_lock:
+            state = self._get_state(system)
+            additions = [
+                (default_system, default_colors)
+                for default_system, default_colors in self._default_additions(state)
+                if default_system != system
+            ]
+            self._publish(state.changed(
+                additions, replaced_systems=[system], default_resources={}
+            ))
+
+    def _with_defaults(self, state):
+        """Return `state` with all pending default systems loaded, without publishing it."""
+        additions = self._default_additions(state)
+        if not additions:
+            return state
+        return state.changed(additions, default_resources={})
+
+    def _publish(self, state):
+        """Make `state` the current state (the caller holds the write lock)."""
+        self._state = state
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _list_defaults(self, state):
+        """Map default systems that are not loaded yet to their resource names."""
+        if state.default_resources is not None:
+            return state.default_resources
+        import pkg_resources
 
-        if system not in self._colors_by_system_hex:
-            self._colors_by_system_hex[system] = {}
-            self._colors_by_system_lab[system] = []
+        default_resources = {}
+        for filename in pkg_resources.resource_listdir("tint", "data"):
+            base, ext = os.path.splitext(filename)
+            if ext == ".csv":
+                # Yes, it's correct to join this with "/" because docs say so
+                # (it's no real path name)
+                default_resources[base] = "data/" + filename
+        return default_resources
 
-        for color_name, hex_code in colors:
-            hex_code = hex_code.lower().strip().strip("#")
-            color_name = color_name.lower().strip()
-            if not isinstance(color_name, unicode):
-                color_name = unicode(color_name, "utf-8")
+    def _default_additions(self, state, system=None):
+        """Parse pending default systems (only `system`, if given) for :meth:`_State.changed`."""
+        default_resources = self._list_defaults(state)
+        if not default_resources:
+            return []
+        import pkg_resources
 
-            self._colors_by_system_hex[system][hex_code] = color_name
-            self._colors_by_system_lab[system].append((_hex_to_lab(hex_code), color_name))
-            self._hex_by_color[_normalize(color_name)] = hex_code
+        additions = []
+        for base in ([system] if system is not None else sorted(default_resources)):
+            if base in default_resources:
+                stream = pkg_resources.resource_stream("tint", default_resources[base])
+                additions.append((base, _parse_colors(row for row in csv.reader(stream) if row)))
+        return additions
 
-    def match_name(self, in_string, fuzzy=False):
+    def _load_defaults(self, system=None):
+        """Load all pending default systems, or only `system` if it is one of them.
+
+        Returns:
+          The current state.
+        """
+        state = self._state
+        if state.default_resources == {}:
+            return state
+        with self._write_lock:
+            state = self._state
+            default_resources = dict(self._list_defaults(state))
+            additions = self._default_additions(state, system)
+            for base, colors in additions:
+                del default_resources[base]
+            if additions or default_resources != state.default_resources:
+                self._publish(state.changed(additions, default_resources=default_resources))
+            return self._state
+
+    def _get_state(self, system):
+        """Return the current state, making sure it contains `system`."""
+        state = self._state
+        if system not in state.systems:
+            state = self._load_defaults(system)
+            if system not in state.systems:
+                raise ValueError(
+                    "%r is not a registered color system. Try one of %r"
+                    % (system, state.systems.keys() + self._list_defaults(state).keys())
+                )
+        return state
+
+    def match_name(self, in_string, fuzzy=False, shortlist=None, k=None, system=None):
         """Match a color to a sRGB value.
 
         The matching will be based purely on the input string and the color names in the
@@ -171,44 +1267,397 @@ class TintRegistry(object):
             a color name.
           fuzzy (bool, optional): Try fuzzy matching if no exact match was found.
             Defaults to ``False``.
+          shortlist (int, optional): Only score the given number of color names
+            that share the most character trigrams and words with the input
+            string, instead of all color names. This is much faster, but may
+            miss the result of a full fuzzy scan. If omitted, all color names
+            are scored, which guarantees the best fuzzy match; this full scan
+            does not use the trigram index and is not faster than before the
+            index existed. Defaults to None.
+          k (int, optional): Return a ranked list of up to `k` matches with
+            distinct hex codes instead of the best match only, e.g. for "did
+            you mean" suggestions. An exact match comes first; with ``fuzzy``
+            the list is filled up with the best fuzzy matches. Defaults to None.
+          system (string or iterable of string, optional): Only match the
+            color names defined by this color system, or by these ones, which
+            is faster than matching the names of all systems. If several
+            systems define a name, the first of them decides its hex code.
+            Defaults to None, i.e. all color names, where the last definition
+            of a name decides.
 
         Returns:
-          A named tuple with the members `hex_code` and `score`.
+          A named tuple with the members `hex_code` and `score`, or a list of
+          them if `k` is given.
 
         Raises:
-          ValueError: If ``fuzzy`` is ``False`` and no match is found
+          ValueError: If ``fuzzy`` is ``False`` and no match is found, or if
+            `system` is not a registered color system
 
         Examples:
           >>> tint_registry = TintRegistry()
           >>> tint_registry.match_name("rather white", fuzzy=True)
           MatchResult(hex_code=u'ffffff', score=95)
+          >>> tint_registry.match_name("rather white", fuzzy=True, shortlist=20)
+          MatchResult(hex_code=u'ffffff', score=95)
+          >>> tint_registry.match_name("rather white", fuzzy=True, k=2)
+          [MatchResult(hex_code=u'ffffff', score=95), MatchResult(hex_code=u'faebd7', score=72)]
+          >>> tint_registry.match_name("rather white", fuzzy=True, system="en")
+          MatchResult(hex_code=u'ffffff', score=95)
+
+        """
+        if self._stats is None:
+            return self._match_name(in_string, fuzzy, shortlist, k, system)[0]
+        return self._stats.measure(
+            "match_name", in_string, self._match_name, in_string, fuzzy, shortlist, k, system
+        )
+
+    def _name_scope(self, system):
+        """Return the current state and the name matching data to search for `system`.
+
+        The name matching data are the state itself for all color names, or
+        the :class:`_ColorSystem` instances of the given systems; they all
+        have the ``hex_code``, ``fuzzy_choice``, ``defined_names``,
+        ``prepare_fuzzy`` and ``get_name_index`` methods.
+        """
+        if system is None:
+            state = self._load_defaults()
+            return state, [state]
+        systems = [system] if isinstance(system, basestring) else list(system)
+        if not systems:
+            raise ValueError("No color system given.")
+        state = self._state
+        for system in systems:
+            if system not in state.systems:
+                state = self._get_state(system)
+        return state, [state.systems[system] for system in systems]
+
+    def _match_name(self, in_string, fuzzy, shortlist, k, system=None, persistent=True):
+        """Return the result of :meth:`match_name` and its outcome for the statistics.
 
+        With `persistent` False, the persistent cache is left alone.
         """
+        if system is not None and not isinstance(system, basestring):
+            system = tuple(system)
+        state, scope = self._name_scope(system)
         in_string = _normalize(in_string)
-        if in_string in self._hex_by_color:
-            return MatchResult(self._hex_by_color[in_string], 100)
+        hex_code = _hex_in_scope(scope, in_string)
+        if k is not None:
+            outcome = "exact" if hex_code is not None else "fuzzy"
+            return self._match_name_ranked(
+                state, scope, hex_code, in_string, fuzzy, shortlist, k, system, persistent
+            ), outcome
+        if hex_code is not None:
+            return MatchResult(hex_code, 100), "exact"
 
         if not fuzzy:
             raise ValueError("No match for %r found." % in_string)
 
+        result, outcome = self._cached(
+            ("match_name", state.generation, system, in_string, shortlist),
+            lambda: self._match_name_fuzzy(scope, in_string, shortlist),
+            persistent and (lambda: (
+                self._name_fingerprint(state, scope),
+                ("match_name", system, shortlist, None, in_string)
+            )),
+            lambda value: MatchResult(*value)
+        )
+        return result, outcome or "fuzzy"
+
+    def _cached(self, cache_key, compute, persistent=None, decode=None):
+        """Return a result from the result caches, or computed and put into them.
+
+        The persistent cache (if any) is only used if `persistent` is given,
+        a function returning the fingerprint and the key of the result in the
+        persistent cache; `decode` turns its values into results.
+
+        Returns:
+          A tuple of the result and where it came from: ``"cached"`` for the
+          result cache, ``"persistent"`` for the persistent cache, or None.
+        """
+        if self._cache is not None:
+            result = self._cache.get(cache_key)
+            if result is not None:
+                return result, "cached"
+        persistent_cache = self._persistent_cache if persistent else None
+        if persistent_cache is not None:
+            fingerprint, persistent_key = persistent()
+            value = persistent_cache.get(fingerprint, persistent_key)
+            if value is not None:
+                result = decode(value)
+                if self._cache is not None:
+                    self._cache.put(cache_key, result)
+                return result, "persistent"
+        result = compute()
+        if self._cache is not None:
+            self._cache.put(cache_key, result)
+        if persistent_cache is not None:
+            persistent_cache.put(fingerprint, persistent_key, result)
+        return result, None
+
+    def _name_fingerprint(self, state, scope):
+        """Return the fingerprint of the name matching data searched by :meth:`match_name`."""
+        if len(scope) == 1:
+            return scope[0].fingerprint()
+        fingerprints = " ".join(names.fingerprint() for names in scope)
+        return hashlib.sha1(fingerprints.encode("ascii")).hexdigest()
+
+    def _fuzzy_scores(self, scope, in_string, shortlist, limit):
+        """Return the best fuzzy matching color names of both scorers, with their summed scores.
+
+        The pairs are in the order they are ranked in, from worst to best:
+        among equal scores, the last pair wins.
+        """
+        color_names = None
+        if shortlist is not None:
+            # With several systems, each contributes a shortlist of its own
+            shortlists = [names.get_name_index().shortlist(in_string, shortlist) for names in scope]
+            color_names = shortlists[0] if len(scope) == 1 else list(set().union(*shortlists))
+        if not color_names:
+            if len(scope) == 1:
+                color_names = scope[0].defined_names().keys()
+            else:
+                color_names = list(set().union(*(names.defined_names() for names in scope)))
+
+        # The names were prepared for scoring when they were added, only the
+        # query is processed here
+        query = fuzzy.prepare_query(in_string)
+        if len(scope) == 1:
+            fuzzy_choice = scope[0].fuzzy_choice
+            choices = [(name, fuzzy_choice(name)) for name in color_names]
+        else:
+            choices = [(name, _fuzzy_choice_in_scope(scope, name)) for name in color_names]
+
         # We want the standard scorer *plus* the set scorer, because colors are often
         # (but not always) related by sub-strings
-        color_names = self._hex_by_color.keys()
-        set_match = dict(fuzzywuzzy.process.extract(
-            in_string,
-            color_names,
-            scorer=fuzzywuzzy.fuzz.token_set_ratio
-        ))
-        standard_match = dict(fuzzywuzzy.process.extract(in_string, color_names))
+        set_match = dict(fuzzy.extract(query, choices, scorer=fuzzy.token_set_ratio, limit=limit))
+        standard_match = dict(fuzzy.extract(query, choices, limit=limit))
 
         # This would be much easier with a collections.Counter, but alas! it's a 2.7 feature.
         key_union = set(set_match) | set(standard_match)
-        counter = ((n, set_match.get(n, 0) + standard_match.get(n, 0)) for n in key_union)
-        color_name, score = sorted(counter, key=operator.itemgetter(1))[-1]
+        return [(n, set_match.get(n, 0) + standard_match.get(n, 0)) for n in key_union]
+
+    def _match_name_fuzzy(self, scope, in_string, shortlist):
+        # The last of the best pairs, without sorting all of them
+        best_name, best_score = None, -1
+        for color_name, score in self._fuzzy_scores(scope, in_string, shortlist, 5):
+            if score >= best_score:
+                best_name, best_score = color_name, score
+
+        return MatchResult(_hex_in_scope(scope, best_name), best_score / 2)
+
+    def _match_name_ranked(self, state, scope, hex_code, in_string, fuzzy, shortlist, k, system,
+                           persistent=True):
+        results = []
+        if hex_code is not None:
+            results.append(MatchResult(hex_code, 100))
+        elif not fuzzy:
+            raise ValueError("No match for %r found." % in_string)
+        if not fuzzy or k <= len(results):
+            return results
+
+        return list(self._cached(
+            ("match_name", state.generation, system, in_string, shortlist, k),
+            lambda: tuple(self._match_name_ranked_fuzzy(scope, results, in_string, shortlist, k)),
+            persistent and (lambda: (
+                self._name_fingerprint(state, scope),
+                ("match_name", system, shortlist, k, in_string)
+            )),
+            lambda value: tuple(MatchResult(*result) for result in value)
+        )[0])
+
+    def _match_name_ranked_fuzzy(self, scope, results, in_string, shortlist, k):
+        """Fill up `results` with the best fuzzy matches of distinct hex codes."""
+        # Both scorers keep at least as many names as the single best match
+        # does, so that the first fuzzy result is the one match_name returns
+        pairs = self._fuzzy_scores(scope, in_string, shortlist, max(5, k))
+        # A stable sort of the reversed pairs puts the last of equal scores first
+        pairs.reverse()
+        pairs.sort(key=operator.itemgetter(1), reverse=True)
+        hex_codes = set(result.hex_code for result in results)
+        for color_name, score in pairs:
+            hex_code = _hex_in_scope(scope, color_name)
+            if hex_code not in hex_codes:
+                hex_codes.add(hex_code)
+                results.append(MatchResult(hex_code, score / 2))
+                if len(results) == k:
+                    break
+        return results
+
+    def match_name_many(self, in_strings, fuzzy=False, shortlist=None, processes=1,
+                        system=None):
+        """Match many colors to sRGB values, optionally using several processes.
 
-        return MatchResult(self._hex_by_color[color_name], score / 2)
+        Distinct input strings are matched once. With more than one process,
+        they are split into a few chunks per process and matched by a process
+        pool, whose workers inherit this registry (including its name index)
+        by forking, so the registry is neither rebuilt nor sent to them.
 
-    def find_nearest(self, hex_code, system, filter_set=None):
+        Args:
+          in_strings (iterable of string): The input strings.
+          fuzzy (bool, optional): See :meth:`match_name`. Defaults to ``False``.
+          shortlist (int, optional): See :meth:`match_name`. Defaults to None.
+          processes (int, optional): Number of worker processes. ``None`` uses
+            all CPUs. Defaults to 1, i.e. matching in this process.
+          system (string or iterable of string, optional): See
+            :meth:`match_name`. Defaults to None.
+
+        Returns:
+          A list of named tuples with the members `hex_code` and `score`, in
+          the order of the input strings. Strings without a match (only if
+          `fuzzy` is ``False``) get None instead of raising ValueError.
+
+        Examples:
+          >>> tint_registry = TintRegistry()
+          >>> for result in tint_registry.match_name_many(["white", "redish", "white"], fuzzy=True):
+          ...     print(result)
+          MatchResult(hex_code=u'ffffff', score=100)
+          MatchResult(hex_code=u'ff0000', score=78)
+          MatchResult(hex_code=u'ffffff', score=100)
+
+        """
+        if self._stats is None:
+            return self._match_name_many(in_strings, fuzzy, shortlist, processes, system)[0]
+        return self._stats.measure(
+            "match_name_many", None, self._match_name_many, in_strings, fuzzy, shortlist,
+            processes, system
+        )
+
+    def _match_name_many(self, in_strings, fuzzy, shortlist, processes, system):
+        if system is not None and not isinstance(system, basestring):
+            system = tuple(system)
+        # Unknown systems fail before any work is done
+        state, scope = self._name_scope(system)
+
+        positions = {}
+        unique_strings = []
+        inverse = []
+        for in_string in in_strings:
+            if in_string not in positions:
+                positions[in_string] = len(unique_strings)
+                unique_strings.append(in_string)
+            inverse.append(positions[in_string])
+
+        unique_results = [None] * len(unique_strings)
+        outcomes = {}
+        persistent_keys = {}
+        if fuzzy and self._persistent_cache is not None:
+            # Exact matches are cheaper than the persistent cache, the other
+            # strings are looked up in it all at once
+            for position, in_string in enumerate(unique_strings):
+                normalized_string = _normalize(in_string)
+                if _hex_in_scope(scope, normalized_string) is None:
+                    persistent_keys[position] = (
+                        "match_name", system, shortlist, None, normalized_string
+                    )
+            fingerprint = self._name_fingerprint(state, scope)
+            looked_up = sorted(persistent_keys)
+            values = self._persistent_cache.get_many(
+                fingerprint, [persistent_keys[position] for position in looked_up]
+            )
+            for position, value in zip(looked_up, values):
+                if value is not None:
+                    unique_results[position] = MatchResult(*value)
+                    del persistent_keys[position]
+            outcomes["persistent"] = len(looked_up) - len(persistent_keys)
+
+        pending = [
+            position for position, result in enumerate(unique_results) if result is None
+        ]
+        computed = self._match_names_computed(
+            [unique_strings[position] for position in pending], fuzzy, shortlist, processes,
+            system, scope
+        )
+        for position, result in zip(pending, computed):
+            unique_results[position] = result
+        # Only store results computed from the colors of the fingerprint
+        if persistent_keys and self._name_scope(system)[0] is state:
+            self._persistent_cache.put_many(fingerprint, [
+                (key, unique_results[position]) for position, key in persistent_keys.iteritems()
+            ])
+
+        outcomes.update({
+            "distinct": len(unique_strings),
+            "duplicate": len(inverse) - len(unique_strings),
+            "miss": unique_results.count(None),
+        })
+        return [unique_results[position] for position in inverse], outcomes
+
+    def _match_names_computed(self, in_strings, fuzzy, shortlist, processes, system, scope):
+        """Match distinct strings without the persistent cache, see :meth:`match_name_many`."""
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = min(processes, len(in_strings))
+        if processes <= 1 or sys.platform == "win32":
+            return [
+                self._match_name_or_none(s, fuzzy, shortlist, system, False) for s in in_strings
+            ]
+
+        # Build everything the workers need before they are forked
+        if fuzzy:
+            self._prepare_fuzzy(scope, shortlist)
+        chunk_size = -(-len(in_strings) // (processes * _CHUNKS_PER_PROCESS))
+        tasks = [
+            (in_strings[start:start + chunk_size], fuzzy, shortlist, system)
+            for start in range(0, len(in_strings), chunk_size)
+        ]
+        pool = multiprocessing.Pool(processes, _init_match_name_worker, (self,))
+        try:
+            results = list(itertools.chain.from_iterable(
+                pool.map(_match_name_chunk, tasks, chunksize=1)
+            ))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        return results
+
+    def _prepare_fuzzy(self, scope, shortlist):
+        """Build what fuzzy matching in `scope` needs, e.g. before forking worker processes."""
+        for names in scope:
+            names.prepare_fuzzy()
+            if shortlist is not None:
+                names.get_name_index()
+
+    def _match_name_or_none(self, in_string, fuzzy, shortlist, system=None, persistent=True):
+        try:
+            return self._match_name(in_string, fuzzy, shortlist, None, system, persistent)[0]
+        except ValueError:
+            return None
+
+    def compile_filter(self, system, names):
+        """Prepare a filter set for repeated use with :meth:`find_nearest`.
+
+        The returned filter keeps the Lab values of the given color names, so
+        lookups with it only compare against these, instead of selecting them
+        from all colors of the system on every call. It stays valid when colors
+        are added to the system, and is updated on its next use.
+
+        Args:
+          system (string): The color system.
+          names (iterable of string): The color names to limit the output
+            choices to (see argument `filter_set` of :meth:`find_nearest`).
+
+        Returns:
+          A :class:`CompiledFilter`, to be passed as `filter_set` argument to
+          :meth:`find_nearest` and :meth:`find_nearest_many` for `system`.
+
+        Raises:
+          ValueError: If argument `system` is not a registered color system.
+
+        Examples:
+          >>> tint_registry = TintRegistry()
+          >>> black_and_white = tint_registry.compile_filter("en", ("white", "black"))
+          >>> color_name, distance = tint_registry.find_nearest(
+          ...     "54e6e4", "en", filter_set=black_and_white)
+          >>> color_name, round(distance, 6)
+          (u'white', 25.709952)
+
+        """
+        compiled = CompiledFilter(system, names)
+        self._candidates(self._get_state(system).systems[system], compiled)
+        return compiled
+
+    def find_nearest(self, hex_code, system, filter_set=None, k=None, metric="cie2000"):
         """Find a color name that's most similar to a given sRGB hex code.
 
         In normalization terms, this method implements "normalize an arbitrary sRGB value
@@ -217,52 +1666,679 @@ class TintRegistry(object):
         Args:
           system (string): The color system. Currently, `"en"`` is the only default
             system.
-          filter_set (iterable of string, optional): Limits the output choices
-            to fewer color names. The names (e.g. ``["black", "white"]``) must be
-            present in the given system.
+          filter_set (iterable of string or CompiledFilter, optional): Limits
+            the output choices to fewer color names. The names (e.g. ``["black", "white"]``) must be
+            present in the given system. For repeated lookups with the same
+            names, pass a filter compiled by :meth:`compile_filter` instead.
             If omitted, all color names of the system are considered. Defaults to None.
+          k (int, optional): Return a list of the `k` most similar distinct
+            color names, ordered by distance, instead of the most similar one
+            only. Defaults to None.
+          metric (string, optional): The color difference formula, one of
+            ``"cie76"``, ``"cie94"``, ``"cmc"`` (CMC 2:1) and ``"cie2000"``,
+            see :mod:`tint.color_diff`. The simpler formulas are faster to
+            compute. Defaults to ``"cie2000"``.
 
         Returns:
-          A named tuple with the members `color_name` and `distance`.
+          A named tuple with the members `color_name` and `distance`, or a
+          list of them if `k` is given.
 
         Raises:
-          ValueError: If argument `system` is not a registered color system.
+          ValueError: If argument `system` is not a registered color system,
+            if `filter_set` was compiled for another system, or if `metric`
+            is unknown.
 
         Examples:
           >>> tint_registry = TintRegistry()
           >>> tint_registry.find_nearest("54e6e4", system="en")
-          FindResult(color_name=u'bright turquoise', distance=3.730288645055483)
-          >>> tint_registry.find_nearest("54e6e4", "en", filter_set=("white", "black"))
-          FindResult(color_name=u'white', distance=25.709952192116894)
+          FindResult(color_name=u'bright turquoise', distance=3.7302886450554826)
+          >>> color_name, distance = tint_registry.find_nearest(
+          ...     "54e6e4", "en", filter_set=("white", "black"))
+          >>> color_name, round(distance, 6)
+          (u'white', 25.709952)
+          >>> results = tint_registry.find_nearest(
+          ...     "54e6e4", "en", filter_set=("white", "black"), k=2)
+          >>> [(color_name, round(distance, 6)) for color_name, distance in results]
+          [(u'white', 25.709952), (u'black', 79.664145)]
+          >>> tint_registry.find_nearest("54e6e4", "en", metric="cie76")
+          FindResult(color_name=u'medium turquoise', distance=7.553224597428409)
 
         """
+        if self._stats is None:
+            return self._find_nearest(hex_code, system, filter_set, k, metric)[0]
+        return self._stats.measure(
+            "find_nearest", hex_code, self._find_nearest, hex_code, system, filter_set, k, metric
+        )
 
-        if system not in self._colors_by_system_hex:
-            raise ValueError(
-                "%r is not a registered color system. Try one of %r"
-                % (system, self._colors_by_system_hex.keys())
-            )
+    def _find_nearest(self, hex_code, system, filter_set, k, metric):
+        """Return the result of :meth:`find_nearest` and its outcome for the statistics."""
+        _check_metric(metric)
+        color_system = self._get_state(system).systems[system]
         hex_code = hex_code.lower().strip()
+        filter_set = self._resolve_filter(system, filter_set)
+        if k is not None:
+            return (
+                self._find_nearest_ranked(hex_code, color_system, filter_set, k, metric),
+                "computed"
+            )
 
         # Try direct hit (fast path)
-        if hex_code in self._colors_by_system_hex[system]:
-            color_name = self._colors_by_system_hex[system][hex_code]
-            if filter_set is None or color_name in filter_set:
-                return FindResult(color_name, 0)
+        row = color_system.row(hex_code)
+        if row >= 0:
+            color_name = color_system.names[row]
+            if filter_set is None or color_name in filter_set.names:
+                return FindResult(color_name, 0), "exact"
+
+        result, outcome = self._cached(
+            ("find_nearest", color_system.generation, hex_code, filter_set and filter_set.names,
+             metric),
+            lambda: self._find_nearest_computed(hex_code, color_system, filter_set, metric),
+            lambda: (color_system.fingerprint(), _find_nearest_key(hex_code, filter_set, metric)),
+            lambda value: FindResult(*value)
+        )
+        return result, outcome or "computed"
+
+    def _find_nearest_computed(self, hex_code, color_system, filter_set, metric="cie2000"):
+        lab_matrix, names, lab_tree = color_system.lab_colors()
+
+        # Use the precomputed (CIEDE2000) lookup table if there is one ...
+        table = color_system.lookup_table
+        if filter_set is None and table is not None and metric == "cie2000":
+            rgb_values = _hex_to_rgb(hex_code)
+            index = table[(rgb_values[0] << 16) | (rgb_values[1] << 8) | rgb_values[2]]
+            distance = color_diff.delta_e_cie2000(
+                color_conversions.rgb_to_lab(rgb_values), lab_matrix[index]
+            )
+            return FindResult(names[index], float(distance))
+
+        # ... or the spatial index of large systems
+        if filter_set is None and lab_tree is not None:
+            index, distance = lab_tree.nearest(_hex_to_lab(hex_code), metric)
+            return FindResult(names[index], distance)
+
+        # Otherwise, compare against all candidates
+        lab_matrix, names = self._candidates(color_system, filter_set)
+        if not names:
+            return FindResult(None, sys.float_info.max)
+
+        # find minimal distance, comparing against all candidates at once
+        indices, distances = _nearest(
+            numpy.array([_hex_to_lab(hex_code)]), lab_matrix, 1, metric
+        )
+        return FindResult(names[indices[0]], float(distances[0]))
+
+    def _find_nearest_ranked(self, hex_code, color_system, filter_set, k, metric):
+        return list(self._cached(
+            ("find_nearest", color_system.generation, hex_code, filter_set and filter_set.names,
+             metric, k),
+            lambda: tuple(self._find_nearest_ranked_computed(
+                hex_code, color_system, filter_set, k, metric
+            )),
+            lambda: (
+                color_system.fingerprint(), _find_nearest_key(hex_code, filter_set, metric, k)
+            ),
+            lambda value: tuple(FindResult(*result) for result in value)
+        )[0])
+
+    def _find_nearest_ranked_computed(self, hex_code, color_system, filter_set, k, metric):
+        lab = _hex_to_lab(hex_code)
+        lab_matrix, names, lab_tree = color_system.lab_colors()
+        if filter_set is None and lab_tree is not None:
+            def select(count):
+                return lab_tree.nearest_k(lab, count, metric)
+        else:
+            lab_matrix, names = self._candidates(color_system, filter_set)
+            distances = color_diff.METRICS[metric](lab, lab_matrix)
+            indices = numpy.arange(len(names))
+
+            def select(count):
+                return spatial.smallest(distances, indices, count)
+
+        # A name may have several colors; select more of them until there
+        # are k distinct names, or no colors left
+        count = k
+        while True:
+            results = []
+            seen = set()
+            selected, selected_distances = select(count)
+            for index, distance in zip(selected, selected_distances):
+                color_name = names[index]
+                if color_name not in seen:
+                    seen.add(color_name)
+                    # Exact hits have the distance 0, as without k
+                    results.append(FindResult(color_name, float(distance) if distance else 0))
+                    if len(results) == k:
+                        break
+            if len(results) == k or len(selected) < count:
+                break
+            count *= 4
+        return results
 
-        # No direct hit, assemble list of lab_color/color_name pairs
-        colors = self._colors_by_system_lab[system]
+    def find_nearest_many(self, hex_codes, system, filter_set=None, chunk_size=None,
+                          metric="cie2000"):
+        """Find the most similar color names for many sRGB values at once.
+
+        This gives the same results as calling :meth:`find_nearest` for every
+        single value, but repeated values are only looked up once, and the
+        remaining distances are computed in vectorized blocks of bounded size.
+
+        Args:
+          hex_codes (iterable of string, or array_like): Either sRGB hex codes,
+            or an array of shape ``(N, 3)`` holding upscaled (0-255) sRGB values.
+          system (string): The color system.
+          filter_set (iterable of string or CompiledFilter, optional): Limits
+            the output choices to fewer color names, see :meth:`find_nearest`.
+            Defaults to None.
+          chunk_size (int, optional): Number of distinct input colors compared
+            against the color system in one block. Defaults to a size that
+            keeps each block small enough to stay in cache.
+          metric (string, optional): The color difference formula, see
+            :meth:`find_nearest`. Defaults to ``"cie2000"``.
+
+        Returns:
+          A list of named tuples with the members `color_name` and `distance`,
+          in the order of the input values.
+
+        Raises:
+          ValueError: If argument `system` is not a registered color system,
+            if an input value is not a valid sRGB value, or if `metric` is
+            unknown.
+
+        Examples:
+          >>> tint_registry = TintRegistry()
+          >>> for result in tint_registry.find_nearest_many(["ffffff", "54e6e4", "ffffff"], "en"):
+          ...     print(result)
+          FindResult(color_name=u'white', distance=0)
+          FindResult(color_name=u'bright turquoise', distance=3.7302886450554826)
+          FindResult(color_name=u'white', distance=0)
+
+        """
+        if self._stats is None:
+            return self._find_nearest_many(hex_codes, system, filter_set, chunk_size, metric)[0]
+        return self._stats.measure(
+            "find_nearest_many", None, self._find_nearest_many,
+            hex_codes, system, filter_set, chunk_size, metric
+        )
+
+    def _find_nearest_many(self, hex_codes, system, filter_set, chunk_size, metric):
+        _check_metric(metric)
+        color_system = self._get_state(system).systems[system]
+        filter_set = self._resolve_filter(system, filter_set)
+
+        if isinstance(hex_codes, numpy.ndarray):
+            if hex_codes.dtype.kind not in "iu":
+                raise ValueError("sRGB values must be integers, not %s." % hex_codes.dtype)
+            rgb_values = hex_codes.reshape(-1, 3)
+            if ((rgb_values < 0) | (rgb_values > 255)).any():
+                raise ValueError("sRGB values must be in the range 0-255.")
+            packed = rgb_values.astype(numpy.int64)
+            packed = (packed[:, 0] << 16) | (packed[:, 1] << 8) | packed[:, 2]
+            unique_packed, inverse = numpy.unique(packed, return_inverse=True)
+            unique_rgb = _unpack(unique_packed)
+        else:
+            positions = {}
+            unique_hex = []
+            inverse = []
+            for hex_code in hex_codes:
+                hex_code = hex_code.lower().strip()
+                if hex_code not in positions:
+                    positions[hex_code] = len(unique_hex)
+                    unique_hex.append(hex_code)
+                inverse.append(positions[hex_code])
+            for hex_code in unique_hex:
+                _hex_to_rgb(hex_code)
+            unique_rgb = _hex_codes_to_rgb(unique_hex)
+            unique_packed = _pack(unique_rgb)
+
+        # Direct hits (fast path), leaving the rest for the distance computation
+        names = color_system.names
+        unique_results = [None] * len(unique_packed)
+        missing = []
+        for position, row in enumerate(color_system.rows(unique_packed).tolist()):
+            color_name = names[row] if row >= 0 else None
+            if color_name is not None and (filter_set is None or color_name in filter_set.names):
+                unique_results[position] = FindResult(color_name, 0)
+            else:
+                missing.append(position)
+
+        outcomes = {}
+        persistent_cache = self._persistent_cache
+        if missing and persistent_cache is not None:
+            fingerprint = color_system.fingerprint()
+            keys = [
+                _find_nearest_key("%06x" % unique_packed[position], filter_set, metric)
+                for position in missing
+            ]
+            values = persistent_cache.get_many(fingerprint, keys)
+            computed_keys = []
+            computed = []
+            for position, key, value in zip(missing, keys, values):
+                if value is None:
+                    computed_keys.append(key)
+                    computed.append(position)
+                else:
+                    unique_results[position] = FindResult(*value)
+            outcomes["persistent"] = len(missing) - len(computed)
+            missing = computed
+
+        if missing:
+            names, indices, distances = self._nearest_many(
+                color_system, filter_set, unique_rgb[missing], chunk_size, metric
+            )
+            if names:
+                for position, index, distance in zip(missing, indices, distances):
+                    unique_results[position] = FindResult(names[index], float(distance))
+            else:
+                for position in missing:
+                    unique_results[position] = FindResult(None, sys.float_info.max)
+            if persistent_cache is not None:
+                persistent_cache.put_many(fingerprint, [
+                    (key, unique_results[position])
+                    for key, position in zip(computed_keys, missing)
+                ])
+
+        outcomes.update({
+            "exact": len(unique_packed) - len(missing) - outcomes.get("persistent", 0),
+            "computed": len(missing),
+            "duplicate": len(inverse) - len(unique_packed),
+        })
+        return [unique_results[position] for position in inverse], outcomes
+
+    def name_histogram(self, pixels, system, filter_set=None, quantize=None, metric="cie2000"):
+        """Count the pixels of an image by the color names most similar to them.
+
+        Every distinct pixel value is looked up once, and all of them are
+        looked up together, like :meth:`find_nearest_many` does. The cost
+        thus depends on the number of distinct values rather than on the
+        size of the image: photos have up to about a million. Values that
+        cluster in the sRGB space, like the ones of photos, are resolved
+        cube by cube, the way :meth:`build_lookup_table` does, which takes
+        about 10 microseconds per value (for "en"); scattered values take
+        about as long as a non-exact :meth:`find_nearest` call each. For large images, either
+        quantize them, which leaves at most ``2 ** (3 * quantize)`` values,
+        or use a lookup table, which turns the lookups into array reads.
+
+        Args:
+          pixels (array_like or bytes): An array of shape ``(H, W, 3)`` or
+            ``(N, 3)`` holding upscaled (0-255) sRGB values, e.g. a uint8
+            image array, or raw RGB bytes with three bytes per pixel.
+          system (string): The color system.
+          filter_set (iterable of string or CompiledFilter, optional): Limits
+            the output choices to fewer color names, see :meth:`find_nearest`.
+            Defaults to None.
+          quantize (int, optional): Only keep this many (1-8) leading bits of
+            every channel, and look up the center of each of the resulting
+            buckets instead of the pixel values in it. Defaults to None,
+            i.e. the exact pixel values.
+          metric (string, optional): The color difference formula, see
+            :meth:`find_nearest`. Defaults to ``"cie2000"``.
+
+        Returns:
+          A list of named tuples with the members `color_name` and `pixels`
+          (the number of pixels most similar to the color name), most pixels
+          first, and color names without pixels left out. If `filter_set`
+          leaves no color names, all pixels are counted for None.
+
+        Raises:
+          ValueError: If argument `system` is not a registered color system,
+            if `pixels` does not hold integer sRGB values, if `quantize` is
+            out of range, or if `metric` is unknown.
+
+        Examples:
+          >>> tint_registry = TintRegistry()
+          >>> for entry in tint_registry.name_histogram(
+          ...         b"\\xff\\xff\\xff\\xfe\\xfe\\xfe\\x00\\x00\\x00", "en"):
+          ...     print(entry)
+          HistogramEntry(color_name=u'white', pixels=2)
+          HistogramEntry(color_name=u'black', pixels=1)
+
+        """
+        if self._stats is None:
+            return self._name_histogram(pixels, system, filter_set, quantize, metric)[0]
+        return self._stats.measure(
+            "name_histogram", None, self._name_histogram,
+            pixels, system, filter_set, quantize, metric
+        )
+
+    def _name_histogram(self, pixels, system, filter_set, quantize, metric):
+        _check_metric(metric)
+        if quantize is None:
+            quantize = 8
+        if not 1 <= quantize <= 8:
+            raise ValueError("quantize must be between 1 and 8, not %r." % quantize)
+        color_system = self._get_state(system).systems[system]
+        filter_set = self._resolve_filter(system, filter_set)
+
+        if isinstance(pixels, (bytes, bytearray, buffer)):
+            if len(pixels) % 3:
+                raise ValueError("Raw RGB data must hold three bytes per pixel.")
+            rgb_values = numpy.frombuffer(pixels, dtype=numpy.uint8).reshape(-1, 3)
+        else:
+            rgb_values = numpy.asarray(pixels)
+            if rgb_values.dtype.kind not in "iu":
+                raise ValueError("sRGB values must be integers, not %s." % rgb_values.dtype)
+            if rgb_values.shape[-1:] != (3,):
+                raise ValueError("Pixels must have three channels, not shape %r."
+                                 % (rgb_values.shape,))
+            rgb_values = rgb_values.reshape(-1, 3)
+            if rgb_values.dtype != numpy.uint8 and (
+                    (rgb_values < 0) | (rgb_values > 255)).any():
+                raise ValueError("sRGB values must be in the range 0-255.")
+
+        # The buckets of the pixels, as packed (quantized) sRGB values
+        shift = 8 - quantize
+        channels = [(rgb_values[:, channel] >> shift).astype(numpy.uint32) for channel in range(3)]
+        buckets = (channels[0] << (2 * quantize)) | (channels[1] << quantize) | channels[2]
+        del channels
+        bucket_count = 1 << (3 * quantize)
+        if bucket_count <= _MAX_COUNTED_BUCKETS and len(buckets) * 16 >= bucket_count:
+            # Counting every bucket is much faster than sorting many pixels
+            counts = numpy.bincount(buckets, minlength=bucket_count)
+            unique_buckets = numpy.flatnonzero(counts)
+            counts = counts[unique_buckets]
+        else:
+            unique_buckets, counts = numpy.unique(buckets, return_counts=True)
+
+        # The center of every bucket
+        mask = (1 << quantize) - 1
+        unique_rgb = (numpy.column_stack((
+            unique_buckets >> (2 * quantize), (unique_buckets >> quantize) & mask,
+            unique_buckets & mask
+        )) << shift) + ((1 << shift) >> 1)
+
+        pixel_counts = collections.defaultdict(int)
+        if len(unique_buckets):
+            names, indices, distances = self._nearest_many(
+                color_system, filter_set, unique_rgb, None, metric, with_distances=False
+            )
+            if names:
+                name_counts = numpy.bincount(indices, weights=counts, minlength=len(names))
+                for index in numpy.flatnonzero(name_counts).tolist():
+                    pixel_counts[names[index]] += int(name_counts[index])
+            else:
+                pixel_counts[None] = len(buckets)
+        histogram = sorted(
+            (HistogramEntry(color_name, count) for color_name, count in pixel_counts.iteritems()),
+            key=lambda entry: (-entry.pixels, entry.color_name)
+        )
+        outcomes = {
+            "distinct": len(unique_buckets), "duplicate": len(buckets) - len(unique_buckets)
+        }
+        return histogram, outcomes
+
+    def _nearest_many(self, color_system, filter_set, rgb_values, chunk_size, metric,
+                      with_distances=True):
+        """Return the candidate names of a system and the nearest of them for many colors.
+
+        The `rgb_values` are distinct.
+
+        Returns:
+          A tuple of the candidate color names, and arrays of the index of
+          the nearest candidate and its distance for each of the ``(N, 3)``
+          sRGB values. The arrays are None if there are no candidates, the
+          distances if they are not asked for and not needed anyway.
+        """
+        lab_tree = color_system.lab_colors()[2]
+        lab_matrix, names = self._candidates(color_system, filter_set)
+        table = color_system.lookup_table
+        if not names:
+            return names, None, None
+        if filter_set is None and table is not None and metric == "cie2000":
+            indices = table[_pack(rgb_values)]
+            if not with_distances:
+                return names, indices, None
+            distances = color_diff.delta_e_cie2000(
+                color_conversions.rgb_to_lab(rgb_values), lab_matrix[indices]
+            )
+            return names, indices, distances
         if filter_set is not None:
-            colors = (pair for pair in colors if pair[1] in set(filter_set))
-
-        # find minimal distance
-        lab_color = _hex_to_lab(hex_code)
-        min_distance = sys.float_info.max
-        min_color_name = None
-        for current_lab_color, current_color_name in colors:
-            distance = colormath.color_diff.delta_e_cie2000(lab_color, current_lab_color)
-            if distance < min_distance:
-                min_distance = distance
-                min_color_name = current_color_name
-
-        return FindResult(min_color_name, min_distance)
+            lab_tree = None
+        if with_distances or metric != "cie2000":
+            indices, distances = _nearest_rgb(rgb_values, lab_matrix, lab_tree, chunk_size, metric)
+            return names, indices, distances
+
+        # Values clustering in the sRGB space, like the pixels of photos, are
+        # resolved cube by cube, like lookup tables are computed
+        indices = lookup_table.nearest_in_cubes(lab_matrix, _pack(rgb_values))
+        scattered = numpy.flatnonzero(indices < 0)
+        if len(scattered):
+            indices[scattered] = _nearest_rgb(
+                rgb_values[scattered], lab_matrix, lab_tree, chunk_size, metric
+            )[0]
+        return names, indices, None
+
+    def cache_info(self):
+        """Statistics of the result cache (see argument `cache_size`).
+
+        Returns:
+          A named tuple with the members `hits`, `misses`, `maxsize` and
+          `currsize`, or None if caching is disabled.
+
+        """
+        if self._cache is None:
+            return None
+        return self._cache.info()
+
+    def cache_file_info(self):
+        """Statistics of the persistent cache (see argument `cache_file`).
+
+        Returns:
+          A named tuple with the members `hits` and `misses` (of this
+          registry), `maxsize` (always None) and `currsize` (the number of
+          results in the file, including stale ones), or None if there is
+          no persistent cache.
+
+        """
+        if self._persistent_cache is None:
+            return None
+        return self._persistent_cache.info()
+
+    def prune_cache_file(self):
+        """Remove the results of the persistent cache that the current colors cannot use.
+
+        These are the results computed from colors that changed since, and
+        the results of :meth:`match_name` limited to several systems. Other
+        registries sharing the file lose their results too, unless they have
+        the same colors.
+        """
+        if self._persistent_cache is None:
+            return
+        state = self._load_defaults()
+        self._persistent_cache.prune(
+            [state.fingerprint()] +
+            [color_system.fingerprint() for color_system in state.systems.itervalues()]
+        )
+
+    def stats(self):
+        """Usage statistics of the lookup methods (see argument `stats`).
+
+        Every call of :meth:`match_name`, :meth:`find_nearest` and their
+        batch forms is counted by outcome:
+
+        * :meth:`match_name`: ``exact``, ``fuzzy`` (the fuzzy fallback),
+          ``cached`` (a cached fuzzy result), ``persistent`` (a fuzzy
+          result from the persistent cache) or ``miss`` (``ValueError``).
+        * :meth:`find_nearest`: ``exact`` (the hex code fast path),
+          ``computed``, ``cached``, ``persistent`` or ``miss``.
+        * The batch forms and :meth:`name_histogram` count their input
+          values as ``distinct`` (or by how they were resolved, like above)
+          and ``duplicate``.
+
+        Returns:
+          A dict of named tuples by method name, or None if statistics are
+          disabled. The named tuples have the members `calls`, `outcomes` (a
+          dict of counts by outcome), `latency_histogram` (a list of pairs
+          of the upper bound of a bucket in seconds, and the number of calls
+          in it) and `slowest` (a list of pairs of the seconds and the input
+          of the slowest calls, slowest first).
+
+        Examples:
+          >>> tint_registry = TintRegistry(stats=True)
+          >>> tint_registry.match_name("white")
+          MatchResult(hex_code=u'ffffff', score=100)
+          >>> tint_registry.stats()["match_name"].outcomes
+          {u'exact': 1}
+
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
+    def reset_stats(self):
+        """Discard the statistics collected so far (see :meth:`stats`)."""
+        if self._stats is not None:
+            self._stats.reset()
+
+    def build_lookup_table(self, system, filename, processes=1):
+        """Precompute the nearest color name of a system for every sRGB value.
+
+        The table is written to `filename` and used by :meth:`find_nearest` and
+        :meth:`find_nearest_many` for all lookups of `system` without a
+        ``filter_set``, which then take a single array read (the distance is
+        computed for the found color only). Building the table takes a few
+        minutes per CPU; afterwards, other processes can use it via
+        :meth:`load_lookup_table`. Adding colors to the system discards the table.
+
+        Args:
+          system (string): The color system, with at most 65536 colors.
+          filename (string): Where to save the table (about 32 MB).
+          processes (int, optional): Number of worker processes, ``None`` uses
+            all CPUs. Defaults to 1.
+
+        Raises:
+          ValueError: If argument `system` is not a registered color system,
+            or has too many colors.
+
+        """
+        lab_matrix, names, lab_tree = self._get_state(system).systems[system].lab_colors()
+        table = lookup_table.compute(lab_matrix, processes)
+        lookup_table.save(filename, table, lookup_table.fingerprint(lab_matrix, names))
+        self.load_lookup_table(system, filename)
+
+    def load_lookup_table(self, system, filename):
+        """Use a lookup table created by :meth:`build_lookup_table`.
+
+        The table is memory-mapped read-only, so processes using the same file
+        share its pages.
+
+        Args:
+          system (string): The color system.
+          filename (string): The table file.
+
+        Raises:
+          ValueError: If argument `system` is not a registered color system,
+            or if the table was built for different colors.
+
+        """
+        self._get_state(system)
+        table, table_fingerprint = lookup_table.load(filename)
+        with self._write_lock:
+            state = self._state
+            color_system = state.systems[system]
+            lab_matrix, names, lab_tree = color_system.lab_colors()
+            if table_fingerprint != lookup_table.fingerprint(lab_matrix, names):
+                raise ValueError(
+                    "%r was built for different colors than the ones in system %r."
+                    % (filename, system)
+                )
+            systems = dict(state.systems)
+            systems[system] = color_system.with_lookup_table(table)
+            new_state = _State(systems, state.system_by_color, state.default_resources)
+            new_state.name_index = state.name_index
+            self._publish(new_state)
+
+    def save(self, filename):
+        """Save the colors of the registry to a binary snapshot file.
+
+        Loading a snapshot with :meth:`load` is much faster than adding the
+        colors again, since no color definitions have to be parsed and no
+        colors converted. Neither the result cache nor lookup tables are
+        part of the snapshot.
+
+        Args:
+          filename (string): The snapshot file.
+
+        """
+        state = self._load_defaults()
+        systems = dict(
+            (system, (color_system.rgb,) + color_system.lab_colors()[:2]
+             + (color_system.color_names, color_system.name_rows))
+            for system, color_system in state.systems.iteritems()
+        )
+        snapshot.save(filename, systems, state.system_by_color)
+
+    @classmethod
+    def load(cls, filename, cache_size=0, cache_file=None):
+        """Create a registry from a snapshot file written by :meth:`save`.
+
+        The Lab values of the color systems are memory-mapped read-only, so
+        processes loading the same snapshot share them.
+
+        Args:
+          filename (string): The snapshot file.
+          cache_size (int, optional): See :class:`TintRegistry`. Defaults to 0.
+          cache_file (string, optional): See :class:`TintRegistry`. Defaults
+            to None.
+
+        Returns:
+          A new :class:`TintRegistry`.
+
+        Raises:
+          ValueError: If `filename` is no snapshot of a supported version.
+
+        Examples:
+          >>> import os, shutil, tempfile
+          >>> directory = tempfile.mkdtemp()
+          >>> filename = os.path.join(directory, "registry.snapshot")
+          >>> TintRegistry().save(filename)
+          >>> tint_registry = TintRegistry.load(filename)
+          >>> tint_registry.find_nearest("54e6e4", system="en")
+          FindResult(color_name=u'bright turquoise', distance=3.7302886450554826)
+          >>> shutil.rmtree(directory)
+
+        """
+        registry = cls(load_defaults=False, cache_size=cache_size, cache_file=cache_file)
+        systems, system_by_color = snapshot.load(filename)
+        registry._state = _State(
+            dict(
+                (system, _ColorSystem.from_columns(
+                    rgb, names, color_names, name_rows, lab_matrix
+                ))
+                for system, (rgb, lab_matrix, names, color_names, name_rows)
+                in systems.iteritems()
+            ),
+            system_by_color,
+            {}
+        )
+        return registry
+
+    def _resolve_filter(self, system, filter_set):
+        """Turn the `filter_set` argument of the find methods into a CompiledFilter."""
+        if filter_set is None:
+            return None
+        if not isinstance(filter_set, CompiledFilter):
+            return CompiledFilter(system, filter_set)
+        if filter_set.system != system:
+            raise ValueError(
+                "Filter was compiled for color system %r, not %r." % (filter_set.system, system)
+            )
+        return filter_set
+
+    def _candidates(self, color_system, filter_set):
+        """Return the Lab matrix and color names of a system, restricted to `filter_set`."""
+        lab_matrix, names, lab_tree = color_system.lab_colors()
+        if filter_set is None:
+            return lab_matrix, names
+        compiled = filter_set._compiled
+        if compiled[0] != color_system.generation:
+            mask = numpy.array([name in filter_set.names for name in names], dtype=bool)
+            compiled = filter_set._compiled = (
+                color_system.generation,
+                lab_matrix[mask],
+                [name for name in names if name in filter_set.names]
+            )
+        return compiled[1], compiled[2]
+
+    def _lab_colors(self, system):
+        """Return the Lab matrix and the corresponding color names of a system."""
+        return self._get_state(system).systems[system].lab_colors()[:2]
@@ -0,0 +1,308 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""A local color normalization service, so that processes can share one registry.
+
+The server listens on a Unix socket or a localhost TCP port. Clients (see
+:class:`tint.client.TintClient`) send one JSON object per line::
+
+    {"method": "match_name", "params": {"in_string": "redish", "fuzzy": true}}
+    {"method": "find_nearest", "params": {"hex_code": "54e6e4", "system": "en"}}
+
+``match_name`` also takes the optional ``shortlist`` and ``system``
+parameters of :meth:`TintRegistry.match_name`, ``find_nearest`` the
+optional ``filter_set`` and ``metric`` parameters of
+:meth:`TintRegistry.find_nearest`. Clients receive one JSON
+object per line, in request order, holding either the ``result`` (the
+fields of the named tuple returned by the registry) or an ``error``
+message::
+
+    {"result": {"hex_code": "ff0000", "score": 78}}
+    {"error": "No match for u'redish' found."}
+
+Every connection is served by its own thread, but all lookups are done by
+a single batching thread: it collects the requests arriving within a few
+milliseconds of each other and answers them together, looking up each
+distinct value once, with :meth:`TintRegistry.match_name_many` and
+:meth:`TintRegistry.find_nearest_many`. Run with::
+
+    python -m tint.server --socket /tmp/tint.sock
+    python -m tint.server --port 8537
+
+"""
+
+from __future__ import unicode_literals
+
+import argparse
+import json
+import os
+import Queue
+import SocketServer
+import threading
+import time
+
+from .registry import TintRegistry
+from . import cache
+
+# Upper bound for the number of requests answered together
+_MAX_BATCH_SIZE = 1024
+
+# Number of compiled filter sets kept for find_nearest requests
+_FILTER_CACHE_SIZE = 256
+
+
+class _Request(object):
+
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Batcher(object):
+    """Answers lookup requests in batches on a background thread.
+
+    Args:
+      registry (TintRegistry): The registry to answer requests from.
+      batch_delay (float, optional): Seconds to wait for more requests
+        after the first one of a batch. Defaults to 0.002.
+
+    """
+    def __init__(self, registry, batch_delay=0.002):
+        self.registry = registry
+        self.batch_delay = batch_delay
+        self._queue = Queue.Queue()
+        self._filters = cache.LRUCache(_FILTER_CACHE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="tint-batcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, method, params):
+        """Queue a request and wait for its answer.
+
+        Returns:
+          A dict holding either the ``result`` or an ``error`` message.
+
+        """
+        request = _Request(method, params)
+        self._queue.put(request)
+        # Waiting without a timeout cannot be interrupted in Python 2
+        while not request.done.wait(60):
+            pass
+        if request.error is not None:
+            return {"error": request.error}
+        return {"result": request.result}
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.batch_delay
+            while len(batch) < _MAX_BATCH_SIZE:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Queue.Empty:
+                    break
+            try:
+                self._answer(batch)
+            except Exception as error:
+                for request in batch:
+                    if request.result is None and request.error is None:
+                        request.error = "%s: %s" % (type(error).__name__, error)
+            finally:
+                for request in batch:
+                    request.done.set()
+
+    def _answer(self, batch):
+        groups = {}
+        for request in batch:
+            try:
+                key, value = self._group(request)
+            except (KeyError, TypeError, ValueError) as error:
+                request.error = "Invalid request: %s" % error
+                continue
+            groups.setdefault(key, []).append((value, request))
+
+        for key, requests in groups.iteritems():
+            try:
+                self._answer_group(key, requests)
+            except Exception:
+                # Answer the requests one by one, so that only the failing ones fail
+                for value, request in requests:
+                    try:
+                        self._answer_group(key, [(value, request)])
+                    except Exception as error:
+                        request.result = None
+                        request.error = "%s: %s" % (type(error).__name__, error)
+
+    def _answer_group(self, key, requests):
+        if key[0] == "match_name":
+            self._match_name(key[1], key[2], key[3], requests)
+        else:
+            self._find_nearest(key[1], key[2], key[3], requests)
+
+    def _group(self, request):
+        """Return the key of the requests answered together with `request`, and its value."""
+        params = request.params
+        if request.method == "match_name":
+            shortlist = params.get("shortlist")
+            if shortlist is not None:
+                shortlist = int(shortlist)
+            system = params.get("system")
+            if system is not None and not isinstance(system, basestring):
+                system = tuple(system)
+            key = ("match_name", bool(params.get("fuzzy", False)), shortlist, system)
+            value = params["in_string"]
+        elif request.method == "find_nearest":
+            filter_set = params.get("filter_set")
+            if filter_set is not None:
+                filter_set = frozenset(filter_set)
+            key = ("find_nearest", params["system"], filter_set,
+                   unicode(params.get("metric", "cie2000")))
+            value = params["hex_code"]
+        else:
+            raise ValueError("unknown method %r" % request.method)
+        if not isinstance(value, basestring):
+            raise TypeError("expected a string, got %r" % value)
+        return key, value
+
+    def _match_name(self, fuzzy, shortlist, system, requests):
+        values = [value for value, request in requests]
+        try:
+            results = self.registry.match_name_many(values, fuzzy, shortlist, system=system)
+        except ValueError as error:
+            # An unknown system
+            for value, request in requests:
+                request.error = "%s" % error
+            return
+        for (value, request), result in zip(requests, results):
+            if result is None:
+                request.error = "No match for %r found." % value
+            else:
+                request.result = result._asdict()
+
+    def _find_nearest(self, system, filter_set, metric, requests):
+        try:
+            if filter_set is not None:
+                compiled = self._filters.get((system, filter_set))
+                if compiled is None:
+                    compiled = self.registry.compile_filter(system, filter_set)
+                    self._filters.put((system, filter_set), compiled)
+                filter_set = compiled
+            results = self.registry.find_nearest_many(
+                [value for value, request in requests], system, filter_set, metric=metric
+            )
+        except ValueError:
+            # Find out which requests are invalid
+            for value, request in requests:
+                try:
+                    request.result = self.registry.find_nearest(
+                        value, system, filter_set, metric=metric
+                    )._asdict()
+                except ValueError as error:
+                    request.error = "%s" % error
+            return
+        for (value, request), result in zip(requests, results):
+            request.result = result._asdict()
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b""):
+            try:
+                message = json.loads(line.decode("utf-8"))
+                response = self.server.batcher.submit(message["method"], message["params"])
+            except (KeyError, TypeError, ValueError) as error:
+                response = {"error": "Invalid request: %s" % error}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(registry, address, batch_delay=0.002):
+    """Create a server answering requests from `registry`.
+
+    Args:
+      registry (TintRegistry): The registry.
+      address (string or tuple): A Unix socket path, or a ``(host, port)``
+        pair to listen on.
+      batch_delay (float, optional): See :class:`Batcher`. Defaults to 0.002.
+
+    Returns:
+      A ``SocketServer`` instance; call its ``serve_forever`` method to
+      start answering requests.
+
+    """
+    if isinstance(address, tuple):
+        server = _TCPServer(address, _Handler)
+    else:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = _UnixServer(address, _Handler)
+    server.batcher = Batcher(registry, batch_delay)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m tint.server", description=__doc__.split("\n\n")[0]
+    )
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument("--socket", help="listen on this Unix socket")
+    address.add_argument("--port", type=int, help="listen on this localhost TCP port")
+    parser.add_argument("--snapshot",
+                        help="load the registry from this snapshot instead of the defaults")
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="milliseconds to collect requests for (default: 2)")
+    parser.add_argument("--cache-size", type=int, default=10000,
+                        help="number of cached results (default: 10000)")
+    parser.add_argument("--cache-file",
+                        help="keep computed results in this SQLite file, for later runs")
+    options = parser.parse_args(argv)
+
+    if options.snapshot:
+        registry = TintRegistry.load(
+            options.snapshot, cache_size=options.cache_size, cache_file=options.cache_file
+        )
+    else:
+        registry = TintRegistry(cache_size=options.cache_size, cache_file=options.cache_file)
+    address = options.socket if options.socket else ("127.0.0.1", options.port)
+    server = make_server(registry, address, options.batch_delay / 1000.0)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
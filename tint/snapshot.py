@@ -0,0 +1,123 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Binary snapshots of the contents of a :class:`tint.TintRegistry`.
+
+A snapshot file consists of
+
+* 8 bytes magic (``TINTSNAP``), the format version as an unsigned 32 bit
+  integer, 4 bytes padding and the length of the metadata as an unsigned
+  64 bit integer,
+* the metadata, UTF-8 encoded JSON holding the name to defining system
+  mapping and, per color system, the packed sRGB values and color names of
+  the rows of its Lab values, their position, and the system's name table
+  (the normalized color names it defines and their rows),
+* zero bytes up to the next multiple of 8 bytes,
+* the Lab values of all systems as little-endian 64 bit floats.
+
+The Lab values are loaded as a read-only memory map, so processes loading
+the same snapshot share these pages.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import struct
+
+import numpy
+
+_MAGIC = b"TINTSNAP"
+_VERSION = 5
+_HEADER = struct.Struct(str("<8sI4xQ"))
+_DTYPE = numpy.dtype(str("<f8"))
+
+
+def save(filename, systems, system_by_color):
+    """Write a snapshot.
+
+    Args:
+      filename (string): The snapshot file.
+      systems (dict): Maps system names to tuples of the packed sRGB values
+        (``0xRRGGBB``), the Lab matrix and the color names of the Lab matrix
+        rows, and the normalized color names defined by the system with
+        their rows.
+      system_by_color (dict): Maps normalized color names to the system that
+        defined them last.
+
+    """
+    metadata = {"system_by_color": system_by_color, "systems": {}}
+    offset = 0
+    for system, (rgb, lab_matrix, names, color_names, name_rows) in systems.iteritems():
+        metadata["systems"][system] = {
+            "rgb": numpy.asarray(rgb).tolist(),
+            "names": names,
+            "color_names": color_names,
+            "name_rows": numpy.asarray(name_rows).tolist(),
+            "offset": offset,
+            "rows": len(lab_matrix),
+        }
+        offset += len(lab_matrix)
+    metadata = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    with open(filename, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(metadata)))
+        f.write(metadata)
+        f.write(b"\0" * (-(_HEADER.size + len(metadata)) % _DTYPE.itemsize))
+        for rgb, lab_matrix, names, color_names, name_rows in systems.itervalues():
+            f.write(numpy.asarray(lab_matrix, dtype=_DTYPE).tostring())
+
+
+def load(filename):
+    """Read a snapshot written by :func:`save`.
+
+    Returns:
+      A tuple of `systems` and `system_by_color` as passed to :func:`save`,
+      where the Lab matrices are read-only memory maps.
+
+    Raises:
+      ValueError: If `filename` is no snapshot of a supported version.
+
+    """
+    with open(filename, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("%r is not a tint snapshot." % filename)
+        magic, version, metadata_length = _HEADER.unpack(header)
+        if magic != _MAGIC:
+            raise ValueError("%r is not a tint snapshot." % filename)
+        if version != _VERSION:
+            raise ValueError("%r has unsupported snapshot version %d." % (filename, version))
+        metadata = json.loads(f.read(metadata_length).decode("utf-8"))
+
+    data_offset = _HEADER.size + metadata_length
+    data_offset += -data_offset % _DTYPE.itemsize
+    rows = sum(system["rows"] for system in metadata["systems"].itervalues())
+    if rows:
+        lab_values = numpy.memmap(
+            filename, dtype=_DTYPE, mode="r", offset=data_offset, shape=(rows, 3)
+        )
+    else:
+        lab_values = numpy.empty((0, 3), dtype=_DTYPE)
+
+    systems = {}
+    for system, data in metadata["systems"].iteritems():
+        lab_matrix = lab_values[data["offset"]:data["offset"] + data["rows"]]
+        systems[system] = (
+            data["rgb"], lab_matrix, data["names"], data["color_names"], data["name_rows"]
+        )
+    return systems, metadata["system_by_color"]
@@ -0,0 +1,337 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Spatial index for nearest color lookups in Lab space.
+
+CIEDE2000 is not a metric, so it cannot drive a tree search directly. It is,
+however, bounded from below by the euclidean Lab distance (CIE76) times a
+factor that only depends on lightness and chroma:
+
+* In the primed coordinates (L, a', b), the sum of the squared differences
+  of lightness, chroma and hue equals the squared euclidean distance, which
+  is at least the CIE76 distance because ``a' = (1 + G) a`` with ``G >= 0``.
+* The rotation term ``R_T`` satisfies ``|R_T| <= 2 R_C sin(60°)``, so the
+  quadratic form of the chroma and hue terms is at least ``1 - R_C sin(60°)``
+  times their squared sum, which in turn is at least the squared euclidean
+  distance in the (a, b) plane.
+* All weighting functions are bounded by ``S_L <= S_L(max |L - 50|)`` and
+  ``S_H < S_C <= 1 + 0.045 * C'``, and ``R_C`` increases with ``C'``,
+  where ``C' <= 1.5 C``.
+
+:class:`LabTree` partitions the colors of a system into leaves by recursive
+median splits (a KD-tree), and keeps the bounding box and the maximal
+lightness offset and chroma of every leaf. A query computes the exact
+CIEDE2000 distances for the leaf closest to it, and then only for those
+leaves whose lower bound does not exceed the best distance found. The
+result is exactly the one of a full scan.
+
+The same bound prunes full scans (:func:`nearest_pruned`): exact distances
+are computed for the colors with the smallest bounds, and then only for
+those colors whose bound does not exceed the best distance found.
+
+The other metrics of :data:`tint.color_diff.METRICS` weight the lightness,
+chroma and hue differences by factors that only depend on the reference
+color, and the squared chroma and hue differences add up to at least the
+squared euclidean distance in the (a, b) plane. So they are bounded from
+below by a weighted euclidean distance, see :func:`euclidean_weights`.
+"""
+
+from __future__ import unicode_literals
+
+import math
+
+import numpy
+
+from . import color_diff
+
+_SIN_60 = math.sin(math.radians(60))
+
+# Slack for float rounding when comparing lower bounds to exact distances
+EPSILON = 1e-9
+
+# Number of colors with the smallest lower bounds that nearest_pruned computes
+# exact distances for first; one vectorized call costs about as much as
+# computing a few hundred distances, so the first guess should rarely need
+# a second call
+_PRUNING_CANDIDATES = 32
+
+
+def lower_bound(gaps, lightness_offset, chroma):
+    """Lower bound for the CIEDE2000 distance of color pairs.
+
+    Args:
+      gaps (array_like): Lower bounds for the absolute differences of L, a
+        and b of the pairs, the last axis holding the three components.
+      lightness_offset (array_like): Upper bound for ``|L - 50|`` of the
+        mean lightness of the pairs.
+      chroma (array_like): Upper bound for the mean chroma of the pairs.
+
+    """
+    gaps = numpy.asarray(gaps)
+    lightness_offset_sq = numpy.square(lightness_offset)
+    s_l = 1 + (0.015 * lightness_offset_sq) / numpy.sqrt(20 + lightness_offset_sq)
+    chroma_p = 1.5 * numpy.asarray(chroma)
+    s_c = 1 + 0.045 * chroma_p
+    chroma_p_7 = color_diff._pow7(chroma_p)
+    min_eigenvalue = 1 - _SIN_60 * numpy.sqrt(chroma_p_7 / (chroma_p_7 + 25.0 ** 7))
+    chroma_gap_sq = numpy.square(gaps[..., 1]) + numpy.square(gaps[..., 2])
+    return numpy.sqrt(
+        numpy.square(gaps[..., 0] / s_l) + min_eigenvalue * chroma_gap_sq / numpy.square(s_c)
+    )
+
+
+def euclidean_weights(lab, metric):
+    """Weights for a lower bound of the CIE76, CIE94 or CMC distance to a reference color.
+
+    Args:
+      lab (array_like): The reference Lab triple.
+      metric (string): ``"cie76"``, ``"cie94"`` or ``"cmc"``, with the
+        default parameters of their functions in :mod:`tint.color_diff`.
+
+    Returns:
+      A tuple ``(w_L, w_ab)``, such that the distance of any color to `lab`
+      is at least ``sqrt((w_L * dL) ** 2 + w_ab ** 2 * (da ** 2 + db ** 2))``.
+
+    """
+    if metric == "cie76":
+        return 1.0, 1.0
+    chroma = math.hypot(lab[1], lab[2])
+    if metric == "cie94":
+        # S_C >= S_H, as K_1 > K_2
+        return 1.0, 1.0 / (1 + 0.045 * chroma)
+    if metric == "cmc":
+        # S_C >= S_H, as F * T + 1 - F <= 1
+        s_l, s_c, s_h = color_diff.cmc_weights(lab)
+        return 1.0 / (2 * float(s_l)), 1.0 / float(s_c)
+    raise ValueError("No euclidean bound for metric %r." % metric)
+
+
+def nearest_pruned(lab_values, lab_matrix):
+    """Find the colors with the minimal CIEDE2000 distances, like a full scan.
+
+    Ties are resolved in favor of the lowest index, like ``numpy.argmin``.
+
+    Args:
+      lab_values (numpy.ndarray): Query Lab values of shape ``(N, 3)``.
+      lab_matrix (numpy.ndarray): Candidate Lab values of shape ``(M, 3)``,
+        with ``M > 0``.
+
+    Returns:
+      A tuple of arrays of the indices into `lab_matrix` and the distances.
+
+    """
+    lab_values = numpy.asarray(lab_values, dtype=numpy.float64)
+    lab_matrix = numpy.asarray(lab_matrix, dtype=numpy.float64)
+    if len(lab_matrix) <= _PRUNING_CANDIDATES:
+        distances = color_diff.delta_e_cie2000(lab_values[:, numpy.newaxis, :], lab_matrix)
+        indices = numpy.argmin(distances, axis=1)
+        return indices, distances[numpy.arange(len(indices)), indices]
+
+    lower_bounds = lower_bound(
+        numpy.abs(lab_values[:, numpy.newaxis, :] - lab_matrix),
+        (numpy.abs(lab_values[:, 0:1] - 50) + numpy.abs(lab_matrix[:, 0] - 50)) / 2.0,
+        (numpy.hypot(lab_values[:, 1:2], lab_values[:, 2:3]) +
+         numpy.hypot(lab_matrix[:, 1], lab_matrix[:, 2])) / 2.0
+    )
+    distances = numpy.full(lower_bounds.shape, numpy.inf)
+    columns = numpy.argpartition(lower_bounds, _PRUNING_CANDIDATES - 1, axis=1)
+    columns = columns[:, :_PRUNING_CANDIDATES].ravel()
+    rows = numpy.repeat(numpy.arange(len(lab_values)), _PRUNING_CANDIDATES)
+    distances[rows, columns] = color_diff.delta_e_cie2000(lab_values[rows], lab_matrix[columns])
+
+    # The best of these distances rules out all colors with a greater bound
+    upper_bounds = distances.min(axis=1) * (1 + EPSILON) + EPSILON
+    rows, columns = numpy.nonzero(
+        (lower_bounds <= upper_bounds[:, numpy.newaxis]) & numpy.isinf(distances)
+    )
+    if len(rows):
+        distances[rows, columns] = color_diff.delta_e_cie2000(
+            lab_values[rows], lab_matrix[columns]
+        )
+    indices = numpy.argmin(distances, axis=1)
+    return indices, distances[numpy.arange(len(indices)), indices]
+
+
+def smallest(distances, indices, k):
+    """Select the `k` smallest distances, ties resolved in favor of the lowest index.
+
+    Args:
+      distances (numpy.ndarray): Distances.
+      indices (numpy.ndarray): Index of each distance.
+      k (int): Number of distances to select.
+
+    Returns:
+      A tuple of the selected indices and distances, sorted by distance.
+
+    """
+    if len(distances) > k:
+        # Everything up to the k-th smallest distance, including ties
+        threshold = numpy.partition(distances, k - 1)[k - 1]
+        selected = distances <= threshold
+        distances, indices = distances[selected], indices[selected]
+    order = numpy.lexsort((indices, distances))[:k]
+    return indices[order], distances[order]
+
+
+def box_gaps(low, high, lab):
+    """Absolute differences of Lab values to the closest point of axis-aligned boxes."""
+    return numpy.maximum(low - lab, 0) + numpy.maximum(lab - high, 0)
+
+
+class LabTree(object):
+    """KD-tree over the Lab values of a color system.
+
+    Args:
+      lab_matrix (numpy.ndarray): Lab values of shape ``(M, 3)``.
+      leaf_size (int, optional): Maximal number of colors per leaf.
+
+    """
+    def __init__(self, lab_matrix, leaf_size=128):
+        lab_matrix = numpy.asarray(lab_matrix, dtype=numpy.float64)
+        leaves = []
+        self._split(numpy.arange(len(lab_matrix)), lab_matrix, leaf_size, leaves)
+
+        self._order = numpy.concatenate(leaves) if leaves else numpy.empty(0, dtype=numpy.intp)
+        self._lab = lab_matrix[self._order]
+        sizes = numpy.array([len(leaf) for leaf in leaves], dtype=numpy.intp)
+        self._ends = numpy.cumsum(sizes)
+        self._starts = self._ends - sizes
+
+        leaf_labs = [lab_matrix[leaf] for leaf in leaves]
+        self._low = numpy.array([lab.min(axis=0) for lab in leaf_labs]).reshape(-1, 3)
+        self._high = numpy.array([lab.max(axis=0) for lab in leaf_labs]).reshape(-1, 3)
+        self._lightness_offset = numpy.array(
+            [numpy.abs(lab[:, 0] - 50).max() for lab in leaf_labs]
+        )
+        self._chroma = numpy.array(
+            [numpy.sqrt(lab[:, 1] ** 2 + lab[:, 2] ** 2).max() for lab in leaf_labs]
+        )
+
+    def __len__(self):
+        return len(self._order)
+
+    @classmethod
+    def _split(cls, indices, lab_matrix, leaf_size, leaves):
+        if len(indices) <= leaf_size:
+            if len(indices):
+                leaves.append(indices)
+            return
+        points = lab_matrix[indices]
+        dimension = numpy.argmax(points.max(axis=0) - points.min(axis=0))
+        order = numpy.argsort(points[:, dimension], kind="mergesort")
+        half = len(indices) // 2
+        cls._split(indices[order[:half]], lab_matrix, leaf_size, leaves)
+        cls._split(indices[order[half:]], lab_matrix, leaf_size, leaves)
+
+    def _lower_bounds(self, lab, metric):
+        """Return the gaps of `lab` to the leaves, and lower bounds for their distances."""
+        gaps = box_gaps(self._low, self._high, lab)
+        if metric == "cie2000":
+            return gaps, lower_bound(
+                gaps,
+                (abs(lab[0] - 50) + self._lightness_offset) / 2.0,
+                (math.hypot(lab[1], lab[2]) + self._chroma) / 2.0
+            )
+        w_l, w_ab = euclidean_weights(lab, metric)
+        return gaps, numpy.sqrt(
+            numpy.square(w_l * gaps[:, 0]) +
+            w_ab * w_ab * (numpy.square(gaps[:, 1]) + numpy.square(gaps[:, 2]))
+        )
+
+    def nearest(self, lab, metric="cie2000"):
+        """Find the color with the minimal distance to `lab`.
+
+        Ties are resolved in favor of the lowest index, like a full scan
+        with ``numpy.argmin`` would.
+
+        Args:
+          lab (array_like): A Lab triple.
+          metric (string, optional): A key of :data:`tint.color_diff.METRICS`.
+            Defaults to ``"cie2000"``.
+
+        Returns:
+          A tuple of the index into the original Lab matrix and the distance.
+
+        """
+        lab = numpy.asarray(lab, dtype=numpy.float64)
+        delta_e = color_diff.METRICS[metric]
+        gaps, lower_bounds = self._lower_bounds(lab, metric)
+
+        # Exact distances for the closest leaf give an upper bound ...
+        first = int(numpy.argmin((gaps * gaps).sum(axis=1)))
+        start, end = self._starts[first], self._ends[first]
+        distances = delta_e(lab, self._lab[start:end])
+        indices = self._order[start:end]
+
+        # ... which rules out all leaves with a greater lower bound
+        selected = lower_bounds <= distances.min() * (1 + EPSILON) + EPSILON
+        selected[first] = False
+        selected = numpy.flatnonzero(selected)
+        if len(selected):
+            positions = numpy.concatenate(
+                [numpy.arange(self._starts[leaf], self._ends[leaf]) for leaf in selected]
+            )
+            distances = numpy.concatenate((distances, delta_e(lab, self._lab[positions])))
+            indices = numpy.concatenate((indices, self._order[positions]))
+
+        min_distance = distances.min()
+        index = indices[distances == min_distance].min()
+        return int(index), float(min_distance)
+
+    def nearest_k(self, lab, k, metric="cie2000"):
+        """Find the `k` colors with the smallest distances to `lab`.
+
+        Leaves are visited in the order of their lower bounds, until the
+        next lower bound exceeds the `k`-th smallest distance found so far.
+
+        Args:
+          lab (array_like): A Lab triple.
+          k (int): Number of colors to find.
+          metric (string, optional): A key of :data:`tint.color_diff.METRICS`.
+            Defaults to ``"cie2000"``.
+
+        Returns:
+          A tuple of index and distance arrays, sorted by distance (ties by
+          index), with ``min(k, len(self))`` entries.
+
+        """
+        lab = numpy.asarray(lab, dtype=numpy.float64)
+        delta_e = color_diff.METRICS[metric]
+        lower_bounds = self._lower_bounds(lab, metric)[1]
+        order = numpy.argsort(lower_bounds, kind="mergesort")
+        sorted_bounds = lower_bounds[order]
+        indices = numpy.empty(0, dtype=numpy.intp)
+        distances = numpy.empty(0)
+        position = 0
+        while position < len(order):
+            if len(distances) < k:
+                # Not enough colors for a bound yet, take the next leaf
+                end = position + 1
+            else:
+                limit = distances[-1] * (1 + EPSILON) + EPSILON
+                end = numpy.searchsorted(sorted_bounds, limit, side="right")
+                if end <= position:
+                    break
+            positions = numpy.concatenate(
+                [numpy.arange(self._starts[leaf], self._ends[leaf]) for leaf in order[position:end]]
+            )
+            distances = numpy.concatenate((distances, delta_e(lab, self._lab[positions])))
+            indices = numpy.concatenate((indices, self._order[positions]))
+            indices, distances = smallest(distances, indices, k)
+            position = end
+        return indices, distances
@@ -0,0 +1,118 @@
+# coding: utf-8
+
+# tint - friendly color normalization
+# Copyright (C) 2014  Christian Schramm, solute GmbH
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""Opt-in usage statistics for :class:`tint.TintRegistry`."""
+
+from __future__ import unicode_literals
+
+import bisect
+import collections
+import heapq
+import threading
+import timeit
+
+MethodStats = collections.namedtuple(
+    "MethodStats", ("calls", "outcomes", "latency_histogram", "slowest")
+)
+
+# Upper bounds (in seconds) of the latency histogram buckets: powers of two
+# from 10 microseconds to about 10 seconds, and everything slower
+BUCKET_BOUNDS = tuple(1e-5 * 2 ** i for i in range(21)) + (float("inf"),)
+
+# Arguments whose lookup took longest, kept per method
+_SLOWEST_SIZE = 10
+
+
+class _MethodRecord(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.outcomes = collections.defaultdict(int)
+        self.buckets = [0] * len(BUCKET_BOUNDS)
+        self.slowest = []
+
+
+class Stats(object):
+    """Counts calls and their outcomes, and keeps latency histograms per method.
+
+    All methods may be called from several threads at once.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def measure(self, method, argument, function, *args):
+        """Call `function` and record its latency and outcome.
+
+        Args:
+          method (string): Name of the measured method.
+          argument: The input to report if the call is among the slowest.
+          function (callable): Called with `args`, returns a tuple of the
+            result and the outcome, e.g. ``"exact"``, or a dict of outcome
+            counts for batch methods. A ``ValueError`` is recorded as the
+            outcome ``"miss"``.
+
+        Returns:
+          The result of `function`.
+
+        """
+        start = timeit.default_timer()
+        try:
+            result, outcome = function(*args)
+        except ValueError:
+            self.record(method, argument, "miss", timeit.default_timer() - start)
+            raise
+        self.record(method, argument, outcome, timeit.default_timer() - start)
+        return result
+
+    def record(self, method, argument, outcome, seconds):
+        """Record a call of `method`, with an outcome or a dict of outcome counts."""
+        bucket = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            record = self._records.get(method)
+            if record is None:
+                record = self._records[method] = _MethodRecord()
+            record.calls += 1
+            if isinstance(outcome, dict):
+                for key, count in outcome.items():
+                    record.outcomes[key] += count
+            else:
+                record.outcomes[outcome] += 1
+            record.buckets[bucket] += 1
+            if len(record.slowest) < _SLOWEST_SIZE:
+                heapq.heappush(record.slowest, (seconds, argument))
+            elif seconds > record.slowest[0][0]:
+                heapq.heapreplace(record.slowest, (seconds, argument))
+
+    def snapshot(self):
+        """Return a dict of :data:`MethodStats` by method name."""
+        with self._lock:
+            return dict(
+                (method, MethodStats(
+                    record.calls,
+                    dict(record.outcomes),
+                    list(zip(BUCKET_BOUNDS, record.buckets)),
+                    sorted(record.slowest, reverse=True)
+                ))
+                for method, record in self._records.items()
+            )
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._records = {}